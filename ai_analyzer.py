@@ -1,8 +1,7 @@
-import json
+from trade_logger import read_trades
 
 def analyze():
-    with open("trade_log.json") as f:
-        logs = json.load(f)
+    logs = read_trades(500)
 
     wins = [x for x in logs if x["pnl"] > 0]
     losses = [x for x in logs if x["pnl"] <= 0]
@@ -1,10 +1,18 @@
+import atexit
+import functools
 import json
+import os
+import threading
 import time
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
 from storage_utils import data_path, safe_read_json, atomic_write_json
 
 LEARN_FILE = data_path("learn_state.json")
+# record_trade_result* 변경분은 이 간격으로 묶어서 백그라운드 기록 (0 = 예전처럼 즉시 기록)
+LEARN_FLUSH_SEC = float(os.getenv("AI_LEARN_FLUSH_SEC", "5") or 0)
 
 DEFAULT_STATE: Dict[str, Any] = {
     "global": {"trades": 0, "wins": 0, "losses": 0, "pnl_sum": 0.0, "recent": []},
@@ -139,19 +147,132 @@ def _normalize_state(data: Any) -> Dict[str, Any]:
     return data
 
 
+class _LearnState:
+    """Process-wide learn_state.json: loaded once, reads served from memory.
+
+    - the file's (mtime, size) is checked on every access; an edit by another
+      process/tool reloads it and the trade records not yet flushed from this
+      process (kept as replayable ops in `pending`) are applied again on top
+    - the normalize/repair write happens only when the repair changed something
+    - mutations mark the state dirty; a daemon timer flushes after LEARN_FLUSH_SEC,
+      plus flush() / interpreter exit
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.data: Optional[Dict[str, Any]] = None
+        self.sig: Optional[tuple] = None
+        self.dirty = False
+        self.pending: List[tuple] = []  # (fn, args) applied since the last write
+        self.timer: Optional[threading.Timer] = None
+        self.writes = 0
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def get(self) -> Dict[str, Any]:
+        with self.lock:
+            sig = self._stat()
+            if self.data is None or sig != self.sig:
+                raw = safe_read_json(self.path, _deepcopy_default())
+                before = json.dumps(raw, sort_keys=True, default=str) if sig is not None else None
+                self.data = _normalize_state(raw)
+                rebuild_aggregates(self.data)
+                self.sig = self._stat()
+                if self.pending:
+                    # changed on disk under unflushed records: keep theirs, redo ours on top
+                    for fn, args in self.pending:
+                        fn(self.data, *args)
+                    self.mark_dirty()
+                    return self.data
+                if self.dirty:
+                    print("[AI_LEARN] learn_state.json changed on disk: unflushed changes dropped")
+                self.dirty = False
+                # Persist the repaired shape so the same crash does not repeat every tick.
+                if before is not None and json.dumps(self.data, sort_keys=True, default=str) != before:
+                    self._write()
+            return self.data
+
+    def apply(self, fn, *args) -> None:
+        """fn(data, *args) on the live state; kept in `pending` until it is written."""
+        with self.lock:
+            fn(self.get(), *args)
+            self.pending.append((fn, args))
+            self.mark_dirty()
+
+    def _write(self) -> None:
+        try:
+            atomic_write_json(self.path, self.data)
+            self.writes += 1
+            self.dirty = False
+            self.pending = []
+        except Exception:
+            pass
+        self.sig = self._stat()
+
+    def mark_dirty(self) -> None:
+        with self.lock:
+            self.dirty = True
+            if LEARN_FLUSH_SEC <= 0:
+                self._write()
+                return
+            if self.timer is None:
+                self.timer = threading.Timer(LEARN_FLUSH_SEC, self._timer_flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _timer_flush(self) -> None:
+        with self.lock:
+            self.timer = None
+            self.flush()
+
+    def flush(self) -> bool:
+        with self.lock:
+            if not self.dirty or self.data is None:
+                return False
+            # 디스크가 밖에서 바뀌었으면 그쪽을 다시 읽고 아직 안 쓴 기록을 위에 다시 적용
+            if self._stat() != self.sig:
+                writes = self.writes
+                self.get()
+                if not self.dirty:
+                    return self.writes != writes
+            self._write()
+            return not self.dirty
+
+
+_STATE = _LearnState(LEARN_FILE)
+atexit.register(_STATE.flush)
+
+
 def _load() -> Dict[str, Any]:
-    data = safe_read_json(LEARN_FILE, _deepcopy_default())
-    data = _normalize_state(data)
-    # Persist the repaired shape so the same crash does not repeat every tick.
-    try:
-        atomic_write_json(LEARN_FILE, data)
-    except Exception:
-        pass
-    return data
+    return _STATE.get()
 
 
 def _save(data: Dict[str, Any]) -> None:
-    atomic_write_json(LEARN_FILE, _normalize_state(data))
+    with _STATE.lock:
+        if data is not _STATE.data:
+            _STATE.data = _normalize_state(data)
+            rebuild_aggregates(_STATE.data)
+        _STATE.mark_dirty()
+
+
+def flush() -> bool:
+    """Write pending learn-state changes now (shutdown / tests)."""
+    return _STATE.flush()
+
+
+def _locked(fn):
+    # the in-memory state is shared across threads (guard loop / telegram / tick)
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _STATE.lock:
+            return fn(*args, **kwargs)
+    return wrapper
 
 
 def _append_recent(arr: List[Dict[str, Any]], item: Dict[str, Any], maxlen: int = 80) -> None:
@@ -163,45 +284,108 @@ def _append_recent(arr: List[Dict[str, Any]], item: Dict[str, Any], maxlen: int
         del arr[:-maxlen]
 
 
-def _weighted_components(recent: List[Dict[str, Any]]) -> Dict[str, float]:
-    recent = _coerce_recent(recent, 500)
-    if not recent:
-        return {"winrate": 0.0, "avg_pnl": 0.0, "score": 0.0}
+# ----- running decayed aggregates -----
+# The 0.92-decayed winrate / avg pnl / score of a stats owner (bucket / global_detail)
+# comes only from its
+#   agg = {"v", "n", "w": sum(d^age), "win": sum(d^age * [pnl>0]), "pnl": sum(d^age * pnl), "last"}
+# pushed in O(1) per trade (entries that fall out of the window are subtracted),
+# so a query is O(1). A missing/stale agg (old file, external edit, new version)
+# is rebuilt from `recent` with numpy.
+DECAY = 0.92
+AGG_VERSION = 1
+
 
-    total_w = 0.0
-    win_score = 0.0
-    pnl_score = 0.0
+def _agg_rebuild(recent: Any) -> Dict[str, Any]:
+    recent = _coerce_recent(recent, 500)
     n = len(recent)
-    for i, r in enumerate(recent):
-        age = n - 1 - i
-        w = 0.92 ** age
-        total_w += w
-        pnl = _to_float(r.get("pnl", 0.0), 0.0)
-        if pnl > 0:
-            win_score += 1.0 * w
-        pnl_score += pnl * w
-
-    if total_w <= 0:
-        return {"winrate": 0.0, "avg_pnl": 0.0, "score": 0.0}
+    if n == 0:
+        return {"v": AGG_VERSION, "n": 0, "w": 0.0, "win": 0.0, "pnl": 0.0, "last": None}
+    pnl = np.fromiter((_to_float(r.get("pnl", 0.0), 0.0) for r in recent), dtype=np.float64, count=n)
+    w = DECAY ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    return {
+        "v": AGG_VERSION,
+        "n": n,
+        "w": float(w.sum()),
+        "win": float(w[pnl > 0].sum()),
+        "pnl": float(w @ pnl),
+        "last": float(pnl[-1]),
+    }
 
-    winrate = win_score / total_w
-    avg_pnl = pnl_score / total_w
-    # score: positive = easier entries allowed, negative = tighten up.
+
+def _agg_of(owner: Dict[str, Any]) -> Dict[str, Any]:
+    recent = owner.get("recent")
+    n = len(recent) if isinstance(recent, list) else 0
+    agg = owner.get("agg")
+    if (
+        isinstance(agg, dict)
+        and agg.get("v") == AGG_VERSION
+        and agg.get("n") == n
+        and (n == 0 or (isinstance(recent[-1], dict) and agg.get("last") == _to_float(recent[-1].get("pnl", 0.0), 0.0)))
+    ):
+        return agg
+    agg = owner["agg"] = _agg_rebuild(recent)
+    return agg
+
+
+def _agg_components(agg: Dict[str, Any]) -> Dict[str, float]:
+    total_w = _to_float(agg.get("w"), 0.0)
+    if int(agg.get("n") or 0) <= 0 or total_w <= 0:
+        return {"winrate": 0.0, "avg_pnl": 0.0, "score": 0.0}
+    winrate = _to_float(agg.get("win"), 0.0) / total_w
+    avg_pnl = _to_float(agg.get("pnl"), 0.0) / total_w
     score = ((winrate - 0.5) * 100.0 * 0.8) + (avg_pnl * 0.2)
     return {"winrate": winrate, "avg_pnl": avg_pnl, "score": score}
 
 
+def _push_recent(owner: Dict[str, Any], item: Dict[str, Any], maxlen: int) -> None:
+    """_append_recent + O(1) update of owner["agg"]."""
+    if not isinstance(owner.get("recent"), list):
+        owner["recent"] = []
+    agg = _agg_of(owner)
+    arr = owner["recent"]
+    arr.append(item)
+    dropped = arr[:-maxlen] if len(arr) > maxlen else []
+    m = len(arr)
+    pnl = _to_float(item.get("pnl", 0.0), 0.0)
+    w = agg["w"] * DECAY + 1.0
+    win = agg["win"] * DECAY + (1.0 if pnl > 0 else 0.0)
+    psum = agg["pnl"] * DECAY + pnl
+    for i, r in enumerate(dropped):
+        f = DECAY ** (m - 1 - i)
+        rp = _to_float(r.get("pnl", 0.0), 0.0)
+        w -= f
+        win -= f if rp > 0 else 0.0
+        psum -= f * rp
+    if dropped:
+        del arr[:-maxlen]
+    owner["agg"] = {"v": AGG_VERSION, "n": len(arr), "w": w, "win": win, "pnl": psum, "last": pnl}
+
+
+def rebuild_aggregates(data: Optional[Dict[str, Any]] = None, force: bool = False) -> int:
+    """Replay stale/missing aggs from `recent` (every one with force=True). Returns the rebuilt count."""
+    with _STATE.lock:
+        data = _load() if data is None else data
+        owners = [data.get("global_detail")] + list((data.get("buckets") or {}).values())
+        rebuilt = 0
+        for o in owners:
+            if not isinstance(o, dict):
+                continue
+            if force:
+                o["agg"] = _agg_rebuild(o.get("recent"))
+                rebuilt += 1
+                continue
+            before = o.get("agg")
+            if _agg_of(o) is not before:
+                rebuilt += 1
+        return rebuilt
+
+
 def _bucket_stats(bucket: Dict[str, Any]) -> Dict[str, Any]:
-    bucket = _normalize_counter_bucket(
-        bucket,
-        {"trades": 0, "wins": 0, "losses": 0, "pnl_sum": 0.0, "recent": []},
-        80,
-    )
     trades = _to_int(bucket.get("trades", 0), 0)
     wins = _to_int(bucket.get("wins", 0), 0)
     losses = _to_int(bucket.get("losses", 0), 0)
     pnl_sum = _to_float(bucket.get("pnl_sum", 0.0), 0.0)
-    comp = _weighted_components(bucket.get("recent", []))
+    comp = _agg_components(_agg_of(bucket))
     return {
         "trades": trades,
         "wins": wins,
@@ -215,9 +399,11 @@ def _bucket_stats(bucket: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def record_trade_result(pnl: float) -> None:
-    data = _load()
+    _STATE.apply(_apply_trade_result, _to_float(pnl, 0.0), int(time.time()))
+
+
+def _apply_trade_result(data: Dict[str, Any], pnl: float, ts: int) -> None:
     g = data["global"]
-    pnl = _to_float(pnl, 0.0)
     g["trades"] = _to_int(g.get("trades", 0), 0) + 1
     if pnl > 0:
         g["wins"] = _to_int(g.get("wins", 0), 0) + 1
@@ -226,8 +412,7 @@ def record_trade_result(pnl: float) -> None:
     g["pnl_sum"] = _to_float(g.get("pnl_sum", 0.0), 0.0) + pnl
     if not isinstance(g.get("recent"), list):
         g["recent"] = []
-    _append_recent(g["recent"], {"ts": int(time.time()), "pnl": pnl}, maxlen=120)
-    _save(data)
+    _append_recent(g["recent"], {"ts": ts, "pnl": pnl}, maxlen=120)
 
 
 def record_trade_result_ex(
@@ -240,14 +425,28 @@ def record_trade_result_ex(
     reason: str = "",
     extra: Optional[Dict[str, Any]] = None,
 ) -> None:
-    data = _load()
-    ts = int(time.time())
-    pnl = _to_float(pnl, 0.0)
+    _STATE.apply(
+        _apply_trade_result_ex, int(time.time()), _to_float(pnl, 0.0), symbol, side, strategy, regime,
+        enter_score, reason, dict(extra or {}),
+    )
+
+
+def _apply_trade_result_ex(
+    data: Dict[str, Any],
+    ts: int,
+    pnl: float,
+    symbol: str,
+    side: str,
+    strategy: str,
+    regime: str,
+    enter_score: float,
+    reason: str,
+    extra: Dict[str, Any],
+) -> None:
     symbol = (symbol or "").upper()
     side = (side or "").upper()
     strategy = strategy or "unknown"
     regime = regime or "unknown"
-    extra = extra or {}
 
     gd = data["global_detail"]
     gd["trades"] = _to_int(gd.get("trades", 0), 0) + 1
@@ -256,9 +455,7 @@ def record_trade_result_ex(
     elif pnl < 0:
         gd["losses"] = _to_int(gd.get("losses", 0), 0) + 1
     gd["pnl_sum"] = _to_float(gd.get("pnl_sum", 0.0), 0.0) + pnl
-    if not isinstance(gd.get("recent"), list):
-        gd["recent"] = []
-    _append_recent(gd["recent"], {
+    _push_recent(gd, {
         "ts": ts,
         "pnl": pnl,
         "symbol": symbol,
@@ -268,7 +465,7 @@ def record_trade_result_ex(
         "enter_score": _to_float(enter_score, 0.0),
         "reason": reason,
         **extra,
-    }, maxlen=120)
+    }, 120)
 
     if not isinstance(data.get("buckets"), dict):
         data["buckets"] = {}
@@ -305,18 +502,16 @@ def record_trade_result_ex(
     elif pnl < 0:
         b["losses"] = _to_int(b.get("losses", 0), 0) + 1
     b["pnl_sum"] = _to_float(b.get("pnl_sum", 0.0), 0.0) + pnl
-    if not isinstance(b.get("recent"), list):
-        b["recent"] = []
-    _append_recent(b["recent"], {
+    _push_recent(b, {
         "ts": ts,
         "pnl": pnl,
         "enter_score": _to_float(enter_score, 0.0),
         "reason": reason,
         **extra,
-    }, maxlen=80)
-    _save(data)
+    }, 80)
 
 
+@_locked
 def get_bucket_stats(symbol: str, side: str, strategy: str, regime: str) -> Dict[str, Any]:
     data = _load()
     b = data.get("buckets", {}).get(_bucket_key(symbol, side, strategy, regime))
@@ -338,6 +533,7 @@ def get_bucket_score(symbol: str, side: str, strategy: str, regime: str) -> floa
     return _to_float(get_bucket_stats(symbol, side, strategy, regime).get("weighted_score", 0.0), 0.0)
 
 
+@_locked
 def get_symbol_side_score(symbol: str, side: str) -> float:
     data = _load()
     vals: List[float] = []
@@ -352,12 +548,13 @@ def get_symbol_side_score(symbol: str, side: str) -> float:
     return (sum(vals) / len(vals)) if vals else 0.0
 
 
+@_locked
 def get_global_score() -> float:
     data = _load()
     gd = data.get("global_detail", {})
     if not isinstance(gd, dict):
         gd = {}
-    return _to_float(_weighted_components(gd.get("recent", [])).get("score", 0.0), 0.0)
+    return _to_float(_agg_components(_agg_of(gd)).get("score", 0.0), 0.0)
 
 
 def get_recommended_score_adjustment(symbol: str, side: str, strategy: str, regime: str) -> Dict[str, Any]:
@@ -413,6 +610,7 @@ def check_winrate_milestone() -> Optional[str]:
     return None
 
 
+@_locked
 def get_ai_stats() -> Dict[str, Any]:
     data = _load()
     g = data.get("global", {})
@@ -1,11 +1,8 @@
-import json
-
-FILE = "trade_log.json"
+from trade_logger import read_trades
 
 def analyze_patterns():
     try:
-        with open(FILE) as f:
-            logs = json.load(f)
+        logs = read_trades(500)
     except:
         return None
 
@@ -1,6 +1,6 @@
 # auto_param_tuner.py
 # 목적:
-# - run_backtest_opt.py를 백그라운드/수동으로 돌려 심볼별 후보 파라미터를 추천한다.
+# - run_backtest_opt.run_backtest_opt()를 같은 프로세스에서 돌려 심볼별 후보 파라미터를 추천한다.
 # - 기본값은 절대 자동 적용하지 않는다. candidate_symbol_profiles.json만 만든다.
 # - 적용은 사용자가 확인 후 symbol_profiles.json으로 복사하거나 /applyprofile 같은 별도 승인 명령으로 하도록 설계.
 #
@@ -19,13 +19,13 @@ import argparse
 import json
 import os
 import re
-import shlex
-import subprocess
-import sys
+import traceback
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from run_backtest_opt import run_backtest_opt
+
 
 DEFAULT_SYMBOLS = "ONDOUSDT,ZECUSDT,BTCUSDT,ETHUSDT,SOLUSDT,XRPUSDT,DOGEUSDT"
 
@@ -66,7 +66,7 @@ def safe_int(x: Any, default: int = 0) -> int:
 
 
 def parse_backtest_output(text: str) -> Dict[str, Dict[str, Any]]:
-    """Parse several common run_backtest_opt.py output styles.
+    """Parse several common run_backtest_opt.py output styles (saved logs / older runs).
 
     Expected fragments can be like:
       ONDOUSDT bal=122.76% win=61.29% trades=62 enter_score=70 sl_atr=2.0 tp_atr=1.5 short=True
@@ -184,22 +184,33 @@ def profile_from_row(row: Dict[str, Any], grade: str) -> Dict[str, Any]:
     }
 
 
-def build_command(args: argparse.Namespace) -> List[str]:
-    cmd = [
-        sys.executable,
-        "run_backtest_opt.py",
-        "--symbols",
-        args.symbols,
-        "--interval",
-        str(args.interval),
-        "--days",
-        str(args.days),
-    ]
-    if args.grid:
-        cmd += ["--grid", args.grid]
-    if args.short:
-        cmd += ["--short", args.short]
-    return cmd
+def build_params(args: argparse.Namespace) -> Dict[str, Any]:
+    """run_backtest_opt() kwargs (same defaults as the run_backtest_opt.py CLI)."""
+    return {
+        "interval": str(args.interval),
+        "days": int(args.days),
+        "grid": args.grid == "on",
+        "allow_short": args.short == "on",
+    }
+
+
+def rows_from_result(res: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Structured run_backtest_opt() result -> the row shape parse_backtest_output() produces."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for sym, best in (res.get("best_by_symbol") or {}).items():
+        if not best or "error" in best:
+            continue
+        params = best.get("params") or {}
+        out[sym] = {
+            "symbol": sym,
+            "bal": best.get("balance_pct"),
+            "winrate": best.get("winrate"),
+            "trades": best.get("trades"),
+            "enter_score": safe_int(params.get("enter_score")),
+            "stop_atr": safe_float(params.get("sl_atr")),
+            "tp_r": safe_float(params.get("tp_atr")),
+        }
+    return out
 
 
 def main() -> int:
@@ -227,13 +238,23 @@ def main() -> int:
     report_path = outdir / "tune_report.json"
     candidate_path = outdir / "candidate_symbol_profiles.json"
 
-    cmd = build_command(args)
-    print("[TUNER] running:", " ".join(shlex.quote(c) for c in cmd), flush=True)
-    proc = subprocess.run(cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    text = proc.stdout or ""
-    log_path.write_text(text, encoding="utf-8")
+    params = build_params(args)
+    print(f"[TUNER] running: run_backtest_opt({args.symbols}, {params})", flush=True)
+    lines: List[str] = []
+
+    def _log(msg: str) -> None:
+        print(msg, flush=True)
+        lines.append(msg)
+
+    returncode = 0
+    rows: Dict[str, Dict[str, Any]] = {}
+    try:
+        rows = rows_from_result(run_backtest_opt(args.symbols, log=_log, **params))
+    except Exception:
+        returncode = 1
+        _log(traceback.format_exc())
+    log_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
-    rows = parse_backtest_output(text)
     profiles: Dict[str, Any] = {
         "_meta": {
             "version": "candidate_from_auto_param_tuner_v1",
@@ -242,8 +263,8 @@ def main() -> int:
             "interval": args.interval,
             "grid": args.grid,
             "short": args.short,
-            "command": cmd,
-            "returncode": proc.returncode,
+            "backtest_params": params,
+            "returncode": returncode,
             "apply_mode": "AUTO_APPLIED" if args.apply else "RECOMMEND_ONLY",
         }
     }
@@ -257,7 +278,7 @@ def main() -> int:
 
     candidate_path.write_text(json.dumps(profiles, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
     report = {
-        "ok": proc.returncode == 0,
+        "ok": returncode == 0,
         "run_id": run_id,
         "log_path": str(log_path),
         "candidate_path": str(candidate_path),
@@ -293,7 +314,7 @@ def main() -> int:
     else:
         print("[TUNER] recommend only. 검토 후 candidate_symbol_profiles.json 내용을 symbol_profiles.json에 반영해.")
 
-    return 0 if proc.returncode == 0 else proc.returncode
+    return returncode
 
 
 if __name__ == "__main__":
@@ -7,13 +7,13 @@ from __future__ import annotations
 import argparse
 import json
 import os
-import subprocess
-import sys
 import time
+import traceback
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
-from backtest_reporter import parse_backtest_log, summarize
+from backtest_reporter import summarize
+from run_backtest_opt import load_candles, run_backtest_opt
 
 
 def _env(name: str, default: str = "") -> str:
@@ -34,19 +34,46 @@ def _int(name: str, default: int) -> int:
         return int(default)
 
 
+def summary_rows(res: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """run_backtest_opt() best rows -> backtest_reporter row shape (params included)."""
+    rows: List[Dict[str, Any]] = []
+    for sym, best in (res.get("best_by_symbol") or {}).items():
+        if not best or "error" in best:
+            continue
+        p = best.get("params") or {}
+        bal = float(best["balance_pct"])
+        rows.append({
+            "symbol": sym,
+            "bal_pct": bal,
+            "return_pct": bal - 100.0,
+            "winrate_pct": float(best["winrate"]),
+            "trades": int(best["trades"]),
+            "enter_score": float(p.get("enter_score", 0)),
+            "sl_atr": float(p.get("sl_atr", 0)),
+            "tp_r": float(p.get("tp_atr", 0)),
+        })
+    return rows
+
+
 def run_backtest(symbols: str, days: int, interval: str, grid: str, short: str, run_id: str) -> Tuple[Path, Dict[str, Any]]:
     log = Path(f"data/backtests/tune_v2_{days}d_{run_id}.log")
     log.parent.mkdir(parents=True, exist_ok=True)
-    cmd = [sys.executable, "run_backtest_opt.py", "--symbols", symbols, "--interval", interval, "--days", str(days), "--grid", grid, "--short", short]
-    print("RUN", " ".join(cmd))
+    print(f"RUN run_backtest_opt({symbols}, interval={interval}, days={days}, grid={grid}, short={short})")
     with log.open("w", encoding="utf-8") as f:
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        assert p.stdout is not None
-        for line in p.stdout:
-            print(line, end="")
-            f.write(line)
-        p.wait()
-    return log, summarize(parse_backtest_log(log))
+        def _log(msg: str) -> None:
+            print(msg)
+            f.write(msg + "\n")
+
+        try:
+            res = run_backtest_opt(symbols, interval=interval, days=days, grid=grid == "on", allow_short=short == "on", log=_log)
+        except Exception:
+            _log(traceback.format_exc())
+            res = {}
+        for r in res.get("summary") or []:
+            p = r["params"]
+            _log(f"{r['symbol']:10s} bal={r['balance_pct']:7.2f}% win={r['winrate']:6.2f}% trades={r['trades']:4d}  "
+                 f"enter={p['enter_score']} sl={p['sl_atr']} tp={p['tp_atr']} short={p['short']} timeBars={p['time_exit_bars']}")
+    return log, summarize(summary_rows(res))
 
 
 def grade_candidate(rows_by_days: Dict[int, Dict[str, Any]], symbol: str) -> Dict[str, Any]:
@@ -106,6 +133,12 @@ def main() -> None:
     run_id = time.strftime("%Y%m%d_%H%M%S")
     rows_by_days: Dict[int, Dict[str, Any]] = {}
     logs: Dict[int, str] = {}
+    # 가장 긴 window를 한 번만 받아두면 나머지 window는 메모리에서 잘라 쓴다.
+    for sym in symbols if windows else []:
+        try:
+            load_candles("linear", sym, args.interval, max(windows), outdir="data", log=print)
+        except Exception as e:
+            print(f"❌ {sym}: download error: {e}")
     for d in windows:
         log, summary = run_backtest(",".join(symbols), d, args.interval, args.grid, args.short, run_id)
         rows_by_days[d] = summary
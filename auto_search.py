@@ -3,11 +3,10 @@
 
 import itertools
 import json
-import re
-import subprocess
-import sys
 from pathlib import Path
 
+from run_backtest_opt import run_backtest_opt
+
 SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "AVAXUSDT"]
 MODES = ["long", "short"]
 ENTER_SCORES = [55, 60, 65, 70, 75]
@@ -19,10 +18,6 @@ MIN_TRADES = 50
 MIN_WIN = 45.0
 MIN_BAL = 100.0
 
-PAT = re.compile(
-    r"🏆\s+(?P<symbol>[A-Z0-9]+):\s+trades=(?P<trades>\d+)\s+win=(?P<win>[\d.]+)%\s+bal=(?P<bal>[\d.]+)%"
-)
-
 def score_row(row):
     bal = row["bal"]
     win = row["win"]
@@ -31,34 +26,34 @@ def score_row(row):
     return bal + (win * 0.25) + trade_bonus
 
 def run_bt(sym, mode, e, sl, tp, texit):
-    short_flag = "on" if mode == "short" else "off"
-    cmd = [
-        sys.executable, "run_backtest_opt.py",
-        "--symbols", sym,
-        "--interval", "15",
-        "--days", "180",
-        "--enter_score", str(e),
-        "--sl_atr", str(sl),
-        "--tp_atr", str(tp),
-        "--short", short_flag,
-    ]
-    if texit > 0:
-        cmd += ["--time_exit_bars", str(texit)]
-    p = subprocess.run(cmd, capture_output=True, text=True)
-    out = (p.stdout or "") + "\n" + (p.stderr or "")
-    m = PAT.search(out)
-    if not m:
-        return None, out[-500:]
+    # in-process: candles / indicator series / results stay cached across the whole grid
+    try:
+        res = run_backtest_opt(
+            sym,
+            interval="15",
+            days=180,
+            enter_score=e,
+            sl_atr=sl,
+            tp_atr=tp,
+            allow_short=(mode == "short"),
+            time_exit_bars=texit,
+            log=None,
+        )
+    except Exception as ex:
+        return None, f"{type(ex).__name__}: {ex}"
+    best = res["best_by_symbol"].get(sym.upper())
+    if not best or "error" in best:
+        return None, res["errors"].get(sym.upper(), "no result")
     row = {
-        "symbol": m.group("symbol"),
+        "symbol": best["symbol"],
         "mode": mode,
         "enter_score": e,
         "sl_atr": sl,
         "tp_atr": tp,
         "time_exit_bars": texit,
-        "trades": int(m.group("trades")),
-        "win": float(m.group("win")),
-        "bal": float(m.group("bal")),
+        "trades": int(best["trades"]),
+        "win": float(best["winrate"]),
+        "bal": float(best["balance_pct"]),
     }
     row["score"] = round(score_row(row), 4)
     row["usable"] = bool(row["trades"] >= MIN_TRADES and row["win"] >= MIN_WIN and row["bal"] >= MIN_BAL)
@@ -2,6 +2,9 @@ import csv
 import math
 import argparse
 
+import candle_store
+import indicators as ind
+
 # =========================
 # OPTIONAL AI LEARN IMPORT
 # =========================
@@ -19,6 +22,9 @@ except Exception:
 
 # ========= CSV 로드 =========
 def load_csv(path):
+    # candle_store 디렉터리(data/candles/BTCUSDT_15)도 그대로 받음
+    if candle_store.is_store(path):
+        return candle_store.load(path).to_dicts(fields=("open", "high", "low", "close"))
     candles = []
     with open(path, newline="") as f:
         reader = csv.DictReader(f)
@@ -33,60 +39,23 @@ def load_csv(path):
 
 # ========= EMA =========
 def ema(values, period):
-    result = []
-    k = 2 / (period + 1)
-    ema_prev = values[0]
-    for v in values:
-        ema_prev = v * k + ema_prev * (1 - k)
-        result.append(ema_prev)
-    return result
+    return ind.ema(values, period).tolist()
 
 # ========= RSI =========
 def rsi(values, period=14):
-    gains = []
-    losses = []
-    rsis = []
-
-    for i in range(1, len(values)):
-        diff = values[i] - values[i - 1]
-        gains.append(max(diff, 0))
-        losses.append(max(-diff, 0))
-
-        if i < period:
-            rsis.append(50)
-            continue
-
-        avg_gain = sum(gains[i-period:i]) / period
-        avg_loss = sum(losses[i-period:i]) / period
-
-        if avg_loss == 0:
-            rsis.append(100)
-        else:
-            rs = avg_gain / avg_loss
-            rsis.append(100 - (100 / (1 + rs)))
-
-    rsis.insert(0, 50)
-    return rsis
+    if len(values) < 2:
+        return [50]
+    r = ind.rsi(values, period, zero_loss="100")
+    return [50.0 if math.isnan(v) else v for v in r.tolist()]
 
 # ========= ATR =========
 def atr(candles, period=14):
-    trs = []
-    for i in range(1, len(candles)):
-        high = candles[i]["high"]
-        low = candles[i]["low"]
-        prev_close = candles[i-1]["close"]
-        tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-        trs.append(tr)
-
-    atrs = []
-    for i in range(len(trs)):
-        if i < period:
-            atrs.append(trs[i])
-        else:
-            atrs.append(sum(trs[i-period:i]) / period)
-
-    atrs.insert(0, atrs[0] if atrs else 0.0)
-    return atrs
+    if not candles:
+        return []
+    highs = [c["high"] for c in candles]
+    lows = [c["low"] for c in candles]
+    closes = [c["close"] for c in candles]
+    return ind.atr(highs, lows, closes, period, method="lagged").tolist()
 
 # ========= 백테스트 =========
 def backtest(candles, fee=0.0006, slip=0.0005, learn=False, learn_weight=0.5, use_learn_enter_score=True):
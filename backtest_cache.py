@@ -0,0 +1,302 @@
+"""backtest_cache.py
+
+Persistent, content-addressed backtest result cache.
+
+Tuning sessions (auto_param_tuner_v2, walkforward_validator, run_backtest_opt
+--grid, run_backtest_opt_winrate grid_search, optimizer.grid_search) keep
+re-evaluating the same (candles, params) cells across runs and windows. Here a
+result is stored under
+
+    sha1(engine version | data fingerprint | normalized params)
+
+- engine version: caller name + sha1 of the engine's source files, so editing the
+  backtest code invalidates its cells on its own (no manual version bumps)
+- data fingerprint: sha1 of the candle columns actually simulated
+- params: sorted-key JSON, ints/floats/bools normalized, numpy scalars unwrapped
+
+Re-running a grid after changing one axis hits every untouched cell.
+
+Storage: stdlib sqlite3 (WAL) at $BT_CACHE_PATH (default data/backtest_cache.db),
+payload = zlib(JSON) so metrics and full trade lists both fit. LRU eviction
+keeps the file under BT_CACHE_MAX_MB (default 512). BT_CACHE=0 disables it.
+
+    python backtest_cache.py stats
+    python backtest_cache.py clear [--engine run_backtest_opt]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+try:
+    from storage_utils import data_path
+except Exception:  # pragma: no cover
+    def data_path(name: str) -> str:
+        Path("data").mkdir(exist_ok=True)
+        return str(Path("data") / name)
+
+
+def _env_bool(name: str, default: bool = True) -> bool:
+    raw = str(os.getenv(name, str(default))).strip().lower()
+    if raw in ("1", "true", "yes", "y", "on"):
+        return True
+    if raw in ("0", "false", "no", "n", "off"):
+        return False
+    return bool(default)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except Exception:
+        return float(default)
+
+
+# ---------------- keys ----------------
+_SRC_VERSIONS: dict[tuple, str] = {}
+
+
+def source_version(name: str, *paths: str) -> str:
+    """'name:<sha1 of the source files>' — changes whenever the engine code changes."""
+    key = (name,) + tuple(os.path.abspath(p) for p in paths)
+    v = _SRC_VERSIONS.get(key)
+    if v is None:
+        h = hashlib.sha1()
+        for p in key[1:]:
+            try:
+                h.update(Path(p).read_bytes())
+            except Exception:
+                h.update(p.encode())
+        v = _SRC_VERSIONS[key] = f"{name}:{h.hexdigest()[:12]}"
+    return v
+
+
+def fingerprint(*arrays: Any) -> str:
+    """sha1 over float64 columns (numpy arrays, lists, pandas Series/frames)."""
+    import numpy as np
+
+    h = hashlib.sha1()
+    for a in arrays:
+        if hasattr(a, "to_numpy"):
+            a = a.to_numpy()
+        arr = np.ascontiguousarray(np.asarray(a, dtype=np.float64))
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def candles_fingerprint(candles: list[dict], fields: Iterable[str] = ("open", "high", "low", "close")) -> str:
+    import numpy as np
+
+    fields = tuple(fields)
+    arr = np.asarray([[c.get(f, 0.0) for f in fields] for c in candles], dtype=np.float64).reshape(len(candles), len(fields))
+    return fingerprint(arr)
+
+
+def _norm(v: Any) -> Any:
+    if isinstance(v, dict):
+        return {str(k): _norm(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_norm(x) for x in v]
+    if hasattr(v, "item") and callable(v.item):  # numpy scalar
+        v = v.item()
+    if isinstance(v, bool) or v is None or isinstance(v, str):
+        return v
+    if isinstance(v, int):
+        return v
+    if isinstance(v, float):
+        return float(repr(v)) if v == v else "nan"
+    return str(v)
+
+
+def make_key(engine: str, data_fp: str, params: Any) -> str:
+    blob = json.dumps([engine, data_fp, _norm(params)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+# ---------------- store ----------------
+class ResultCache:
+    """
+    get(key) / get_many(keys) / put(key, obj) / memo(engine, data_fp, params, fn)
+    One sqlite connection per (process, thread); safe across worker processes.
+    """
+
+    def __init__(self, path: str | None = None, max_mb: float | None = None, enabled: bool | None = None):
+        self.path = str(path or os.getenv("BT_CACHE_PATH") or data_path("backtest_cache.db"))
+        self.max_bytes = int((_env_float("BT_CACHE_MAX_MB", 512.0) if max_mb is None else float(max_mb)) * 1024 * 1024)
+        self.enabled = _env_bool("BT_CACHE", True) if enabled is None else bool(enabled)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.stats = {"hit": 0, "miss": 0, "put": 0, "evicted": 0}
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is not None and getattr(self._local, "pid", None) == os.getpid():
+            return con
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, engine TEXT, created REAL, last_used REAL, size INTEGER, payload BLOB)"
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS idx_results_lru ON results(last_used)")
+        con.commit()
+        self._local.con, self._local.pid = con, os.getpid()
+        return con
+
+    def get(self, key: str) -> Any | None:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled or not keys:
+            return {}
+        out: dict[str, Any] = {}
+        con = self._con()
+        try:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                q = ",".join("?" * len(part))
+                for k, payload in con.execute(f"SELECT key, payload FROM results WHERE key IN ({q})", part):
+                    try:
+                        out[k] = json.loads(zlib.decompress(payload))
+                    except Exception:
+                        continue
+                if out:
+                    now = time.time()
+                    con.executemany("UPDATE results SET last_used=? WHERE key=?", [(now, k) for k in part if k in out])
+            con.commit()
+        except sqlite3.Error:
+            return out
+        with self._lock:
+            self.stats["hit"] += len(out)
+            self.stats["miss"] += len(keys) - len(out)
+        return out
+
+    def put(self, key: str, obj: Any, engine: str = ""):
+        self.put_many([(key, obj)], engine=engine)
+
+    def put_many(self, items: Iterable[tuple[str, Any]], engine: str = ""):
+        if not self.enabled:
+            return
+        now = time.time()
+        rows = []
+        for k, obj in items:
+            try:
+                payload = zlib.compress(json.dumps(obj, separators=(",", ":"), default=str).encode(), 6)
+            except Exception:
+                continue
+            rows.append((k, engine, now, now, len(payload), payload))
+        if not rows:
+            return
+        try:
+            con = self._con()
+            con.executemany("INSERT OR REPLACE INTO results(key, engine, created, last_used, size, payload) VALUES (?,?,?,?,?,?)", rows)
+            con.commit()
+        except sqlite3.Error:
+            return
+        with self._lock:
+            self.stats["put"] += len(rows)
+            self._puts += len(rows)
+            check = self._puts >= 256
+            if check:
+                self._puts = 0
+        if check:
+            self.evict()
+
+    def memo(self, engine: str, data_fp: str, params: Any, fn: Callable[[], Any]) -> Any:
+        key = make_key(engine, data_fp, params)
+        hit = self.get(key)
+        if hit is not None:
+            return hit
+        res = fn()
+        self.put(key, res, engine=engine)
+        return res
+
+    def evict(self) -> int:
+        """LRU: drop least recently used rows until the payload total is under 90% of max."""
+        try:
+            con = self._con()
+            total = int(con.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0])
+            if total <= self.max_bytes:
+                return 0
+            target = int(self.max_bytes * 0.9)
+            drop, freed = [], 0
+            for k, size in con.execute("SELECT key, size FROM results ORDER BY last_used ASC"):
+                if total - freed <= target:
+                    break
+                drop.append((k,))
+                freed += int(size or 0)
+            con.executemany("DELETE FROM results WHERE key=?", drop)
+            con.commit()
+        except sqlite3.Error:
+            return 0
+        with self._lock:
+            self.stats["evicted"] += len(drop)
+        return len(drop)
+
+    def clear(self, engine: str | None = None) -> int:
+        con = self._con()
+        if engine:
+            cur = con.execute("DELETE FROM results WHERE engine LIKE ?", (f"{engine}%",))
+        else:
+            cur = con.execute("DELETE FROM results")
+        con.commit()
+        return int(cur.rowcount or 0)
+
+    def summary(self) -> dict:
+        con = self._con()
+        rows = con.execute("SELECT engine, COUNT(*), COALESCE(SUM(size), 0) FROM results GROUP BY engine ORDER BY engine").fetchall()
+        return {
+            "path": self.path,
+            "enabled": self.enabled,
+            "max_mb": round(self.max_bytes / 1024 / 1024, 1),
+            "engines": {e: {"rows": n, "mb": round(b / 1024 / 1024, 3)} for e, n, b in rows},
+            "session": dict(self.stats),
+        }
+
+
+_DEFAULT: ResultCache | None = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default() -> ResultCache:
+    """Process-wide cache (env read on first use)."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None or (_DEFAULT.path != str(os.getenv("BT_CACHE_PATH") or _DEFAULT.path)):
+            _DEFAULT = ResultCache()
+        return _DEFAULT
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="backtest result cache")
+    ap.add_argument("cmd", choices=["stats", "clear", "evict"])
+    ap.add_argument("--engine", default=None)
+    args = ap.parse_args(argv)
+    c = default()
+    if args.cmd == "clear":
+        print(f"deleted {c.clear(args.engine)} row(s)")
+    elif args.cmd == "evict":
+        print(f"evicted {c.evict()} row(s)")
+    print(json.dumps(c.summary(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+"""bybit_rate_limiter.py
+
+Client-side pacing for BybitHTTP.
+
+- One token bucket per endpoint class (market / position / order / account / other).
+- Bybit's `X-Bapi-Limit-Status` (remaining) and `X-Bapi-Limit-Reset-Timestamp`
+  response headers pause a class *before* the exchange starts answering 10006.
+- Per-endpoint latency histograms for /health.
+
+Dependency-free and thread-safe so concurrent scans can share one limiter.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Mapping
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except Exception:
+        return float(default)
+
+
+# requests/sec defaults; Bybit's real per-UID/IP limits are higher, keep headroom.
+_DEFAULT_RATES = {
+    "market": 20.0,
+    "position": 10.0,
+    "order": 10.0,
+    "account": 5.0,
+    "other": 5.0,
+}
+
+LATENCY_BUCKETS_MS = (25, 50, 100, 200, 400, 800, 1600, 3200)
+
+
+def endpoint_class(path: str) -> str:
+    p = str(path or "")
+    if p.startswith("/v5/market"):
+        return "market"
+    if p.startswith("/v5/position"):
+        return "position"
+    if p.startswith("/v5/order") or p.startswith("/v5/execution"):
+        return "order"
+    if p.startswith("/v5/account") or p.startswith("/v5/asset"):
+        return "account"
+    return "other"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = max(0.1, float(rate))
+        self.burst = max(1.0, float(burst if burst is not None else rate))
+        self.tokens = self.burst
+        self.ts = time.monotonic()
+        self.paused_until = 0.0  # wall clock (exchange reset timestamp)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+
+    def reserve(self) -> float:
+        """Take one token; return how long the caller must sleep first."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.paused_until - time.time())
+        self.tokens -= 1.0
+        if self.tokens < 0:
+            wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+
+    def observe(self, ms: float, ok: bool = True):
+        i = 0
+        while i < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if not ok:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bucket bound containing quantile q (coarse, histogram based)."""
+        if self.n <= 0:
+            return None
+        target = q * self.n
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return round(min(float(LATENCY_BUCKETS_MS[i]), self.max_ms), 1) if i < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 1)
+        return self.max_ms
+
+    def summary(self) -> dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "n": self.n,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.n, 1) if self.n else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": {labels[i]: c for i, c in enumerate(self.counts) if c},
+        }
+
+
+class EndpointRateLimiter:
+    """
+    acquire(path) before each request, observe(path, headers, ms) after it.
+    - low remaining quota in the headers pauses the class until the reset timestamp
+    - throttled(path) is called on retCode 10006 to back the whole class off
+    """
+
+    def __init__(self, low_watermark: float | None = None):
+        self.low_watermark = _env_float("BYBIT_LIMIT_LOW_WATERMARK", 0.1) if low_watermark is None else float(low_watermark)
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._hist: dict[str, LatencyHistogram] = {}
+        self._waits = {"count": 0, "total_sec": 0.0, "throttled": 0, "header_pauses": 0}
+
+    def _bucket(self, cls: str) -> TokenBucket:
+        b = self._buckets.get(cls)
+        if b is None:
+            rate = _env_float(f"BYBIT_RATE_{cls.upper()}", _DEFAULT_RATES.get(cls, 5.0))
+            b = TokenBucket(rate, _env_float(f"BYBIT_BURST_{cls.upper()}", rate))
+            self._buckets[cls] = b
+        return b
+
+    def acquire(self, path: str) -> float:
+        cls = endpoint_class(path)
+        with self._lock:
+            wait = self._bucket(cls).reserve()
+            if wait > 0:
+                self._waits["count"] += 1
+                self._waits["total_sec"] += wait
+        if wait > 0:
+            time.sleep(min(wait, 10.0))
+        return wait
+
+    def observe(self, path: str, headers: Mapping[str, Any] | None, ms: float, ok: bool = True):
+        cls = endpoint_class(path)
+        with self._lock:
+            h = self._hist.get(path)
+            if h is None:
+                h = self._hist[path] = LatencyHistogram()
+            h.observe(ms, ok)
+            if not headers:
+                return
+            try:
+                limit = float(headers.get("X-Bapi-Limit") or 0)
+                remaining = headers.get("X-Bapi-Limit-Status")
+                reset_ms = headers.get("X-Bapi-Limit-Reset-Timestamp")
+                if remaining is None or reset_ms is None:
+                    return
+                remaining = float(remaining)
+                floor = max(1.0, limit * self.low_watermark) if limit > 0 else 1.0
+                if remaining <= floor:
+                    b = self._bucket(cls)
+                    b.paused_until = max(b.paused_until, float(reset_ms) / 1000.0)
+                    self._waits["header_pauses"] += 1
+            except Exception:
+                return
+
+    def throttled(self, path: str, pause_sec: float):
+        cls = endpoint_class(path)
+        with self._lock:
+            b = self._bucket(cls)
+            b.paused_until = max(b.paused_until, time.time() + max(0.0, float(pause_sec)))
+            b.tokens = min(b.tokens, 0.0)
+            self._waits["throttled"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "waits": {k: (round(v, 3) if isinstance(v, float) else v) for k, v in self._waits.items()},
+                "classes": {
+                    k: {"rate": b.rate, "burst": b.burst, "paused_for": round(max(0.0, b.paused_until - time.time()), 2)}
+                    for k, b in self._buckets.items()
+                },
+                "latency": {p: h.summary() for p, h in sorted(self._hist.items())},
+            }
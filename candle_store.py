@@ -0,0 +1,582 @@
+"""candle_store.py
+
+Columnar, memory-mapped candle store.
+
+data_store used to keep every symbol as `data/{SYMBOL}_{interval}.json`
+(indent=2, one dict per candle): ~10x the raw size, and every load json-parsed
+the whole file into Python dicts. Here one (symbol, interval) is a directory
+
+    data/candles/{SYMBOL}_{interval}/
+        ts.{gen}.npy                     int64  open time (ms, ascending, unique)
+        open/high/low/close/volume.{gen}.npy  float64
+        meta.json                        {"n": rows in use, "capacity": ..., "gen": ...}
+        .lock                            writer lock (flock)
+
+- each column is a plain .npy opened with np.load(mmap_mode="r"): nothing is
+  read until a page is touched, and every view below is zero-copy
+- the files are preallocated to `capacity` rows (doubling), so append() only
+  writes the new tail rows -> amortized O(1); meta.json ("n") is replaced
+  atomically *after* the rows are written (shared mapping, so other processes
+  see them through the page cache), so a reader never sees half a row.
+  flush() msyncs the columns when durability matters more than append latency
+- growing / merge() / replace() write a whole new generation of column files
+  and then replace meta.json ("gen") atomically: that single rename is the
+  commit point, so a crash leaves either every old column or every new one
+  (stores written before "gen" existed keep their plain ts.npy names as gen 0)
+- writers from several processes / handles are serialized by an exclusive flock on
+  .lock; under it every append / merge / replace first re-reads meta.json and
+  reopens if another handle moved "n" or "gen", so nobody writes into an unlinked
+  generation or commits a stale one. Readers take no lock. Without fcntl
+  (Windows) only threads of one handle are serialized: keep a single writer process
+- range(start_ms, end_ms) is two searchsorted() calls over the ts column
+- a bar with the same ts as the last stored one replaces it (forming bar);
+  anything older than the tail goes through merge(), which rewrites the columns
+- the ts column doubles as the time index: gaps(step_ms) lists missing bars
+  so data_store.update_cache can backfill only the holes
+
+Migration from the legacy JSON (data_store) and CSV (download_kline_csv.py)
+files, one shot:
+
+    python candle_store.py migrate --data-dir data
+    python candle_store.py migrate --data-dir . --root data/candles --remove
+    python candle_store.py info data/candles/BTCUSDT_15
+
+The backtest loaders (backtest.load_csv, run_backtest_*.py) accept a store
+directory wherever they take a CSV path.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Iterable
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+PRICE_COLUMNS = ("open", "high", "low", "close")
+_DTYPES = {"ts": np.int64, "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64, "volume": np.float64}
+META = "meta.json"
+LOCK = ".lock"
+VERSION = 1
+MIN_CAPACITY = 1024
+
+_LEGACY_NAME = re.compile(r"^([A-Za-z0-9]+)_([0-9]+|[DWM])(m?)\.(json|csv)$")
+
+
+def default_root() -> str:
+    return os.getenv("CANDLE_STORE_DIR") or os.path.join((os.getenv("DATA_DIR") or "data").rstrip("/"), "candles")
+
+
+def store_path(symbol: str, interval: Any, root: str | None = None) -> str:
+    return os.path.join(root or default_root(), f"{str(symbol).upper()}_{str(interval)}")
+
+
+def is_store(path: Any) -> bool:
+    try:
+        return os.path.isfile(os.path.join(str(path), META))
+    except Exception:
+        return False
+
+
+def _atomic_json(path: str, obj: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _ts_ms(raw: Any) -> int | None:
+    """CSV/JSON timestamp (ms, sec, or an ISO date string) -> ms."""
+    if raw is None:
+        return None
+    try:
+        v = float(raw)
+        if v > 10_000_000_000:
+            return int(v)
+        if v > 0:
+            return int(v * 1000)
+        return None
+    except Exception:
+        pass
+    try:
+        import datetime as dt
+
+        s = str(raw).strip().replace("Z", "+00:00")
+        t = dt.datetime.fromisoformat(s)
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=dt.timezone.utc)
+        return int(t.timestamp() * 1000)
+    except Exception:
+        return None
+
+
+class CandleSlice:
+    """Zero-copy column views of one time range (numpy arrays, read-only)."""
+
+    __slots__ = COLUMNS
+
+    def __init__(self, cols: dict):
+        for c in COLUMNS:
+            setattr(self, c, cols[c])
+
+    def __len__(self) -> int:
+        return int(len(self.ts))
+
+    def columns(self) -> dict:
+        return {c: getattr(self, c) for c in COLUMNS}
+
+    def to_dicts(self, fields: Iterable[str] = COLUMNS) -> list[dict]:
+        """Legacy list-of-dicts shape (data_store / backtest.load_csv)."""
+        fields = tuple(fields)
+        lists = [getattr(self, c).tolist() for c in fields]
+        return [dict(zip(fields, row)) for row in zip(*lists)]
+
+    def to_frame(self):
+        """pandas frame indexed by UTC timestamp, like run_backtest_pro.load_csv."""
+        import pandas as pd
+
+        idx = pd.to_datetime(np.asarray(self.ts), unit="ms", utc=True)
+        df = pd.DataFrame({c: np.asarray(getattr(self, c), dtype="float64") for c in COLUMNS[1:]}, index=idx)
+        df.index.name = "timestamp"
+        return df
+
+
+class CandleStore:
+    """
+    One (symbol, interval) column directory.
+    - CandleStore(path) opens (or, with create=True, creates) the store
+    - .ts / .open / ... are mmap views of the rows in use
+    - append / merge / replace write; reads never copy
+    """
+
+    def __init__(self, path: str, create: bool = False, readonly: bool = False):
+        self.path = str(path)
+        self.readonly = bool(readonly)
+        self._lock = threading.RLock()
+        self._cols: dict[str, np.ndarray] = {}
+        self._meta_mtime = None
+        self._lock_fd = None
+        self.n = 0
+        self.capacity = 0
+        self.gen = 0
+        if not is_store(self.path):
+            if not create or self.readonly:
+                raise FileNotFoundError(f"candle store not found: {self.path}")
+            os.makedirs(self.path, exist_ok=True)
+            with self._file_lock():
+                # another process may have created it while we waited
+                if not is_store(self.path):
+                    self._allocate(MIN_CAPACITY, n=0)
+        self._open()
+
+    # ---------------- files ----------------
+    def _col_path(self, col: str, gen: int | None = None) -> str:
+        gen = self.gen if gen is None else int(gen)
+        return os.path.join(self.path, f"{col}.npy" if gen <= 0 else f"{col}.{gen}.npy")
+
+    def _read_meta(self) -> dict:
+        with open(os.path.join(self.path, META), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        _atomic_json(
+            os.path.join(self.path, META),
+            {"version": VERSION, "n": int(self.n), "capacity": int(self.capacity), "gen": int(self.gen), "columns": list(COLUMNS), "updated": int(time.time())},
+        )
+        try:
+            self._meta_mtime = os.stat(os.path.join(self.path, META)).st_mtime_ns
+        except Exception:
+            self._meta_mtime = None
+
+    def _open(self):
+        meta = self._read_meta()
+        mode = "r" if self.readonly else "r+"
+        self.gen = int(meta.get("gen") or 0)
+        self._cols = {c: np.load(self._col_path(c), mmap_mode=mode) for c in COLUMNS}
+        # every column of one generation is allocated with the same length; min() only
+        # guards against a hand-edited / truncated directory
+        self.capacity = min(int(len(a)) for a in self._cols.values())
+        self.n = max(0, min(int(meta.get("n") or 0), self.capacity))
+        try:
+            self._meta_mtime = os.stat(os.path.join(self.path, META)).st_mtime_ns
+        except Exception:
+            self._meta_mtime = None
+
+    def refresh(self):
+        """Pick up rows appended by another process (cheap when nothing changed)."""
+        with self._lock:
+            try:
+                mt = os.stat(os.path.join(self.path, META)).st_mtime_ns
+            except Exception:
+                return
+            if mt != self._meta_mtime:
+                self._open()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive .lock across processes (re-entrant within this handle)."""
+        with self._lock:
+            if self._lock_fd is not None:
+                yield
+                return
+            fd = os.open(os.path.join(self.path, LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self._lock_fd = fd
+                yield
+            finally:
+                self._lock_fd = None
+                os.close(fd)  # releases the flock
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Writer section: lock, then catch up with whatever the last writer committed."""
+        with self._file_lock():
+            # compare meta.json itself, not its mtime: two commits can share a timestamp
+            meta = self._read_meta()
+            if int(meta.get("gen") or 0) != self.gen or int(meta.get("n") or 0) != self.n or not self._cols:
+                self._open()
+            yield
+
+    def _allocate(self, capacity: int, n: int, src: dict | None = None):
+        """
+        Write every column with `capacity` rows (copying `src[:n]`) as the next
+        generation, then commit it with one atomic meta.json replace.
+        """
+        old_gen, gen = self.gen, self.gen + 1
+        for c in COLUMNS:
+            arr = np.lib.format.open_memmap(self._col_path(c, gen), mode="w+", dtype=_DTYPES[c], shape=(int(capacity),))
+            if src is not None and n:
+                arr[:n] = src[c][:n]
+            arr.flush()
+            del arr
+        self.n = int(n)
+        self.capacity = int(capacity)
+        self.gen = gen
+        self._cols = {}
+        self._write_meta()
+        # committed: the previous generation is garbage (open mmaps elsewhere stay valid)
+        for c in COLUMNS:
+            try:
+                os.remove(self._col_path(c, old_gen))
+            except OSError:
+                pass
+
+    def _ensure_capacity(self, need: int):
+        if need <= self.capacity:
+            return
+        cap = max(MIN_CAPACITY, self.capacity)
+        while cap < need:
+            cap *= 2
+        src = {c: np.array(self._cols[c][: self.n]) for c in COLUMNS}
+        self._cols = {}
+        self._allocate(cap, self.n, src)
+        self._open()
+
+    def flush(self):
+        for arr in self._cols.values():
+            try:
+                arr.flush()
+            except Exception:
+                pass
+
+    # ---------------- reads ----------------
+    def __len__(self) -> int:
+        return int(self.n)
+
+    def col(self, name: str) -> np.ndarray:
+        return self._cols[name][: self.n]
+
+    ts = property(lambda self: self.col("ts"))
+    open = property(lambda self: self.col("open"))
+    high = property(lambda self: self.col("high"))
+    low = property(lambda self: self.col("low"))
+    close = property(lambda self: self.col("close"))
+    volume = property(lambda self: self.col("volume"))
+
+    @property
+    def first_ts(self) -> int | None:
+        return int(self._cols["ts"][0]) if self.n else None
+
+    @property
+    def last_ts(self) -> int | None:
+        return int(self._cols["ts"][self.n - 1]) if self.n else None
+
+    def index_range(self, start_ms: int | None = None, end_ms: int | None = None) -> tuple[int, int]:
+        """Row bounds [i, j) with start_ms <= ts < end_ms."""
+        ts = self.ts
+        i = 0 if start_ms is None else int(np.searchsorted(ts, int(start_ms), side="left"))
+        j = self.n if end_ms is None else int(np.searchsorted(ts, int(end_ms), side="left"))
+        return i, max(i, j)
+
+    def range(self, start_ms: int | None = None, end_ms: int | None = None) -> CandleSlice:
+        i, j = self.index_range(start_ms, end_ms)
+        return CandleSlice({c: self._cols[c][i:j] for c in COLUMNS})
+
+    def gaps(self, step_ms: int, start_ms: int | None = None, end_ms: int | None = None) -> list[tuple[int, int]]:
+        """
+        Holes in the ts index: [(first_missing_ts, last_missing_ts), ...].
+        One np.diff over the (sorted) ts column, so it costs O(n) reads and no parsing.
+        """
+        step = int(step_ms)
+        if step <= 0:
+            return []
+        i, j = self.index_range(start_ms, end_ms)
+        ts = self.ts[i:j]
+        if len(ts) < 2:
+            return []
+        at = np.nonzero(np.diff(ts) > step)[0]
+        return [(int(ts[k]) + step, int(ts[k + 1]) - step) for k in at.tolist()]
+
+    def tail(self, count: int) -> CandleSlice:
+        i = max(0, self.n - max(0, int(count)))
+        return CandleSlice({c: self._cols[c][i : self.n] for c in COLUMNS})
+
+    def to_dicts(self, start_ms: int | None = None, end_ms: int | None = None, fields: Iterable[str] = COLUMNS) -> list[dict]:
+        return self.range(start_ms, end_ms).to_dicts(fields)
+
+    def to_frame(self, start_ms: int | None = None, end_ms: int | None = None):
+        return self.range(start_ms, end_ms).to_frame()
+
+    # ---------------- writes ----------------
+    @staticmethod
+    def _columns_from(rows: Any) -> dict:
+        """dict rows / CandleSlice / column dict -> ts-sorted, de-duplicated numpy columns."""
+        if isinstance(rows, CandleSlice):
+            cols = rows.columns()
+        elif isinstance(rows, dict):
+            cols = rows
+        else:
+            rows = list(rows or [])
+            cols = {c: [r.get(c, 0) if c != "ts" else r.get("ts") for r in rows] for c in COLUMNS}
+        n = len(cols["ts"])
+        out = {}
+        for c in COLUMNS:
+            v = cols.get(c)
+            out[c] = np.zeros(n, dtype=_DTYPES[c]) if v is None else np.asarray(v, dtype=_DTYPES[c]).reshape(-1)
+        if n:
+            # last occurrence of a duplicated ts wins (same rule as the forming bar)
+            order = np.argsort(out["ts"], kind="stable")
+            ts_sorted = out["ts"][order]
+            keep = np.append(ts_sorted[1:] != ts_sorted[:-1], True)
+            order = order[keep]
+            out = {c: out[c][order] for c in COLUMNS}
+        return out
+
+    def append(self, rows: Any) -> int:
+        """
+        Append bars newer than the tail (O(new rows)). A bar equal to the last ts
+        replaces it. Older bars are routed to merge(). Returns rows added.
+        """
+        if self.readonly:
+            raise PermissionError("candle store opened read-only")
+        new = self._columns_from(rows)
+        m = len(new["ts"])
+        if not m:
+            return 0
+        with self._writing():
+            last = self.last_ts
+            if last is not None and int(new["ts"][0]) < last:
+                return self.merge(new)
+            start = self.n
+            if last is not None and int(new["ts"][0]) == last:
+                start = self.n - 1
+            end = start + m
+            self._ensure_capacity(end)
+            for c in COLUMNS:
+                self._cols[c][start:end] = new[c]
+            added = end - self.n
+            self.n = end
+            self._write_meta()
+            return added
+
+    def merge(self, rows: Any) -> int:
+        """Upsert bars anywhere in the series (rewrites the columns). Returns rows added."""
+        if self.readonly:
+            raise PermissionError("candle store opened read-only")
+        new = self._columns_from(rows)
+        if not len(new["ts"]):
+            return 0
+        with self._writing():
+            before = self.n
+            old = {c: np.array(self._cols[c][: self.n]) for c in COLUMNS}
+            both = {c: np.concatenate([old[c], new[c]]) for c in COLUMNS}
+            self._replace_cols(self._columns_from(both))
+            return self.n - before
+
+    def replace(self, rows: Any) -> int:
+        """Overwrite the whole series (data_store.save_candles)."""
+        if self.readonly:
+            raise PermissionError("candle store opened read-only")
+        with self._writing():
+            self._replace_cols(self._columns_from(rows))
+            return self.n
+
+    def _replace_cols(self, cols: dict):
+        n = len(cols["ts"])
+        cap = max(MIN_CAPACITY, self.capacity)
+        while cap < n:
+            cap *= 2
+        self._cols = {}
+        self._allocate(cap, n, cols)
+        self._open()
+
+    def info(self) -> dict:
+        return {
+            "path": self.path,
+            "n": int(self.n),
+            "capacity": int(self.capacity),
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "bytes": sum(os.path.getsize(self._col_path(c)) for c in COLUMNS if os.path.exists(self._col_path(c))),
+        }
+
+
+# ---------------- module helpers ----------------
+_OPEN: dict[str, CandleStore] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+def open_store(symbol: str, interval: Any, root: str | None = None, create: bool = False) -> CandleStore | None:
+    """Shared handle per store directory; None if missing and create=False."""
+    return open_path(store_path(symbol, interval, root), create=create)
+
+
+def open_path(path: str, create: bool = False) -> CandleStore | None:
+    key = os.path.abspath(str(path))
+    with _OPEN_LOCK:
+        st = _OPEN.get(key)
+        if st is not None:
+            st.refresh()
+            return st
+        if not create and not is_store(key):
+            return None
+        st = CandleStore(key, create=create)
+        _OPEN[key] = st
+        return st
+
+
+def load(path: str) -> CandleStore:
+    """Open an existing store directory for the backtest loaders."""
+    st = open_path(path)
+    if st is None:
+        raise FileNotFoundError(f"candle store not found: {path}")
+    return st
+
+
+# ---------------- migration ----------------
+def read_legacy_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        rows = json.load(f) or []
+    out = []
+    for r in rows:
+        try:
+            ts = _ts_ms(r.get("ts") if isinstance(r, dict) else r[0])
+            if ts is None:
+                continue
+            if isinstance(r, dict):
+                out.append({"ts": ts, "open": float(r["open"]), "high": float(r["high"]), "low": float(r["low"]),
+                            "close": float(r["close"]), "volume": float(r.get("volume") or 0.0)})
+            else:
+                out.append({"ts": ts, "open": float(r[1]), "high": float(r[2]), "low": float(r[3]), "close": float(r[4]),
+                            "volume": float(r[5]) if len(r) > 5 else 0.0})
+        except Exception:
+            continue
+    return CandleStore._columns_from(out)
+
+
+def read_legacy_csv(path: str) -> dict:
+    out = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames:
+            return CandleStore._columns_from([])
+        norm = {name: name.lower().strip() for name in reader.fieldnames}
+        for raw in reader:
+            r = {norm[k]: v for k, v in raw.items() if k is not None}
+            try:
+                ts = _ts_ms(r.get("ts") or r.get("timestamp") or r.get("time") or r.get("datetime") or r.get("date"))
+                if ts is None:
+                    continue
+                row = {"ts": ts, "open": float(r["open"]), "high": float(r["high"]), "low": float(r["low"]),
+                       "close": float(r["close"]), "volume": float(r.get("volume") or 0.0)}
+            except Exception:
+                continue
+            if row["open"] > 0 and row["high"] > 0 and row["low"] > 0 and row["close"] > 0:
+                out.append(row)
+    return CandleStore._columns_from(out)
+
+
+def migrate_file(path: str, root: str | None = None, remove: bool = False) -> tuple[str, int] | None:
+    """Legacy SYMBOL_15.json / SYMBOL_15m.csv -> store. Merges into an existing store."""
+    m = _LEGACY_NAME.match(os.path.basename(path))
+    if not m:
+        return None
+    symbol, interval, _, ext = m.groups()
+    cols = read_legacy_json(path) if ext == "json" else read_legacy_csv(path)
+    if not len(cols["ts"]):
+        return None
+    st = open_store(symbol, interval, root=root, create=True)
+    if len(st):
+        st.merge(cols)
+    else:
+        st.replace(cols)
+    if remove:
+        os.remove(path)
+    return st.path, len(st)
+
+
+def migrate(data_dir: str = "data", root: str | None = None, remove: bool = False, log=print) -> list[tuple[str, str, int]]:
+    done = []
+    for name in sorted(os.listdir(data_dir)):
+        p = os.path.join(data_dir, name)
+        if not os.path.isfile(p):
+            continue
+        try:
+            res = migrate_file(p, root=root, remove=remove)
+        except Exception as e:
+            if log:
+                log(f"[CANDLE_STORE] skip {p}: {e}")
+            continue
+        if res is None:
+            continue
+        done.append((p, res[0], res[1]))
+        if log:
+            log(f"[CANDLE_STORE] {p} -> {res[0]} ({res[1]} rows)")
+    return done
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="columnar candle store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    mg = sub.add_parser("migrate", help="convert SYMBOL_interval.json/.csv files")
+    mg.add_argument("--data-dir", default="data")
+    mg.add_argument("--root", default=None, help="store root (default: $CANDLE_STORE_DIR or $DATA_DIR/candles)")
+    mg.add_argument("--remove", action="store_true", help="delete each legacy file after it is migrated")
+    inf = sub.add_parser("info", help="print store metadata")
+    inf.add_argument("path")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "migrate":
+        done = migrate(args.data_dir, root=args.root, remove=args.remove)
+        print(f"[CANDLE_STORE] migrated {len(done)} file(s)")
+        return 0
+    print(json.dumps(load(args.path).info(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
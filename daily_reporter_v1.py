@@ -34,6 +34,16 @@ except Exception:  # pragma: no cover
         except Exception:
             return default
 
+try:
+    from storage_utils import read_jsonl_since
+except Exception:  # pragma: no cover
+    read_jsonl_since = None
+
+try:
+    import trade_logger
+except Exception:  # pragma: no cover
+    trade_logger = None
+
 
 def _env_bool(name: str, default: bool = False) -> bool:
     raw = str(os.getenv(name, str(default))).strip().lower()
@@ -61,6 +71,11 @@ DAILY_REPORT_HOUR_KST = _env_int("DAILY_REPORT_HOUR_KST", 9)
 
 
 def _read_jsonl_recent(path: str, since_ts: float, limit: int = 5000) -> list[dict[str, Any]]:
+    if read_jsonl_since is not None:
+        try:
+            return read_jsonl_since(path, since_ts, limit=limit)
+        except Exception:
+            pass
     p = Path(path)
     if not p.exists():
         return []
@@ -79,6 +94,16 @@ def _read_jsonl_recent(path: str, since_ts: float, limit: int = 5000) -> list[di
     return out
 
 
+def _read_trades_recent(path: str, since_ts: float, limit: int = 5000) -> list[dict[str, Any]]:
+    # loss_events.jsonl 은 trade_logger 인덱스로 since 구간만 읽는다 (전체 파일 스캔 없음)
+    if trade_logger is None:
+        return _read_jsonl_recent(path, since_ts, limit)
+    try:
+        return trade_logger.open_log(path).since(since_ts, limit=limit)
+    except Exception:
+        return _read_jsonl_recent(path, since_ts, limit)
+
+
 def _top_counts(vals: list[str], limit: int = 5) -> list[tuple[str, int]]:
     d: dict[str, int] = {}
     for v in vals:
@@ -92,7 +117,7 @@ def build_daily_report(now: float | None = None) -> str:
     now = time.time() if now is None else float(now)
     since = now - 24 * 3600
     decisions = _read_jsonl_recent(DECISION_LOG_PATH, since)
-    losses = _read_jsonl_recent(LOSS_EVENTS_PATH, since)
+    losses = _read_trades_recent(LOSS_EVENTS_PATH, since)
     symbol_stats = safe_read_json(SYMBOL_STATS_PATH, {"symbols": {}})
 
     pass_cnt = 0
@@ -1,7 +1,8 @@
 # ===== file: data_store.py =====
-# ✅ Bybit 과거 캔들 수집 -> 로컬 캐시(json)로 저장
+# ✅ Bybit 과거 캔들 수집 -> 로컬 캐시(컬럼 저장소)로 저장
 # - DRY_RUN에서도 학습/백테스트는 가능(과거캔들은 API 필요)
-# - 저장 위치: data/{symbol}_{interval}.json
+# - 저장 위치: data/candles/{symbol}_{interval}/ (candle_store, 컬럼별 .npy + mmap)
+#   예전 data/{symbol}_{interval}.json 은 처음 읽을 때 자동 이전 (CANDLE_STORE=0 이면 json 그대로)
 
 import os
 import json
@@ -9,6 +10,10 @@ import time
 import requests
 from typing import List, Dict, Any
 
+import candle_store
+import kline_downloader
+from market_data_cache import interval_seconds
+
 BYBIT_BASE_URL = os.getenv("BYBIT_BASE_URL", "https://api.bybit.com").rstrip("/")
 CATEGORY = os.getenv("CATEGORY", "linear")
 PROXY = os.getenv("HTTPS_PROXY") or os.getenv("HTTP_PROXY") or ""
@@ -16,11 +21,29 @@ PROXIES = {"http": PROXY, "https": PROXY} if PROXY else None
 HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "application/json"}
 
 DATA_DIR = "data"
+LEGACY_FIELDS = ("ts", "open", "high", "low", "close")
+
+def _use_store() -> bool:
+    return str(os.getenv("CANDLE_STORE", "1")).strip().lower() not in ("0", "false", "no", "off")
 
 def _path(symbol: str, interval: str) -> str:
     os.makedirs(DATA_DIR, exist_ok=True)
     return os.path.join(DATA_DIR, f"{symbol.upper()}_{str(interval)}.json")
 
+def _store_root() -> str:
+    return os.getenv("CANDLE_STORE_DIR") or os.path.join(DATA_DIR, "candles")
+
+def open_store(symbol: str, interval: str, create: bool = False):
+    """candle_store handle (mmap columns) or None. 예전 json 이 있으면 여기서 한 번 이전."""
+    root = _store_root()
+    st = candle_store.open_store(symbol, interval, root=root)
+    if st is None and os.path.exists(_path(symbol, interval)):
+        candle_store.migrate_file(_path(symbol, interval), root=root)
+        st = candle_store.open_store(symbol, interval, root=root)
+    if st is None and create:
+        st = candle_store.open_store(symbol, interval, root=root, create=True)
+    return st
+
 def _safe_json(r: requests.Response):
     try:
         return r.json()
@@ -28,6 +51,9 @@ def _safe_json(r: requests.Response):
         return {}
 
 def load_candles(symbol: str, interval: str) -> List[Dict[str, Any]]:
+    if _use_store():
+        st = open_store(symbol, interval)
+        return st.to_dicts(fields=LEGACY_FIELDS) if st is not None else []
     p = _path(symbol, interval)
     if not os.path.exists(p):
         return []
@@ -35,23 +61,39 @@ def load_candles(symbol: str, interval: str) -> List[Dict[str, Any]]:
         return json.load(f)
 
 def save_candles(symbol: str, interval: str, candles: List[Dict[str, Any]]):
+    if _use_store():
+        open_store(symbol, interval, create=True).replace(candles)
+        return
     p = _path(symbol, interval)
     with open(p, "w", encoding="utf-8") as f:
         json.dump(candles, f, ensure_ascii=False, indent=2)
 
-def _fetch_kline(symbol: str, interval: str, limit: int = 1000, end: int = None):
-    # Bybit v5: /v5/market/kline
+class KlineFetchError(RuntimeError):
+    pass
+
+def _kline_page(symbol: str, interval: str, limit: int = 1000, end: int = None, start: int = None):
+    """
+    한 페이지 요청 (Bybit v5 /v5/market/kline).
+    HTTP 429 / 오류 상태 / JSON 아님 / retCode != 0 은 KlineFetchError
+    -> 빈 list 는 거래소가 retCode 0 으로 "봉 없음" 이라고 답한 경우뿐
+    """
     params = {
         "category": CATEGORY,
         "symbol": symbol.upper(),
         "interval": str(interval),
         "limit": int(limit),
     }
+    if start:
+        params["start"] = int(start)
     if end:
         params["end"] = int(end)
 
     r = requests.get(f"{BYBIT_BASE_URL}/v5/market/kline", params=params, headers=HEADERS, timeout=15, proxies=PROXIES)
+    if r.status_code == 429 or r.status_code >= 400:
+        raise KlineFetchError(f"HTTP {r.status_code}")
     j = _safe_json(r)
+    if str(j.get("retCode")) != "0":
+        raise KlineFetchError(f"Bybit retCode={j.get('retCode')} retMsg={j.get('retMsg')}")
     lst = ((j.get("result") or {}).get("list") or [])
 
     # list format: [openTime, open, high, low, close, volume, turnover]
@@ -65,6 +107,7 @@ def _fetch_kline(symbol: str, interval: str, limit: int = 1000, end: int = None)
                 "high": float(row[2]),
                 "low": float(row[3]),
                 "close": float(row[4]),
+                "volume": float(row[5]) if len(row) > 5 else 0.0,
             })
         except Exception:
             continue
@@ -73,14 +116,146 @@ def _fetch_kline(symbol: str, interval: str, limit: int = 1000, end: int = None)
     out.sort(key=lambda x: x["ts"])
     return out
 
-def update_cache(symbol: str, interval: str, chunk_limit: int = 1000, max_chunks: int = 10):
+def _fetch_kline(symbol: str, interval: str, limit: int = 1000, end: int = None, start: int = None):
+    # 예전 호출부(seed / json 경로)용: 오류 응답은 빈 list (페이징이 거기서 멈춤)
+    try:
+        return _kline_page(symbol, interval, limit=limit, end=end, start=start)
+    except KlineFetchError:
+        return []
+
+def _downloader():
+    # kline_downloader 프로세스 공용 pager (전역 rate budget / 429·10006 pause / retry).
+    # 페이지 요청은 downloader 의 _http_page: 오류 응답은 [] 가 아니라 예외
+    return kline_downloader.shared(CATEGORY)
+
+def _fetch_range(symbol: str, interval: str, start: int, end: int, chunk_limit: int, max_chunks: int):
+    """
+    [start, end] 구간을 앞으로(과거 -> 현재) chunk_limit 개씩, 최대 max_chunks 창. 창끼리는 병렬.
+    재시도 후에도 실패한 창은 예외로 올라감 (빈 결과 = 거래소가 retCode 0 으로 "봉 없음" 응답).
+    """
+    step = interval_seconds(interval) * 1000
+    end = min(int(end), int(start) + step * int(chunk_limit) * max(1, int(max_chunks)) - 1)
+    return [
+        {"ts": ts, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for ts, o, h, l, c, v in _downloader().download(symbol, interval, start, end, limit=chunk_limit)
+    ]
+
+def _hole_retry_sec(tries: int) -> float:
+    # 거래소가 "봉 없음"으로 확인한 구간(점검 등)도 영구 제외하지 않고 간격을 늘려 가며 재확인
+    try:
+        base = float(os.getenv("CANDLE_HOLE_RETRY_SEC", "86400"))
+    except Exception:
+        base = 86400.0
+    return min(30 * 86400.0, base * (2 ** max(0, int(tries) - 1)))
+
+def _known_holes(st) -> dict:
+    """{(lo, hi): (checked_at, tries)} — 예전 [lo, hi] 형식은 바로 재확인 대상"""
+    try:
+        with open(os.path.join(st.path, "holes.json"), "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except Exception:
+        return {}
+    out = {}
+    for x in raw or []:
+        try:
+            out[(int(x[0]), int(x[1]))] = (float(x[2]) if len(x) > 2 else 0.0, int(x[3]) if len(x) > 3 else 1)
+        except Exception:
+            continue
+    return out
+
+def _save_holes(st, holes: dict):
+    tmp = os.path.join(st.path, "holes.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump([[lo, hi, at, tries] for (lo, hi), (at, tries) in sorted(holes.items())], f)
+    os.replace(tmp, os.path.join(st.path, "holes.json"))
+
+def _seed_cache(st, symbol: str, interval: str, chunk_limit: int, max_chunks: int) -> int:
+    """빈 저장소: 예전처럼 최신에서 과거로 max_chunks 번 땡겨서 한 번에 기록."""
+    chunks = []
+    seen_first = None
+    end = None
+    for _ in range(max_chunks):
+        chunk = _fetch_kline(symbol, interval, limit=chunk_limit, end=end)
+        if not chunk or (seen_first is not None and int(chunk[0]["ts"]) >= seen_first):
+            break
+        seen_first = int(chunk[0]["ts"])
+        chunks.append(chunk)
+        # 다음 end는 "가장 오래된 캔들의 ts - 1"
+        end = seen_first - 1
+        time.sleep(0.15)
+    rows = [c for chunk in reversed(chunks) for c in chunk]
+    if rows:
+        st.replace(rows)
+    return len(rows)
+
+def update_cache(symbol: str, interval: str, chunk_limit: int = 1000, max_chunks: int = 10, backfill: bool = True):
     """
     - chunk_limit: 요청당 limit
     - max_chunks: 몇 번 이어서 땡길지 (1000 * 10 = 10000개 수준)
+    - 저장소가 있으면 마지막 ts 부터 앞으로만 받아서 append (진행 중인 마지막 봉은 교체)
+      -> 매일 갱신 비용이 전체 이력이 아니라 새 봉 수에 비례
+    - backfill: ts 인덱스의 구멍(gaps)만 골라서 다시 요청해 merge
     """
     symbol = symbol.upper()
     interval = str(interval)
+    if not _use_store():
+        return _update_cache_json(symbol, interval, chunk_limit, max_chunks)
 
+    st = open_store(symbol, interval, create=True)
+    if not len(st):
+        _seed_cache(st, symbol, interval, chunk_limit, max_chunks)
+        return len(st)
+
+    now_ms = int(time.time() * 1000)
+    rows = _fetch_range(symbol, interval, st.last_ts, now_ms, chunk_limit, max_chunks)
+    if rows:
+        st.append(rows)
+
+    if backfill:
+        step = interval_seconds(interval) * 1000
+        known = _known_holes(st)
+        changed = False
+        now = time.time()
+        budget = max_chunks
+        for lo, hi in st.gaps(step):
+            if budget <= 0:
+                break
+            ent = known.get((lo, hi))
+            if ent is not None and now - ent[0] < _hole_retry_sec(ent[1]):
+                continue
+            chunks = -(-((hi - lo) // step + 1) // int(chunk_limit))
+            whole = chunks <= budget
+            chunks = min(chunks, budget)
+            budget -= chunks
+            # 실패(429/10006/retCode!=0/네트워크)는 재시도 후 예외로 올라옴 -> 구멍으로 기록 안 함
+            got = _fetch_range(symbol, interval, lo, hi, chunk_limit, chunks)
+            if got:
+                st.merge(got)
+            if not whole:
+                continue
+            # 창 전체를 요청해서 retCode 0 으로 받았는데도 남은 구멍만 기록 (다음 재확인 시각까지 건너뜀)
+            known.pop((lo, hi), None)
+            for h in st.gaps(step, lo - step, hi + step + 1):
+                prev = known.get(h) or ent
+                known[h] = (now, (prev[1] if prev else 0) + 1)
+            changed = True
+        if known:
+            # 다른 경로로 채워진 구간은 정리
+            current = set(st.gaps(step))
+            for h in [h for h in known if h not in current]:
+                known.pop(h)
+                changed = True
+        if changed:
+            _save_holes(st, known)
+    return len(st)
+
+def cache_gaps(symbol: str, interval: str):
+    """저장된 봉 사이 빈 구간 [(첫 누락 ts, 마지막 누락 ts), ...]"""
+    st = open_store(symbol, interval)
+    return st.gaps(interval_seconds(interval) * 1000) if st is not None else []
+
+def _update_cache_json(symbol: str, interval: str, chunk_limit: int = 1000, max_chunks: int = 10):
+    # CANDLE_STORE=0: 예전 json 경로 (전체 로드 -> set -> 정렬 -> 전체 재기록)
     existing = load_candles(symbol, interval)
     existing_ts = set(c["ts"] for c in existing)
     end = None
@@ -114,54 +289,33 @@ def update_cache(symbol: str, interval: str, chunk_limit: int = 1000, max_chunks
 
 # ===== file: walkforward.py =====
 # ✅ 워크포워드: (train -> optimize -> test) 반복
-from typing import Callable, Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
+
+import walkforward_executor
 
 def walk_forward(
     candles: List[Dict[str, Any]],
     train_bars: int,
     test_bars: int,
-    optimizer_fn: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+    optimizer_fn: Optional[Callable[[List[Dict[str, Any]]], Dict[str, Any]]],
     make_signal_fn: Callable[[Dict[str, Any]], Callable],
     backtest_fn: Callable[[List[Dict[str, Any]], Callable], Dict[str, Any]],
+    *,
+    param_grid: Optional[List[Dict[str, Any]]] = None,
+    score_fn: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    workers: Optional[int] = None,
+    on_window: Optional[Callable[[Dict[str, Any]], None]] = None,
 ):
-    windows = []
-    start = 0
-
-    while True:
-        train = candles[start : start + train_bars]
-        test = candles[start + train_bars : start + train_bars + test_bars]
-        if len(train) < train_bars or len(test) < test_bars:
-            break
-
-        best = optimizer_fn(train) or {}
-        best_params = best.get("params") or best
-
-        signal_fn = make_signal_fn(best_params)
-        test_res = backtest_fn(test, signal_fn)
-
-        windows.append({
-            "start": start,
-            "train_bars": train_bars,
-            "test_bars": test_bars,
-            "best_params": best_params,
-            "test_metrics": test_res,
-        })
-
-        start += test_bars
-
-    # 요약
-    total_trades = sum(int(w["test_metrics"].get("trades", 0) or 0) for w in windows)
-    total_net = sum(float(w["test_metrics"].get("net_pnl", 0.0) or 0.0) for w in windows)
-    avg_wr = 0.0
-    if windows:
-        avg_wr = sum(float(w["test_metrics"].get("winrate", 0.0) or 0.0) for w in windows) / len(windows)
-
-    return {
-        "windows": windows,
-        "summary": {
-            "windows": len(windows),
-            "total_trades": total_trades,
-            "total_net_pnl": round(total_net, 4),
-            "avg_winrate": round(avg_wr, 2),
-        }
-    }
+    """
+    윈도우들은 서로 독립 -> walkforward_executor 가 process pool 에서 병렬 실행.
+    - optimizer_fn: 윈도우 1개 = 작업 1개
+    - param_grid 를 주면 (window x param) 단위로 쪼개서 train 점수(score_fn) 최고 params 로 test
+    workers: None=cpu 수 (pickle 안 되는 함수면 자동으로 직렬), 1=직렬
+    on_window: 윈도우 test_metrics 가 끝나는 순서대로 호출. 결과 windows 순서는 항상 start 순.
+    """
+    return walkforward_executor.walk_forward(
+        candles, train_bars, test_bars,
+        make_signal_fn=make_signal_fn, backtest_fn=backtest_fn,
+        optimizer_fn=optimizer_fn, param_grid=param_grid, score_fn=score_fn,
+        workers=workers, on_window=on_window,
+    )
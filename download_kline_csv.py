@@ -3,11 +3,12 @@
 # Example:
 #   python download_kline_csv.py --symbol BTCUSDT --interval 15 --days 90 --category linear --out data/BTCUSDT_15m.csv
 #   python download_kline_csv.py --symbol ETHUSDT --interval 60 --start "2025-11-01" --end "2026-02-01" --out data/ETHUSDT_1h.csv
+#   python download_kline_csv.py --symbol BTCUSDT --interval 15 --days 730 --store   # -> candle store (resumable)
+# Many symbols at once: python kline_downloader.py --symbols BTCUSDT,ETHUSDT --intervals 15 --days 730
 
 import argparse, csv, time, datetime as dt
-import requests
 
-BASE = "https://api.bybit.com"
+import kline_downloader
 
 def to_ms(s: str) -> int:
     # "YYYY-mm-dd" or "YYYY-mm-dd HH:MM:SS" (UTC assumed)
@@ -22,64 +23,12 @@ def now_ms() -> int:
     return int(time.time() * 1000)
 
 def fetch_page(category: str, symbol: str, interval: str, start_ms: int, end_ms: int, limit: int = 1000):
-    url = f"{BASE}/v5/market/kline"
-    params = {
-        "category": category,
-        "symbol": symbol,
-        "interval": interval,
-        "start": start_ms,
-        "end": end_ms,
-        "limit": limit,
-    }
-    r = requests.get(url, params=params, timeout=20)
-    r.raise_for_status()
-    j = r.json()
-    if str(j.get("retCode")) != "0":
-        raise RuntimeError(f"Bybit retCode={j.get('retCode')} retMsg={j.get('retMsg')}")
-
-    lst = j.get("result", {}).get("list", []) or []
-    # Bybit returns list items like:
-    # [ openTime, open, high, low, close, volume, turnover ]
-    # openTime is ms string
-    rows = []
-    for it in lst:
-        try:
-            ts = int(float(it[0]))
-            o, h, l, c = float(it[1]), float(it[2]), float(it[3]), float(it[4])
-            v = float(it[5]) if len(it) > 5 else 0.0
-            rows.append((ts, o, h, l, c, v))
-        except Exception:
-            pass
-    # Sort ascending
-    rows.sort(key=lambda x: x[0])
-    return rows
+    # one request window (kept for callers importing it); ascending (ts, o, h, l, c, v)
+    return kline_downloader.shared(category).fetch_window(symbol, interval, start_ms, end_ms)
 
 def download(category: str, symbol: str, interval: str, start_ms: int, end_ms: int):
-    all_rows = []
-    cur = start_ms
-    # paginate forward by using last candle openTime + 1ms
-    while cur < end_ms:
-        rows = fetch_page(category, symbol, interval, cur, end_ms, limit=1000)
-        if not rows:
-            break
-        all_rows.extend(rows)
-        last_ts = rows[-1][0]
-        nxt = last_ts + 1
-        if nxt <= cur:
-            break
-        cur = nxt
-        time.sleep(0.12)  # gentle
-
-    # de-dup by timestamp
-    seen = set()
-    dedup = []
-    for r in all_rows:
-        if r[0] in seen:
-            continue
-        seen.add(r[0])
-        dedup.append(r)
-    dedup.sort(key=lambda x: x[0])
-    return dedup
+    # kline_downloader: fixed start/end windows fetched in parallel under one rate budget
+    return kline_downloader.download_rows(category, symbol, interval, start_ms, end_ms)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -90,6 +39,7 @@ def main():
     ap.add_argument("--start", default="", help='UTC "YYYY-mm-dd" or "YYYY-mm-dd HH:MM:SS"')
     ap.add_argument("--end", default="", help='UTC "YYYY-mm-dd" or "YYYY-mm-dd HH:MM:SS"')
     ap.add_argument("--out", default="")
+    ap.add_argument("--store", action="store_true", help="write into the candle store (data/candles) instead of a CSV")
     args = ap.parse_args()
 
     symbol = args.symbol.upper().strip()
@@ -105,6 +55,14 @@ def main():
         start_ms = to_ms(args.start)
         end_ms = to_ms(args.end)
 
+    if args.store:
+        dl = kline_downloader.KlineDownloader(category=category)
+        res = dl.sync([(symbol, interval)], start_ms, end_ms)[f"{symbol}_{interval}"]
+        if res["error"]:
+            raise SystemExit(f"download failed: {res['error']} (rerun to resume)")
+        print(f"OK: {res['bars']} candles in store (+{res['added']})")
+        return
+
     out = args.out.strip()
     if not out:
         suffix = f"{interval}m" if interval.isdigit() else interval
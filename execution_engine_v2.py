@@ -14,6 +14,11 @@ import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+try:
+    from storage_utils import tail_jsonl
+except Exception:  # pragma: no cover
+    tail_jsonl = None
+
 
 def _env(name: str, default: str = "") -> str:
     return str(os.getenv(name, default)).strip()
@@ -122,6 +127,8 @@ class ExecutionJournal:
     def last_events(self, n: int = 10) -> List[Dict[str, Any]]:
         if not self.path.exists():
             return []
+        if tail_jsonl is not None:
+            return tail_jsonl(str(self.path), n)
         try:
             lines = self.path.read_text(encoding="utf-8").splitlines()[-n:]
             out = []
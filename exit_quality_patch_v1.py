@@ -77,7 +77,9 @@ if _t is not None and Trader is not None and EXIT_QUALITY_ON:
                 side = str(pos.get("side") or "")
                 price = float(_t.get_price(symbol))
                 mp = self._mp() if hasattr(self, "_mp") else {}
-                ok, reason, score, sl_new, tp_new, a = _t.compute_signal_and_exits(
+                # same candle-cached exit signal the base _manage_one uses (no extra kline pass per tick)
+                _exit_sig = getattr(_t, "position_exit_signal", None) or _t.compute_signal_and_exits
+                ok, reason, score, sl_new, tp_new, a = _exit_sig(
                     symbol,
                     side,
                     price,
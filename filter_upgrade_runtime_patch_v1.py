@@ -15,6 +15,7 @@ try:
     import math
     import json
     from pathlib import Path
+    import indicators as ind
     import trader as _t
 except Exception as _boot_e:  # pragma: no cover
     print(f"[FILTER85 PATCH] boot failed: {_boot_e}", flush=True)
@@ -213,11 +214,7 @@ def _ema(vals, period):
         pass
     if not vals:
         return 0.0
-    k = 2.0 / (int(period) + 1.0)
-    prev = float(vals[0])
-    for x in vals:
-        prev = float(x) * k + prev * (1.0 - k)
-    return prev
+    return ind.last(ind.ema(vals, int(period)))
 
 
 def _atr(highs, lows, closes, period):
@@ -232,10 +229,8 @@ def _atr(highs, lows, closes, period):
     p = int(period)
     if len(closes) < p + 1:
         return 0.0
-    trs = []
-    for i in range(-p, 0):
-        trs.append(max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])))
-    return sum(trs) / max(1, len(trs))
+    n = p + 1
+    return ind.last(ind.atr(highs[-n:], lows[-n:], closes[-n:], p))
 
 
 def _breakout_exception(symbol: str, side: str, price: float):
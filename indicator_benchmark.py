@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""indicator_benchmark.py
+
+Equivalence + speed check for indicators.py.
+
+- Reference copies of the old pure-Python loops (as they were in trader.py,
+  signal_engine.py, market_regime.py and backtest.py) are kept here only to prove
+  every indicators.py option reproduces its legacy variant.
+- Then times full-series computation on --bars bars (default 100k).
+
+Usage
+    python indicator_benchmark.py
+    python indicator_benchmark.py --bars 200000 --skip-legacy
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import indicators as ind  # noqa: E402
+
+
+# ---------------- legacy references (do not use in bot code) ----------------
+def ref_ema_last(vals, p):  # trader.ema / signal_engine._ema / market_regime.ema
+    k = 2 / (p + 1)
+    e = vals[0]
+    for v in vals[1:]:
+        e = v * k + e * (1 - k)
+    return e
+
+
+def ref_ema_series(values, period):  # backtest.ema / run_backtest_opt.ema
+    out = []
+    k = 2 / (period + 1)
+    e = values[0]
+    for v in values:
+        e = v * k + e * (1 - k)
+        out.append(e)
+    return out
+
+
+def ref_rsi_last(closes, p, zero_loss):  # trader.rsi ("eps") / signal_engine._rsi ("strict")
+    gain = loss = 0.0
+    for i in range(-p, 0):
+        diff = closes[i] - closes[i - 1]
+        if diff > 0:
+            gain += diff
+        else:
+            loss -= diff
+    if zero_loss == "eps":
+        return 100 - (100 / (1 + gain / (loss + 1e-9)))
+    if loss <= 0:
+        return 100.0 if gain > 0 else 50.0
+    return 100.0 - (100.0 / (1.0 + gain / loss))
+
+
+def ref_rsi_series(values, period=14):  # backtest.rsi
+    gains, losses, rsis = [], [], []
+    for i in range(1, len(values)):
+        diff = values[i] - values[i - 1]
+        gains.append(max(diff, 0))
+        losses.append(max(-diff, 0))
+        if i < period:
+            rsis.append(50)
+            continue
+        avg_gain = sum(gains[i - period:i]) / period
+        avg_loss = sum(losses[i - period:i]) / period
+        rsis.append(100 if avg_loss == 0 else 100 - (100 / (1 + avg_gain / avg_loss)))
+    rsis.insert(0, 50)
+    return rsis
+
+
+def ref_atr_last(highs, lows, closes, p):  # trader.atr / signal_engine._atr
+    trs = [max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])) for i in range(-p, 0)]
+    return sum(trs) / p
+
+
+def ref_atr_lagged(h, l, c, period=14):  # backtest.atr / run_backtest_opt.atr
+    trs = [max(h[i] - l[i], abs(h[i] - c[i - 1]), abs(l[i] - c[i - 1])) for i in range(1, len(c))]
+    atrs = [trs[i] if i < period else sum(trs[i - period:i]) / period for i in range(len(trs))]
+    atrs.insert(0, atrs[0] if atrs else 0.0)
+    return atrs
+
+
+def ref_adx_wilder(highs, lows, closes, period=14):  # trader._hard_adx / market_regime.adx
+    tr_list, plus_dm, minus_dm = [], [], []
+    for i in range(1, len(closes)):
+        up_move = highs[i] - highs[i - 1]
+        down_move = lows[i - 1] - lows[i]
+        plus_dm.append(up_move if (up_move > down_move and up_move > 0) else 0.0)
+        minus_dm.append(down_move if (down_move > up_move and down_move > 0) else 0.0)
+        tr_list.append(max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])))
+    atr_sm = sum(tr_list[:period]) / period
+    plus_sm = sum(plus_dm[:period]) / period
+    minus_sm = sum(minus_dm[:period]) / period
+    dx_values = []
+    for i in range(period, len(tr_list)):
+        atr_sm = ((atr_sm * (period - 1)) + tr_list[i]) / period
+        plus_sm = ((plus_sm * (period - 1)) + plus_dm[i]) / period
+        minus_sm = ((minus_sm * (period - 1)) + minus_dm[i]) / period
+        if atr_sm <= 0:
+            continue
+        pdi = 100.0 * (plus_sm / atr_sm)
+        mdi = 100.0 * (minus_sm / atr_sm)
+        denom = pdi + mdi
+        dx_values.append(0.0 if denom <= 0 else 100.0 * abs(pdi - mdi) / denom)
+    if not dx_values:
+        return 0.0
+    tail = dx_values[-period:]
+    return sum(tail) / len(tail)
+
+
+def ref_adx_window(highs, lows, closes, p):  # signal_engine._adx
+    plus_dm, minus_dm, tr = [], [], []
+    for i in range(1, len(closes)):
+        up = highs[i] - highs[i - 1]
+        down = lows[i - 1] - lows[i]
+        plus_dm.append(up if up > down and up > 0 else 0.0)
+        minus_dm.append(down if down > up and down > 0 else 0.0)
+        tr.append(max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])))
+    dx_vals = []
+    for end in range(max(p, len(tr) - p * 3), len(tr) + 1):
+        tr_sum = sum(tr[end - p:end])
+        if tr_sum <= 0:
+            continue
+        plus = 100.0 * sum(plus_dm[end - p:end]) / tr_sum
+        minus = 100.0 * sum(minus_dm[end - p:end]) / tr_sum
+        denom = plus + minus
+        dx_vals.append(0.0 if denom <= 0 else 100.0 * abs(plus - minus) / denom)
+    if not dx_vals:
+        return 0.0
+    tail = dx_vals[-p:]
+    return sum(tail) / len(tail)
+
+
+# ---------------- helpers ----------------
+def random_bars(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    price = 100.0
+    h, l, c = [], [], []
+    for i in range(n):
+        o = price
+        cl = max(1.0, price * (1 + rnd.gauss(0, 0.004)))
+        if i % 997 < 20:
+            cl = o * 1.0005  # monotone runs exercise the zero-loss branches
+        h.append(max(o, cl) * (1 + abs(rnd.gauss(0, 0.002))))
+        l.append(min(o, cl) * (1 - abs(rnd.gauss(0, 0.002))))
+        c.append(cl)
+        price = cl
+    return h, l, c
+
+
+def _close(a: float, b: float, tol: float = 1e-9) -> bool:
+    return abs(a - b) <= tol * max(1.0, abs(a), abs(b))
+
+
+def check_equivalence(h, l, c, windows: int = 300, seed: int = 11) -> int:
+    rnd = random.Random(seed)
+    checks = 0
+    # series variants over the whole sample
+    n = min(len(c), 5000)
+    hs, ls, cs = h[:n], l[:n], c[:n]
+    for name, got, want in (
+        ("ema_series", ind.ema(cs, 21), ref_ema_series(cs, 21)),
+        ("rsi_series(100)", ind.rsi(cs, 14, zero_loss="100"), ref_rsi_series(cs, 14)),
+        ("atr_lagged", ind.atr(hs, ls, cs, 14, method="lagged"), ref_atr_lagged(hs, ls, cs, 14)),
+    ):
+        for i, (g, w) in enumerate(zip(got, want)):
+            if name.startswith("rsi") and math.isnan(g):
+                g = 50.0  # backtest.rsi warm-up value
+            if not _close(float(g), float(w)):
+                raise AssertionError(f"{name}[{i}] got={g!r} want={w!r}")
+            checks += 1
+    # scalar variants on random windows (the live call sites)
+    for _ in range(windows):
+        end = rnd.randint(300, len(c))
+        w = rnd.choice((60, 150, 240))
+        hh, ll, cc = h[end - w:end], l[end - w:end], c[end - w:end]
+        pairs = (
+            ("ema", ind.last(ind.ema(cc[-60:], 20)), ref_ema_last(cc[-60:], 20)),
+            ("ema_window", float(ind.ema_window(c[:end], 20, 60)[-1]), ref_ema_last(cc[-60:], 20)),
+            ("rsi_eps", ind.last(ind.rsi(cc, 14, zero_loss="eps")), ref_rsi_last(cc, 14, "eps")),
+            ("rsi_strict", ind.last(ind.rsi(cc, 14)), ref_rsi_last(cc, 14, "strict")),
+            ("atr", ind.last(ind.atr(hh, ll, cc, 14)), ref_atr_last(hh, ll, cc, 14)),
+            ("adx_wilder", ind.last(ind.adx(hh, ll, cc, 14)), ref_adx_wilder(hh, ll, cc, 14)),
+            ("adx_window", ind.last(ind.adx(hh, ll, cc, 14, method="window")), ref_adx_window(hh, ll, cc, 14)),
+        )
+        for name, g, want in pairs:
+            if not _close(g, want):
+                raise AssertionError(f"{name} end={end} w={w}: got={g!r} want={want!r}")
+            checks += 1
+    return checks
+
+
+def _timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - t) * 1000.0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time indicators.py")
+    args = parser.parse_args(argv)
+
+    h, l, c = random_bars(max(args.bars, 1000))
+    checks = check_equivalence(h, l, c)
+    print(f"[IND] equivalence OK ({checks} values vs legacy loops)")
+
+    rows = [
+        ("ema(21)", lambda: ind.ema(c, 21), lambda: ref_ema_series(c, 21)),
+        ("ema_window(50)", lambda: ind.ema_window(c, 50, 150), None),
+        ("rsi(14) sum", lambda: ind.rsi(c, 14, zero_loss="100"), lambda: ref_rsi_series(c, 14)),
+        ("atr(14) lagged", lambda: ind.atr(h, l, c, 14, method="lagged"), lambda: ref_atr_lagged(h, l, c, 14)),
+        ("adx(14) wilder", lambda: ind.adx(h, l, c, 14), None),
+        ("adx(14) window", lambda: ind.adx(h, l, c, 14, method="window"), None),
+        ("rsi(14) wilder", lambda: ind.rsi(c, 14, method="wilder", zero_loss="50"), None),
+    ]
+    print(f"[IND] full series on {len(c)} bars")
+    total = 0.0
+    for name, new_fn, old_fn in rows:
+        new_ms = min(_timed(new_fn) for _ in range(3))
+        total += new_ms
+        if old_fn is not None and not args.skip_legacy:
+            old_ms = _timed(old_fn)
+            print(f"  {name:<16} numpy={new_ms:8.2f}ms  legacy={old_ms:9.1f}ms  x{old_ms / max(new_ms, 1e-6):.0f}")
+        else:
+            print(f"  {name:<16} numpy={new_ms:8.2f}ms")
+    print(f"[IND] total numpy {total:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,415 @@
+"""indicator_stream.py
+
+Incremental (streaming) indicator state for the live signal path.
+
+signal_engine / the hardening filter recompute EMA/RSI/ATR/ADX over the whole
+kline window on every call. Here each (symbol, interval, spec) keeps the state
+of those indicators over *closed* bars:
+
+- commit(bar)  advances the state by one closed bar (O(1) per bar)
+- peek(bar)    evaluates the still-forming bar without touching committed state
+
+The classes reproduce the existing formulas exactly (same windows, same seeds):
+
+- WindowEma(period, window)  == signal_engine._ema(closes[-window:], period)
+                                (EMA seeded at the first value of the window)
+- SumRsi(period)             == signal_engine._rsi (simple gain/loss sums)
+- MeanAtr(period)            == signal_engine._atr (mean TR of the last `period` bars)
+- WindowAdx(period)          == signal_engine._adx (rolling-sum DI, mean of last `period` DX)
+- WilderAdx(period)          == trader._hard_adx (Wilder smoothing). The batch version
+                                seeds at the window start; the stream seeds at the first
+                                bar it saw, the difference decays as (1-1/p)^n (~1e-7 at 240 bars).
+
+IndicatorBook.sync() takes the usual Bybit newest-first kline list, commits the
+closed bars it has not seen yet and peeks the forming one (raw[0]).
+Rows without usable open timestamps (DRY_RUN random klines) return None, so
+callers fall back to their batch formulas.
+
+Dependency-free; signal_parity_check.py checks stream == batch bar by bar.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Any
+
+
+def _tr(h: float, l: float, prev_c: float) -> float:
+    return max(h - l, abs(h - prev_c), abs(l - prev_c))
+
+
+class WindowEma:
+    """EMA seeded at the first value of a sliding `window`.
+
+    e_n = (1-k) e_{n-1} + k v_n + (1-k)^W (v_{n-W+1} - v_{n-W})
+    Recomputed exactly every `window` commits so rounding error cannot build up.
+    """
+
+    def __init__(self, period: int, window: int):
+        self.period = max(1, int(period))
+        self.window = max(2, int(window))
+        self.k = 2.0 / (self.period + 1.0)
+        self.decay_w = (1.0 - self.k) ** self.window
+        self.vals: deque[float] = deque(maxlen=self.window)
+        self.e = 0.0
+        self._since_exact = 0
+
+    def _exact(self) -> float:
+        it = iter(self.vals)
+        e = next(it)
+        for v in it:
+            e = v * self.k + e * (1.0 - self.k)
+        return e
+
+    def _next(self, v: float) -> float:
+        if not self.vals:
+            return v
+        if len(self.vals) < self.window:
+            return v * self.k + self.e * (1.0 - self.k)
+        return (1.0 - self.k) * self.e + self.k * v + self.decay_w * (self.vals[1] - self.vals[0])
+
+    def commit(self, v: float):
+        e = self._next(v)
+        self.vals.append(v)
+        self._since_exact += 1
+        if self._since_exact >= self.window:
+            self._since_exact = 0
+            e = self._exact()
+        self.e = e
+
+    def peek(self, v: float) -> float:
+        return self._next(v)
+
+
+class SumRsi:
+    def __init__(self, period: int):
+        self.period = max(2, int(period))
+        self.diffs: deque[float] = deque(maxlen=self.period)
+        self.gain = 0.0
+        self.loss = 0.0
+        self.last = None
+        self.n = 0  # closes seen
+
+    @staticmethod
+    def _parts(d: float) -> tuple[float, float]:
+        return (d, 0.0) if d > 0 else (0.0, -d)
+
+    def _value(self, gain: float, loss: float, n: int) -> float:
+        if n < self.period + 1:
+            return 50.0
+        if loss <= 0:
+            return 100.0 if gain > 0 else 50.0
+        return 100.0 - (100.0 / (1.0 + gain / loss))
+
+    def _sums_with(self, c: float) -> tuple[float, float]:
+        gain, loss = self.gain, self.loss
+        if self.last is not None:
+            g, l = self._parts(c - self.last)
+            gain += g
+            loss += l
+            if len(self.diffs) == self.period:
+                og, ol = self._parts(self.diffs[0])
+                gain -= og
+                loss -= ol
+        return gain, loss
+
+    def commit(self, c: float):
+        if self.last is not None:
+            self.gain, self.loss = self._sums_with(c)
+            self.diffs.append(c - self.last)
+            if self.n % self.period == 0:
+                # exact resum: keeps "loss == 0" exact for monotone runs
+                self.gain = sum(d for d in self.diffs if d > 0)
+                self.loss = -sum(d for d in self.diffs if d <= 0)
+        self.last = c
+        self.n += 1
+
+    def peek(self, c: float) -> float:
+        gain, loss = self._sums_with(c)
+        if self.last is not None:
+            # same summation order as the batch loop when the window is full
+            ds = list(self.diffs)[1:] if len(self.diffs) == self.period else list(self.diffs)
+            ds.append(c - self.last)
+            if loss <= 1e-12 * max(1.0, gain):
+                gain = sum(d for d in ds if d > 0)
+                loss = -sum(d for d in ds if d <= 0)
+        return self._value(gain, loss, self.n + 1)
+
+
+class MeanAtr:
+    def __init__(self, period: int):
+        self.period = max(2, int(period))
+        self.trs: deque[float] = deque(maxlen=self.period)
+        self.total = 0.0
+        self.prev_c = None
+        self.n = 0
+
+    def _total_with(self, h: float, l: float) -> float:
+        total = self.total
+        if self.prev_c is not None:
+            total += _tr(h, l, self.prev_c)
+            if len(self.trs) == self.period:
+                total -= self.trs[0]
+        return total
+
+    def commit(self, h: float, l: float, c: float):
+        if self.prev_c is not None:
+            self.total = self._total_with(h, l)
+            self.trs.append(_tr(h, l, self.prev_c))
+            if self.n % self.period == 0:
+                self.total = sum(self.trs)
+        self.prev_c = c
+        self.n += 1
+
+    def peek(self, h: float, l: float, c: float) -> float:
+        if self.n + 1 < self.period + 1:
+            return max(0.0, float(c) * 0.005)
+        return self._total_with(h, l) / self.period
+
+
+class WindowAdx:
+    """signal_engine._adx: DI from rolling `period` sums, ADX = mean of the last `period` DX
+    among the ends max(period, L - 3*period) .. L (L = number of TR values)."""
+
+    def __init__(self, period: int):
+        self.p = max(2, int(period))
+        self.tr: deque[float] = deque(maxlen=self.p)
+        self.pdm: deque[float] = deque(maxlen=self.p)
+        self.mdm: deque[float] = deque(maxlen=self.p)
+        self.s_tr = self.s_p = self.s_m = 0.0
+        self.dx: deque[tuple[int, float]] = deque(maxlen=self.p)  # (end, dx), skipped when tr_sum <= 0
+        self.prev = None  # (h, l, c)
+        self.L = 0
+        self._since_exact = 0
+
+    def _step(self, h: float, l: float):
+        ph, pl, pc = self.prev
+        up = h - ph
+        down = pl - l
+        pdm = up if up > down and up > 0 else 0.0
+        mdm = down if down > up and down > 0 else 0.0
+        return _tr(h, l, pc), pdm, mdm
+
+    def _sums_with(self, tr: float, pdm: float, mdm: float):
+        s_tr, s_p, s_m = self.s_tr + tr, self.s_p + pdm, self.s_m + mdm
+        if len(self.tr) == self.p:
+            s_tr -= self.tr[0]
+            s_p -= self.pdm[0]
+            s_m -= self.mdm[0]
+        return s_tr, s_p, s_m
+
+    @staticmethod
+    def _dx(s_tr: float, s_p: float, s_m: float):
+        if s_tr <= 0:
+            return None
+        plus = 100.0 * s_p / s_tr
+        minus = 100.0 * s_m / s_tr
+        denom = plus + minus
+        return 0.0 if denom <= 0 else 100.0 * abs(plus - minus) / denom
+
+    def commit(self, h: float, l: float, c: float):
+        if self.prev is not None:
+            tr, pdm, mdm = self._step(h, l)
+            self.s_tr, self.s_p, self.s_m = self._sums_with(tr, pdm, mdm)
+            self.tr.append(tr)
+            self.pdm.append(pdm)
+            self.mdm.append(mdm)
+            self.L += 1
+            self._since_exact += 1
+            if self._since_exact >= self.p:
+                self._since_exact = 0
+                self.s_tr, self.s_p, self.s_m = sum(self.tr), sum(self.pdm), sum(self.mdm)
+            if self.L >= self.p:
+                dx = self._dx(self.s_tr, self.s_p, self.s_m)
+                if dx is not None:
+                    self.dx.append((self.L, dx))
+        self.prev = (h, l, c)
+
+    def peek(self, h: float, l: float, c: float) -> float:
+        if self.prev is None or self.L + 1 < self.p + 1:
+            return 0.0
+        tr, pdm, mdm = self._step(h, l)
+        L = self.L + 1
+        dx_new = self._dx(*self._sums_with(tr, pdm, mdm))
+        tail = list(self.dx)
+        if dx_new is not None:
+            tail.append((L, dx_new))
+        lo = max(self.p, L - self.p * 3)
+        tail = [d for e, d in tail if e >= lo][-self.p:]
+        if not tail:
+            return 0.0
+        return sum(tail) / len(tail)
+
+
+class WilderAdx:
+    """trader._hard_adx: Wilder-smoothed TR/+DM/-DM, ADX = mean of the last `period` DX."""
+
+    def __init__(self, period: int):
+        self.p = max(2, int(period))
+        self.seed: list[tuple[float, float, float]] = []
+        self.atr = self.plus = self.minus = 0.0
+        self.dx: deque[float] = deque(maxlen=self.p)
+        self.prev = None
+        self.L = 0
+
+    def _step(self, h: float, l: float):
+        ph, pl, pc = self.prev
+        up = h - ph
+        down = pl - l
+        pdm = up if (up > down and up > 0) else 0.0
+        mdm = down if (down > up and down > 0) else 0.0
+        return _tr(h, l, pc), pdm, mdm
+
+    def _smooth(self, tr: float, pdm: float, mdm: float):
+        p = self.p
+        a = ((self.atr * (p - 1)) + tr) / p
+        pl = ((self.plus * (p - 1)) + pdm) / p
+        mi = ((self.minus * (p - 1)) + mdm) / p
+        dx = None
+        if a > 0:
+            pdi = 100.0 * (pl / a)
+            mdi = 100.0 * (mi / a)
+            denom = pdi + mdi
+            dx = 0.0 if denom <= 0 else 100.0 * abs(pdi - mdi) / denom
+        return a, pl, mi, dx
+
+    def commit(self, h: float, l: float, c: float):
+        if self.prev is not None:
+            step = self._step(h, l)
+            self.L += 1
+            if self.L <= self.p:
+                self.seed.append(step)
+                if self.L == self.p:
+                    self.atr = sum(s[0] for s in self.seed) / self.p
+                    self.plus = sum(s[1] for s in self.seed) / self.p
+                    self.minus = sum(s[2] for s in self.seed) / self.p
+                    self.seed = []
+            else:
+                self.atr, self.plus, self.minus, dx = self._smooth(*step)
+                if dx is not None:
+                    self.dx.append(dx)
+        self.prev = (h, l, c)
+
+    def peek(self, h: float, l: float, c: float) -> float:
+        if self.prev is None or self.L + 1 < self.p + 1:
+            return 0.0
+        tail = list(self.dx)
+        dx = self._smooth(*self._step(h, l))[3]
+        if dx is not None:
+            tail = (tail + [dx])[-self.p:]
+        if not tail:
+            return 0.0
+        return sum(tail) / len(tail)
+
+
+_KINDS = {
+    "ema": lambda spec: WindowEma(spec[1], spec[2]),
+    "rsi": lambda spec: SumRsi(spec[1]),
+    "atr": lambda spec: MeanAtr(spec[1]),
+    "adx": lambda spec: WindowAdx(spec[1]),
+    "wilder_adx": lambda spec: WilderAdx(spec[1]),
+}
+
+
+class IndicatorSet:
+    """Named indicators over one bar stream. specs: {"ema_fast": ("ema", 20, 60), "rsi": ("rsi", 14), ...}"""
+
+    def __init__(self, specs: dict[str, tuple]):
+        self.specs = dict(specs)
+        self.ind = {name: _KINDS[spec[0]](spec) for name, spec in self.specs.items()}
+        self.n = 0
+        self.last_open = -1
+        self.last_close = None
+
+    def commit(self, open_ms: int, h: float, l: float, c: float):
+        for name, ind in self.ind.items():
+            if isinstance(ind, (WindowEma, SumRsi)):
+                ind.commit(c)
+            else:
+                ind.commit(h, l, c)
+        self.n += 1
+        self.last_open = int(open_ms)
+        self.last_close = c
+
+    def peek(self, h: float, l: float, c: float) -> dict[str, float]:
+        out = {}
+        for name, ind in self.ind.items():
+            if isinstance(ind, (WindowEma, SumRsi)):
+                out[name] = ind.peek(c)
+            else:
+                out[name] = ind.peek(h, l, c)
+        return out
+
+
+def _bar(row: Any):
+    try:
+        return int(float(row[0])), float(row[2]), float(row[3]), float(row[4])
+    except Exception:
+        return None
+
+
+class IndicatorBook:
+    """IndicatorSet per (symbol, interval, specs), fed from Bybit newest-first kline lists."""
+
+    def __init__(self, max_sets: int = 400):
+        self.max_sets = int(max_sets)
+        self._lock = threading.Lock()
+        self._sets: dict[tuple, IndicatorSet] = {}
+        self._stats = {"sync": 0, "commit": 0, "reset": 0, "fallback": 0}
+
+    def sync(self, symbol: str, interval: Any, raw: list, specs: dict[str, tuple]) -> dict[str, float] | None:
+        """Commit new closed bars from `raw` (raw[0] = forming bar) and return the forming-bar values."""
+        if not raw or len(raw) < 2:
+            return None
+        forming = _bar(raw[0])
+        newest_closed = _bar(raw[1])
+        if forming is None or newest_closed is None or forming[0] <= newest_closed[0] or newest_closed[0] <= 0:
+            with self._lock:
+                self._stats["fallback"] += 1
+            return None
+        key = (str(symbol or "").upper(), str(interval), tuple(sorted(specs.items())))
+        with self._lock:
+            self._stats["sync"] += 1
+            st = self._sets.get(key)
+            new_rows = None
+            if st is not None and st.n > 0:
+                new_rows = []
+                for row in raw[1:]:
+                    b = _bar(row)
+                    if b is None:
+                        break
+                    if b[0] > st.last_open:
+                        new_rows.append(b)
+                        continue
+                    if b[0] != st.last_open or b[3] != st.last_close:
+                        new_rows = None  # history rewritten / other data source
+                    break
+                else:
+                    new_rows = None  # gap: raw does not reach back to the committed bar
+            if new_rows is None:
+                if len(self._sets) >= self.max_sets:
+                    self._sets.clear()
+                st = self._sets[key] = IndicatorSet(specs)
+                new_rows = [b for b in (_bar(r) for r in raw[1:]) if b is not None]
+                self._stats["reset"] += 1
+            for b in reversed(new_rows):
+                st.commit(*b)
+            self._stats["commit"] += len(new_rows)
+            return st.peek(forming[1], forming[2], forming[3])
+
+    def invalidate(self, symbol: str | None = None):
+        with self._lock:
+            if symbol is None:
+                self._sets.clear()
+                return
+            sym = str(symbol).upper()
+            for key in [k for k in self._sets if k[0] == sym]:
+                self._sets.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "sets": len(self._sets)}
+
+
+default_book = IndicatorBook()
@@ -0,0 +1,301 @@
+"""indicators.py
+
+One NumPy implementation of EMA / RSI / ATR / ADX for the whole bot.
+
+The pure-Python copies that used to live in trader.py, signal_engine.py,
+market_regime.py, the runtime patches, backtest.py, run_backtest_opt.py and
+train_from_history.py all delegate here. They did not agree on every detail, so
+the differences are explicit options instead of separate functions:
+
+- ema(x, period, seed="first")       y0 = x0, then y = k*x + (1-k)*y   (every legacy copy)
+                      seed="sma"         first value = SMA of the first `period` values
+- ema_window(x, period, window)       at every bar: ema() of only the last `window` values
+                                      (signal_engine._ema(closes[-window:], p), bar by bar)
+- rsi(close, period, method="sum")   simple gain/loss sums over the last `period` diffs
+                      method="wilder"    Wilder (alpha = 1/period) smoothed averages
+      zero_loss="strict"  loss == 0 -> 100 if gain > 0 else 50   (signal_engine)
+                "eps"     gain / (loss + 1e-9)                   (trader.rsi, train_from_history)
+                "100"     loss == 0 -> 100                        (backtests, hardening patch)
+                "50"      loss == 0 -> 50                         (pandas NA -> fillna(50))
+- atr(h, l, c, period, method="sum")     mean TR of the last `period` bars
+                       method="lagged"   backtest.py / run_backtest_opt: mean of the *previous*
+                                         `period` TRs, raw TR during warm-up
+                       method="wilder"   Wilder smoothing seeded with the first TR
+- adx(h, l, c, period, method="wilder")  Wilder TR/DM seeded with the SMA of the first
+                                         `period` values, ADX = mean of the last `period` DX
+                                         (trader._hard_adx, market_regime.adx)
+                       method="window"   DI from rolling `period` sums over the last
+                                         3*period ends (signal_engine._adx)
+
+Every function takes array-likes and returns a float64 array of the same length
+(NaN during warm-up). last() picks the final value for the scalar call sites.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _arr(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64).reshape(-1)
+
+
+def last(x, default: float = 0.0) -> float:
+    """Last element of a series as float (default for empty / NaN)."""
+    if len(x) == 0:
+        return float(default)
+    v = float(x[-1])
+    return float(default) if math.isnan(v) else v
+
+
+# ---------------------------------------------------------------------------
+# building blocks
+# ---------------------------------------------------------------------------
+def linear_filter(b, a: float, y0: float) -> np.ndarray:
+    """y[i] = a * y[i-1] + b[i] with y[-1] = y0, vectorized in blocks.
+
+    Inside a block y[s+j] = a^j * (a*y_prev + sum_{i<=j} a^-i * b[s+i]); the block
+    length keeps a^-j below 1e100 so the scaled cumsum stays exact to rounding.
+    """
+    b = _arr(b)
+    n = len(b)
+    out = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return out
+    a = float(a)
+    if a == 0.0:
+        out[:] = b
+        return out
+    block = n if abs(a) >= 1.0 else max(1, min(n, int(230.0 / -math.log(abs(a)))))
+    j = np.arange(block, dtype=np.float64)
+    pw = a ** j           # a^j
+    inv = a ** -j         # a^-j
+    prev = float(y0)
+    for s in range(0, n, block):
+        m = min(block, n - s)
+        acc = np.cumsum(b[s:s + m] * inv[:m])
+        out[s:s + m] = pw[:m] * (a * prev + acc)
+        prev = out[s + m - 1]
+    return out
+
+
+def rolling_sum(x, period: int) -> np.ndarray:
+    """Sum of the last `period` values (NaN before `period` values exist)."""
+    x = _arr(x)
+    p = max(1, int(period))
+    out = np.full(len(x), np.nan)
+    if len(x) >= p:
+        out[p - 1:] = sliding_window_view(x, p).sum(axis=1)
+    return out
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """TR; bar 0 has no previous close and uses high - low."""
+    h, l, c = _arr(high), _arr(low), _arr(close)
+    tr = h - l
+    if len(c) > 1:
+        pc = c[:-1]
+        tr[1:] = np.maximum.reduce([h[1:] - l[1:], np.abs(h[1:] - pc), np.abs(l[1:] - pc)])
+    return tr
+
+
+def directional_movement(high, low) -> tuple[np.ndarray, np.ndarray]:
+    """+DM / -DM per bar (bar 0 = 0)."""
+    h, l = _arr(high), _arr(low)
+    up = np.zeros(len(h))
+    down = np.zeros(len(h))
+    up[1:] = h[1:] - h[:-1]
+    down[1:] = l[:-1] - l[1:]
+    plus = np.where((up > down) & (up > 0), up, 0.0)
+    minus = np.where((down > up) & (down > 0), down, 0.0)
+    return plus, minus
+
+
+# ---------------------------------------------------------------------------
+# indicators
+# ---------------------------------------------------------------------------
+def ema(x, period: int, seed: str = "first") -> np.ndarray:
+    x = _arr(x)
+    n = len(x)
+    p = max(1, int(period))
+    k = 2.0 / (p + 1.0)
+    if n == 0:
+        return x.copy()
+    if seed == "sma":
+        out = np.full(n, np.nan)
+        if n >= p:
+            first = float(x[:p].mean())
+            out[p - 1] = first
+            out[p:] = linear_filter(k * x[p:], 1.0 - k, first)
+        return out
+    out = np.empty(n)
+    out[0] = x[0]
+    out[1:] = linear_filter(k * x[1:], 1.0 - k, x[0])
+    return out
+
+
+def ema_window(x, period: int, window: int) -> np.ndarray:
+    """out[t] == ema(x[max(0, t - window + 1):t + 1], period)[-1] for every t.
+
+    The windowed EMA differs from the full one only by the decayed seed term:
+    w_t = y_t - (1-k)^(t-s) * (y_s - x_s) with s the window start.
+    """
+    x = _arr(x)
+    n = len(x)
+    full = ema(x, period)
+    if n == 0:
+        return full
+    k = 2.0 / (max(1, int(period)) + 1.0)
+    t = np.arange(n)
+    s = np.maximum(t - max(1, int(window)) + 1, 0)
+    return full - (1.0 - k) ** (t - s) * (full[s] - x[s])
+
+
+def wilder(x, period: int, seed: str = "sma") -> np.ndarray:
+    """Wilder smoothing y = (y*(p-1) + x) / p; seed "sma" (first p values) or "first"."""
+    x = _arr(x)
+    n = len(x)
+    p = max(1, int(period))
+    a = (p - 1.0) / p
+    if seed == "first":
+        out = np.empty(n)
+        if n:
+            out[0] = x[0]
+            out[1:] = linear_filter(x[1:] / p, a, x[0])
+        return out
+    out = np.full(n, np.nan)
+    if n >= p:
+        first = float(x[:p].sum() / p)
+        out[p - 1] = first
+        out[p:] = linear_filter(x[p:] / p, a, first)
+    return out
+
+
+def rsi(close, period: int = 14, method: str = "sum", zero_loss: str = "strict") -> np.ndarray:
+    """RSI; method "sum" is NaN until `period` diffs exist, bar 0 is always NaN."""
+    c = _arr(close)
+    n = len(c)
+    p = max(1, int(period))
+    out = np.full(n, np.nan)
+    if n < 2:
+        return out
+    d = np.diff(c)
+    gain = np.where(d > 0, d, 0.0)
+    loss = np.where(d > 0, 0.0, -d)
+    if method == "wilder":
+        # pandas ewm(alpha=1/p, adjust=False) semantics: no warm-up cut
+        g = wilder(gain, p, seed="first")
+        lo = wilder(loss, p, seed="first")
+    else:
+        g = rolling_sum(gain, p)
+        lo = rolling_sum(loss, p)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if zero_loss == "eps":
+            r = 100.0 - 100.0 / (1.0 + g / (lo + 1e-9))
+        else:
+            r = 100.0 - 100.0 / (1.0 + g / lo)
+            if zero_loss == "strict":
+                r = np.where(lo <= 0, np.where(g > 0, 100.0, 50.0), r)
+            elif zero_loss == "100":
+                r = np.where(lo == 0, 100.0, r)
+            else:
+                r = np.where(lo == 0, 50.0, r)
+    r = np.where(np.isnan(g), np.nan, r)
+    out[1:] = r
+    return out
+
+
+def atr(high, low, close, period: int = 14, method: str = "sum") -> np.ndarray:
+    tr = true_range(high, low, close)
+    n = len(tr)
+    p = max(1, int(period))
+    if method == "wilder":
+        return wilder(tr, p, seed="first")
+    out = np.full(n, np.nan)
+    if n < 2:
+        if method == "lagged" and n:
+            out[:] = 0.0
+        return out
+    trs = tr[1:]  # TRs with a previous close
+    if method == "lagged":
+        lag = np.empty(len(trs))
+        lag[: min(p, len(trs))] = trs[:p]
+        if len(trs) > p:
+            lag[p:] = rolling_sum(trs, p)[p - 1:-1] / p
+        out[1:] = lag
+        out[0] = lag[0]
+        return out
+    out[1:] = rolling_sum(trs, p) / p
+    return out
+
+
+def adx(high, low, close, period: int = 14, method: str = "wilder") -> np.ndarray:
+    h, l, c = _arr(high), _arr(low), _arr(close)
+    n = len(c)
+    p = max(1, int(period))
+    out = np.full(n, np.nan)
+    if n < p + 2:
+        return out
+    tr = true_range(h, l, c)[1:]
+    pdm, mdm = directional_movement(h, l)
+    pdm, mdm = pdm[1:], mdm[1:]
+    m = len(tr)  # TR index i <-> bar i + 1
+
+    if method == "window":
+        s_tr = rolling_sum(tr, p)
+        s_p = rolling_sum(pdm, p)
+        s_m = rolling_sum(mdm, p)
+        # dx for "end" e = i + 1 (window tr[e-p:e]), ends p..m
+        with np.errstate(divide="ignore", invalid="ignore"):
+            plus = 100.0 * s_p / s_tr
+            minus = 100.0 * s_m / s_tr
+            denom = plus + minus
+            dx = np.where(denom <= 0, 0.0, 100.0 * np.abs(plus - minus) / denom)
+        valid = ~np.isnan(s_tr) & (s_tr > 0)
+        dx = np.where(valid, dx, 0.0)
+        cnt = np.cumsum(valid)
+        csum = np.cumsum(dx)
+        ends = np.arange(1, m + 1)  # end index for tr position i
+        lo = np.maximum(p, ends - 3 * p)  # earliest end allowed
+        # tail = last p valid dx with end >= lo, ends run up to L = tr position
+        idx = np.arange(m)
+        lo_idx = lo - 1  # tr position of end lo
+        cnt_before_lo = np.where(lo_idx > 0, cnt[np.maximum(lo_idx - 1, 0)], 0)
+        in_range = cnt - cnt_before_lo
+        take = np.minimum(in_range, p)
+        # position after which the last `take` valid values start
+        target = cnt - take
+        start_pos = np.searchsorted(cnt, target, side="right")  # first tr position with cnt > target
+        sum_before = np.where(start_pos > 0, csum[np.maximum(start_pos - 1, 0)], 0.0)
+        tail_sum = csum - sum_before
+        with np.errstate(divide="ignore", invalid="ignore"):
+            val = np.where(take > 0, tail_sum / take, 0.0)
+        val = np.where(idx + 1 >= p + 1, val, np.nan)  # needs len(closes) >= p + 2
+        out[1:] = val
+        return out
+
+    # Wilder, seeded with the SMA of the first p values
+    a_sm = wilder(tr, p, seed="sma")
+    p_sm = wilder(pdm, p, seed="sma")
+    m_sm = wilder(mdm, p, seed="sma")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pdi = 100.0 * (p_sm / a_sm)
+        mdi = 100.0 * (m_sm / a_sm)
+        denom = pdi + mdi
+        dx = np.where(denom <= 0, 0.0, 100.0 * np.abs(pdi - mdi) / denom)
+    valid = np.zeros(m, dtype=bool)
+    valid[p:] = a_sm[p:] > 0  # dx values start at TR index p (after the seed)
+    dx = np.where(valid, dx, 0.0)
+    cnt = np.cumsum(valid)
+    csum = np.cumsum(dx)
+    take = np.minimum(cnt, p)
+    start_pos = np.searchsorted(cnt, cnt - take, side="right")
+    sum_before = np.where(start_pos > 0, csum[np.maximum(start_pos - 1, 0)], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        val = np.where(take > 0, (csum - sum_before) / take, 0.0)
+    val[:p] = np.nan
+    out[1:] = val
+    return out
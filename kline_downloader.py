@@ -0,0 +1,400 @@
+"""kline_downloader.py
+
+One Bybit v5 kline downloader for download_kline_csv.py, run_backtest_opt.py
+and data_store.py (they used to carry three serial pagers with a fixed
+sleep(0.12) between pages and no way to resume).
+
+- a range is cut into fixed windows of `limit` bars: [start, start + limit*step)
+  each window is one request with explicit start/end, so windows are independent
+  and run on a thread pool (many symbols/intervals at once)
+- every request takes a token from one shared TokenBucket (global rate budget);
+  retCode 10006 / HTTP 429 / a low X-Bapi-Limit-Status pause the whole bucket
+- sync() writes straight into the candle store: windows are committed in time
+  order with CandleStore.append(), and `{store}/download.json` records the next
+  window start, so a crashed run resumes where it stopped
+- base_url / fetch_page are injectable, so the whole thing runs against a local
+  fake kline server
+
+Usage
+    python kline_downloader.py --symbols BTCUSDT,ETHUSDT --intervals 15,60 --days 730
+    python kline_downloader.py --symbols-file symbols.txt --intervals 15 --days 730 --workers 16 --rate 40
+    python kline_downloader.py --symbols BTCUSDT --intervals 15 --days 7 --base-url http://127.0.0.1:8099
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+import candle_store
+from bybit_rate_limiter import TokenBucket
+from market_data_cache import interval_seconds
+
+BYBIT_BASE = "https://api.bybit.com"
+PAGE_LIMIT = 1000
+CHECKPOINT = "download.json"
+
+Row = tuple  # (ts_ms, open, high, low, close, volume)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except Exception:
+        return float(default)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(float(str(os.getenv(name, str(default))).strip()))
+    except Exception:
+        return int(default)
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def windows(interval: Any, start_ms: int, end_ms: int, limit: int = PAGE_LIMIT) -> list[tuple[int, int]]:
+    """[start_ms, end_ms] -> inclusive request windows of at most `limit` bars."""
+    step = interval_seconds(interval) * 1000
+    span = step * max(1, int(limit))
+    out = []
+    cur = int(start_ms)
+    while cur <= end_ms:
+        out.append((cur, min(int(end_ms), cur + span - 1)))
+        cur += span
+    return out
+
+
+class RateLimited(RuntimeError):
+    pass
+
+
+class KlineDownloader:
+    """
+    Shared pager.
+    - fetch_window(...)  one request (rate budget + retries)
+    - download(...)      rows for one (symbol, interval) range, windows in parallel
+    - sync(...)          many (symbol, interval) jobs into the candle store, resumable
+    """
+
+    def __init__(
+        self,
+        category: str = "linear",
+        base_url: str | None = None,
+        workers: int | None = None,
+        rate: float | None = None,
+        limit: int = PAGE_LIMIT,
+        retries: int = 5,
+        root: str | None = None,
+        fetch_page: Callable[..., list] | None = None,
+        proxies: dict | None = None,
+        timeout: float = 20.0,
+    ):
+        self.category = category
+        self.base_url = (base_url or os.getenv("BYBIT_BASE_URL") or BYBIT_BASE).rstrip("/")
+        self.workers = max(1, _env_int("KLINE_DL_WORKERS", 8) if workers is None else int(workers))
+        rate = _env_float("KLINE_DL_RATE", 20.0) if rate is None else float(rate)
+        self.bucket = TokenBucket(rate, max(1.0, rate))
+        self.limit = max(1, min(1000, int(limit)))
+        self.retries = max(0, int(retries))
+        self.root = root
+        self.proxies = proxies
+        self.timeout = float(timeout)
+        self._fetch_page = fetch_page or self._http_page
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"requests": 0, "retries": 0, "rate_pauses": 0, "bars": 0, "wait_sec": 0.0}
+
+    # ---------------- one request ----------------
+    def _session(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            import requests
+
+            s = self._local.session = requests.Session()
+            s.headers.update({"User-Agent": "Mozilla/5.0", "Accept": "application/json"})
+        return s
+
+    def _pause(self, sec: float):
+        with self._lock:
+            self.bucket.paused_until = max(self.bucket.paused_until, time.time() + max(0.0, sec))
+            self.bucket.tokens = min(self.bucket.tokens, 0.0)
+            self.stats["rate_pauses"] += 1
+
+    def _http_page(self, symbol: str, interval: str, start_ms: int, end_ms: int, limit: int) -> list:
+        params = {"category": self.category, "symbol": symbol, "interval": interval, "start": int(start_ms), "end": int(end_ms), "limit": int(limit)}
+        r = self._session().get(f"{self.base_url}/v5/market/kline", params=params, timeout=self.timeout, proxies=self.proxies)
+        if r.status_code == 429:
+            raise RateLimited("HTTP 429")
+        r.raise_for_status()
+        h = r.headers or {}
+        try:
+            if h.get("X-Bapi-Limit-Status") is not None and float(h["X-Bapi-Limit-Status"]) <= 1 and h.get("X-Bapi-Limit-Reset-Timestamp"):
+                self._pause(float(h["X-Bapi-Limit-Reset-Timestamp"]) / 1000.0 - time.time())
+        except Exception:
+            pass
+        j = r.json()
+        if str(j.get("retCode")) == "10006":
+            raise RateLimited(j.get("retMsg") or "10006")
+        if str(j.get("retCode")) != "0":
+            raise RuntimeError(f"Bybit retCode={j.get('retCode')} retMsg={j.get('retMsg')}")
+        return (j.get("result") or {}).get("list") or []
+
+    def fetch_window(self, symbol: str, interval: str, start_ms: int, end_ms: int, limit: int | None = None) -> list[Row]:
+        """
+        Rows of [start_ms, end_ms], ascending. Raises after `retries` failures, so an
+        empty list always means the exchange answered retCode 0 with no bars.
+        """
+        limit = self.limit if limit is None else max(1, min(1000, int(limit)))
+        for attempt in range(self.retries + 1):
+            with self._lock:
+                wait = self.bucket.reserve()
+                self.stats["requests"] += 1
+                self.stats["wait_sec"] += wait
+            if wait > 0:
+                time.sleep(min(wait, 30.0))
+            try:
+                raw = self._fetch_page(symbol, interval, start_ms, end_ms, limit)
+            except RateLimited:
+                self._pause(1.0 + attempt)
+                if attempt >= self.retries:
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                continue
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(min(8.0, 0.25 * (2 ** attempt)) * (0.5 + random.random()))
+                continue
+            rows = []
+            for it in raw:
+                try:
+                    if isinstance(it, dict):
+                        it = (it["ts"], it["open"], it["high"], it["low"], it["close"], it.get("volume", 0.0))
+                    ts = int(float(it[0]))
+                    if start_ms <= ts <= end_ms:
+                        rows.append((ts, float(it[1]), float(it[2]), float(it[3]), float(it[4]), float(it[5]) if len(it) > 5 else 0.0))
+                except Exception:
+                    continue
+            rows.sort(key=lambda x: x[0])
+            with self._lock:
+                self.stats["bars"] += len(rows)
+            return rows
+        return []
+
+    # ---------------- one range, in memory ----------------
+    def download(self, symbol: str, interval: Any, start_ms: int, end_ms: int, limit: int | None = None) -> list[Row]:
+        """
+        All rows of [start_ms, end_ms] (ascending, de-duplicated); windows of `limit`
+        bars (default self.limit) run in parallel. A failed window raises.
+        """
+        symbol, interval = str(symbol).upper(), str(interval)
+        limit = self.limit if limit is None else max(1, min(1000, int(limit)))
+        wins = windows(interval, start_ms, end_ms, limit)
+        with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(wins)))) as ex:
+            pages = list(ex.map(lambda w: self.fetch_window(symbol, interval, w[0], w[1], limit), wins))
+        out, last = [], None
+        for rows in pages:
+            for r in rows:
+                if last is None or r[0] > last:
+                    out.append(r)
+                    last = r[0]
+        return out
+
+    # ---------------- many ranges -> candle store ----------------
+    def _ckpt_path(self, st) -> str:
+        return os.path.join(st.path, CHECKPOINT)
+
+    def _read_ckpt(self, st) -> dict:
+        try:
+            with open(self._ckpt_path(st), "r", encoding="utf-8") as f:
+                return json.load(f) or {}
+        except Exception:
+            return {}
+
+    def _write_ckpt(self, st, ck: dict):
+        ck["updated"] = int(time.time())
+        tmp = self._ckpt_path(st) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(ck, f)
+        os.replace(tmp, self._ckpt_path(st))
+
+    def _plan(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> dict:
+        """
+        Which windows a (symbol, interval) job still needs.
+        - head: [start_ms, covered_from) older than anything stored -> fetched, merged once
+        - tail: from max(last stored bar, checkpoint next_ms) to end_ms -> appended in order
+        """
+        st = candle_store.open_store(symbol, interval, root=self.root, create=True)
+        ck = self._read_ckpt(st)
+        step = interval_seconds(interval) * 1000
+        known = [int(x) for x in (st.first_ts, ck.get("covered_from")) if x is not None]
+        covered_from = min(known) if known else None
+        head = []
+        if covered_from is not None and start_ms < covered_from:
+            head = windows(interval, start_ms, covered_from - 1, self.limit)
+        tail_from = start_ms if covered_from is None else max(start_ms, covered_from)
+        if st.last_ts is not None:
+            tail_from = max(tail_from, st.last_ts)  # last bar may be the forming one -> refetch it
+        nxt = int(ck.get("next_ms") or 0)
+        if nxt and (st.last_ts is None or nxt > st.last_ts + step):
+            tail_from = max(tail_from, nxt)  # windows after the last bar were already seen empty
+        tail = windows(interval, tail_from, end_ms, self.limit) if tail_from <= end_ms else []
+        ck.update(start_ms=int(start_ms), end_ms=int(end_ms), status="running")
+        ck.setdefault("covered_from", covered_from if covered_from is not None else int(start_ms))
+        return {"symbol": symbol, "interval": interval, "store": st, "ckpt": ck, "head": head, "tail": tail, "done": 0, "added": 0, "pending": {}, "lock": threading.Lock()}
+
+    def sync(self, jobs: Iterable[tuple[str, Any]], start_ms: int, end_ms: int | None = None, log: Callable | None = print) -> dict:
+        """
+        Download every (symbol, interval) in `jobs` over [start_ms, end_ms] into the candle store.
+        Returns {"SYMBOL_interval": {"bars": n_in_store, "added": n, "error": str|None}, ...}.
+        """
+        end_ms = now_ms() if end_ms is None else int(end_ms)
+        t0 = time.time()
+        plans = []
+        for sym, itv in jobs:
+            plans.append(self._plan(str(sym).upper(), str(itv), int(start_ms), end_ms))
+        total = sum(len(p["head"]) + len(p["tail"]) for p in plans)
+        if log:
+            log(f"[KLINE_DL] {len(plans)} job(s), {total} window(s), workers={self.workers} rate={self.bucket.rate}/s")
+
+        results: dict[str, dict] = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as ex:
+            futs = []
+            for p in plans:
+                p["head_rows"] = [None] * len(p["head"])
+                for i, w in enumerate(p["head"]):
+                    futs.append(ex.submit(self._run_head, p, i, w))
+                for i, w in enumerate(p["tail"]):
+                    futs.append(ex.submit(self._run_tail, p, i, w))
+            for f in futs:
+                try:
+                    f.result()
+                except Exception:
+                    pass  # recorded per job
+        for p in plans:
+            key = f"{p['symbol']}_{p['interval']}"
+            err = p.get("error")
+            if not err and p["head"]:
+                rows = [r for part in p["head_rows"] for r in (part or [])]
+                if rows:
+                    p["added"] += p["store"].merge(_columns(rows))
+                p["ckpt"]["covered_from"] = int(min(p["ckpt"].get("covered_from") or start_ms, start_ms))
+            if not err:
+                p["ckpt"]["status"] = "done"
+                p["ckpt"].pop("error", None)
+            else:
+                p["ckpt"]["status"] = "error"
+                p["ckpt"]["error"] = err
+            self._write_ckpt(p["store"], p["ckpt"])
+            results[key] = {"bars": len(p["store"]), "added": p["added"], "error": err}
+        if log:
+            bad = sum(1 for r in results.values() if r["error"])
+            log(f"[KLINE_DL] done in {time.time() - t0:.1f}s requests={self.stats['requests']} bars={self.stats['bars']} retries={self.stats['retries']} errors={bad}")
+        return results
+
+    def _run_head(self, p: dict, i: int, w: tuple[int, int]):
+        if p.get("error"):
+            return
+        try:
+            p["head_rows"][i] = self.fetch_window(p["symbol"], p["interval"], w[0], w[1])
+        except Exception as e:
+            p["error"] = f"{type(e).__name__}: {e}"
+            raise
+
+    def _run_tail(self, p: dict, i: int, w: tuple[int, int]):
+        if p.get("error"):
+            return
+        try:
+            rows = self.fetch_window(p["symbol"], p["interval"], w[0], w[1])
+        except Exception as e:
+            p["error"] = f"{type(e).__name__}: {e}"
+            raise
+        # windows finish out of order; commit the contiguous prefix so the store stays append-only
+        with p["lock"]:
+            p["pending"][i] = rows
+            before = p["done"]
+            ready = []
+            while p["done"] in p["pending"]:
+                ready.extend(p["pending"].pop(p["done"]))
+                p["done"] += 1
+            if p["done"] == before:
+                return
+            try:
+                if ready:
+                    p["added"] += p["store"].append(_columns(ready))
+                p["ckpt"]["next_ms"] = int(p["tail"][p["done"] - 1][1] + 1)
+                self._write_ckpt(p["store"], p["ckpt"])
+            except Exception as e:
+                p["error"] = f"{type(e).__name__}: {e}"
+                raise
+
+
+def _columns(rows: list[Row]) -> dict:
+    return {c: [r[k] for r in rows] for k, c in enumerate(candle_store.COLUMNS)}
+
+
+# ---------------- shared helpers for the old call sites ----------------
+_DEFAULT: dict[str, KlineDownloader] = {}
+_DEFAULT_LOCK = threading.Lock()
+
+
+def shared(category: str = "linear") -> KlineDownloader:
+    """Process-wide downloader per category, so every caller shares one rate budget."""
+    with _DEFAULT_LOCK:
+        dl = _DEFAULT.get(category)
+        if dl is None:
+            dl = _DEFAULT[category] = KlineDownloader(category=category)
+        return dl
+
+
+def download_rows(category: str, symbol: str, interval: Any, start_ms: int, end_ms: int) -> list[Row]:
+    return shared(category).download(symbol, interval, start_ms, end_ms)
+
+
+def _read_symbols(args) -> list[str]:
+    syms = [s.strip().upper() for s in str(args.symbols or "").split(",") if s.strip()]
+    if args.symbols_file:
+        with open(args.symbols_file, "r", encoding="utf-8") as f:
+            syms += [ln.strip().upper() for ln in f if ln.strip() and not ln.startswith("#")]
+    return list(dict.fromkeys(syms))
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="parallel, resumable Bybit kline downloader -> candle store")
+    ap.add_argument("--symbols", default="")
+    ap.add_argument("--symbols-file", default="")
+    ap.add_argument("--intervals", default="15")
+    ap.add_argument("--days", type=float, default=30)
+    ap.add_argument("--category", default="linear", choices=["linear", "inverse", "spot"])
+    ap.add_argument("--root", default=None, help="candle store root (default: $CANDLE_STORE_DIR or $DATA_DIR/candles)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--rate", type=float, default=None, help="requests/sec for the whole run")
+    ap.add_argument("--base-url", default=None)
+    args = ap.parse_args(argv)
+
+    syms = _read_symbols(args)
+    if not syms:
+        raise SystemExit("no symbols (--symbols or --symbols-file)")
+    intervals = [x.strip() for x in str(args.intervals).split(",") if x.strip()]
+    dl = KlineDownloader(category=args.category, base_url=args.base_url, workers=args.workers, rate=args.rate, root=args.root)
+    end = now_ms()
+    res = dl.sync([(s, i) for s in syms for i in intervals], end - int(args.days * 86400 * 1000), end)
+    for key, r in sorted(res.items()):
+        print(f"  {key:<20} bars={r['bars']:<8} added={r['added']:<8}" + (f" ERROR {r['error']}" if r["error"] else ""))
+    return 1 if any(r["error"] for r in res.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -35,6 +35,11 @@ except Exception:  # pragma: no cover
         except Exception:
             return default
 
+try:
+    import trade_logger
+except Exception:  # pragma: no cover
+    trade_logger = None
+
 
 def _safe_float(v: Any, default: float = 0.0) -> float:
     try:
@@ -118,7 +123,13 @@ def record_trade_reason(pos: dict[str, Any], exit_reason: str, pnl: float, exit_
         "score": _safe_float(pos.get("score"), 0.0),
         "strategy": str(pos.get("strategy") or ""),
     }
-    _append_jsonl(LOSS_EVENTS_PATH, event)
+    if trade_logger is not None:
+        try:
+            trade_logger.open_log(LOSS_EVENTS_PATH).append(event)
+        except Exception:
+            _append_jsonl(LOSS_EVENTS_PATH, event)
+    else:
+        _append_jsonl(LOSS_EVENTS_PATH, event)
 
     stats = safe_read_json(LOSS_STATS_PATH, {"total": 0, "buckets": {}, "symbols": {}})
     if not isinstance(stats, dict):
@@ -118,6 +118,14 @@ POLL_TIMEOUT = int(os.getenv("TG_POLL_TIMEOUT", "25"))
 POLL_SLEEP = float(os.getenv("TG_POLL_SLEEP", "0.5"))
 TRADING_TICK_SEC = float(os.getenv("TRADING_TICK_SEC", "5"))
 
+# SPLIT_LOOPS=true: position guard / scan tick / discovery / inst weights run on independent cadences.
+# false = legacy single trading_loop (one tick() does everything every TRADING_TICK_SEC).
+SPLIT_LOOPS = _env_bool("SPLIT_LOOPS", "true")
+POSITION_GUARD_SEC = float(os.getenv("POSITION_GUARD_SEC", "1"))
+DISCOVERY_LOOP_SEC = float(os.getenv("DISCOVERY_LOOP_SEC", "5"))
+WEIGHTS_LOOP_SEC = float(os.getenv("WEIGHTS_LOOP_SEC", "10"))
+LOOP_OVERRUN_LOG_SEC = float(os.getenv("LOOP_OVERRUN_LOG_SEC", "60"))
+
 # Security defaults:
 # TG_STRICT_CHAT=true means only .env CHAT_ID may control the bot.
 # If CHAT_ID is empty, Telegram commands are blocked instead of binding to a random first chat.
@@ -139,6 +147,7 @@ if CHAT_ID_ENV:
     trader_module.CHAT_ID = CHAT_ID_ENV
 
 trader = Trader(state)
+trader._split_loops = SPLIT_LOOPS
 _runtime_chat_id = CHAT_ID_ENV
 trader_lock = threading.RLock()
 
@@ -341,9 +350,160 @@ def trading_loop():
             time.sleep(3)
 
 
+class PeriodicLoop:
+    """
+    Fixed-rate loop with a deadline.
+    - run longer than deadline_sec -> overrun (counted, logged at most every LOOP_OVERRUN_LOG_SEC)
+    - slots missed because of a long run are skipped, not replayed
+    - stats go to state["loops"][name] (visible in /health when HEALTH_VERBOSE)
+    """
+
+    def __init__(self, name: str, interval_sec: float, deadline_sec: float, fn):
+        self.name = name
+        self.interval = max(0.05, float(interval_sec))
+        self.deadline = max(0.05, float(deadline_sec))
+        self.fn = fn
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.last_lag_ms = 0.0
+        self.last_overrun_ts = None
+        self._last_log_ts = 0.0
+
+    def _record(self, dur: float, lag: float):
+        ms = dur * 1000.0
+        self.runs += 1
+        self.total_ms += ms
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        self.last_lag_ms = lag * 1000.0
+        if dur > self.deadline:
+            self.overruns += 1
+            self.last_overrun_ts = time.time()
+            if time.time() - self._last_log_ts >= LOOP_OVERRUN_LOG_SEC:
+                self._last_log_ts = time.time()
+                print(
+                    f"[LOOP] {self.name} overrun {ms:.0f}ms > deadline {self.deadline * 1000:.0f}ms "
+                    f"(overruns={self.overruns}/{self.runs} skipped={self.skipped})",
+                    flush=True,
+                )
+        state.setdefault("loops", {})[self.name] = self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "interval_sec": self.interval,
+            "deadline_sec": self.deadline,
+            "runs": self.runs,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "last_ms": round(self.last_ms, 1),
+            "avg_ms": round(self.total_ms / self.runs, 1) if self.runs else None,
+            "max_ms": round(self.max_ms, 1),
+            "last_lag_ms": round(self.last_lag_ms, 1),
+            "last_overrun_ts": self.last_overrun_ts,
+        }
+
+    def run_forever(self):
+        next_ts = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now < next_ts:
+                time.sleep(next_ts - now)
+            start = time.monotonic()
+            try:
+                self.fn()
+            except Exception as e:
+                self.errors += 1
+                print(f"[LOOP] {self.name} crash: {e!r}", flush=True)
+                state["last_error"] = f"{self.name}_loop: {e}"
+            end = time.monotonic()
+            self._record(end - start, start - next_ts)
+            next_ts += self.interval
+            if next_ts < end:
+                missed = int((end - next_ts) // self.interval) + 1
+                self.skipped += missed
+                next_ts += missed * self.interval
+
+
+def _guard_job():
+    with trader_lock:
+        if bool(getattr(trader, "trading_enabled", True)):
+            trader.guard_positions()
+
+
+def _scan_job():
+    # network warm-up (tickers table + candidate klines) runs outside trader_lock,
+    # so the position guard is never stuck behind a universe scan.
+    with trader_lock:
+        state["running"] = bool(getattr(trader, "trading_enabled", True))
+        cands = trader.scan_candidates() if (state["running"] and not trader.positions and trader.scan_due()) else []
+    if cands:
+        try:
+            trader_module.refresh_ticker_table(max_age=2.0)
+        except Exception as e:
+            state["last_error"] = f"ticker_table: {e}"
+        try:
+            trader_module.prefetch_scan_inputs(cands)
+        except Exception as e:
+            state["last_error"] = f"scan_prefetch: {e}"
+
+    with trader_lock:
+        if state["running"]:
+            trader.tick()
+        state["last_heartbeat"] = time.time()
+
+
+def _discovery_job():
+    with trader_lock:
+        due = bool(getattr(trader, "trading_enabled", True)) and trader.discovery_due()
+    if not due:
+        return
+    try:
+        rows = trader_module._fetch_ticker_table()
+    except Exception as e:
+        rows = None
+        state["last_error"] = f"discovery: {e}"
+    with trader_lock:
+        try:
+            trader._refresh_discovery(rows=rows)
+            trader._cb_on_success()
+        except Exception as e:
+            trader._cb_on_error("refresh_discovery", e)
+
+
+def _weights_job():
+    with trader_lock:
+        if bool(getattr(trader, "trading_enabled", True)):
+            trader._recalc_inst_weights()
+
+
+def start_trading_loops():
+    if not SPLIT_LOOPS:
+        threading.Thread(target=trading_loop, daemon=True).start()
+        return
+    loops = [
+        PeriodicLoop("guard", POSITION_GUARD_SEC, POSITION_GUARD_SEC, _guard_job),
+        PeriodicLoop("scan", TRADING_TICK_SEC, TRADING_TICK_SEC, _scan_job),
+        PeriodicLoop("discovery", DISCOVERY_LOOP_SEC, 30.0, _discovery_job),
+        PeriodicLoop("weights", WEIGHTS_LOOP_SEC, 30.0, _weights_job),
+    ]
+    for lp in loops:
+        threading.Thread(target=lp.run_forever, name=f"loop-{lp.name}", daemon=True).start()
+    print(
+        f"[BOOT] split loops guard={POSITION_GUARD_SEC}s scan={TRADING_TICK_SEC}s "
+        f"discovery={DISCOVERY_LOOP_SEC}s weights={WEIGHTS_LOOP_SEC}s",
+        flush=True,
+    )
+
+
 if __name__ == "__main__":
     print("[BOOT] Bot starting...", flush=True)
     tg_reset_webhook_once()
     threading.Thread(target=telegram_loop, daemon=True).start()
-    threading.Thread(target=trading_loop, daemon=True).start()
+    start_trading_loops()
     app.run(host="0.0.0.0", port=PORT)
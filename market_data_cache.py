@@ -0,0 +1,299 @@
+"""market_data_cache.py
+
+Per-tick market data snapshot shared by every kline/ticker consumer.
+
+One `_score_symbol()` pass asks for the same 15m klines from the regime
+detector, the inst-risk snapshot, both signal sides, the MTF filter and several
+runtime patches, and for the same ticker from get_price / get_spread_pct / the
+liquidity filter / the /why snapshot. trader.get_klines and trader.get_ticker
+route through this cache so all of them share one exchange round trip.
+
+Kline entries are keyed by (symbol, interval, candle-close boundary): a new
+candle always forces a refetch, and within one candle a short TTL keeps the
+still-forming bar fresh across ticks. Ticker entries only use a TTL; a whole
+category can be loaded at once from the category-wide /v5/market/tickers list
+(bulk ticker table), so a scan pays one ticker request instead of one per symbol.
+
+Below the snapshot sits KlineRingBuffer: a per-(symbol, interval) buffer seeded
+once with full history. Later misses only ask Bybit for the bars since the last
+stored open time (`start` + a small `limit`) and replace the still-forming last
+bar, while callers keep receiving the usual newest-first Bybit list.
+
+Dependency-free and thread-safe; the fetch callables are injected by trader.py.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except Exception:
+        return float(default)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(float(str(os.getenv(name, str(default))).strip()))
+    except Exception:
+        return int(default)
+
+
+_LETTER_INTERVAL_SEC = {"D": 86400, "W": 7 * 86400, "M": 30 * 86400}
+
+
+def interval_seconds(interval: Any) -> int:
+    """Bybit interval ("1", "15", "60", "D", "W", "M") -> seconds."""
+    s = str(interval or "").strip().upper()
+    if s in _LETTER_INTERVAL_SEC:
+        return _LETTER_INTERVAL_SEC[s]
+    try:
+        return max(60, int(float(s)) * 60)
+    except Exception:
+        return 60
+
+
+def candle_boundary(interval: Any, now: float | None = None) -> int:
+    """Index of the candle that is currently forming for `interval`."""
+    now = time.time() if now is None else float(now)
+    return int(now // interval_seconds(interval))
+
+
+class MarketSnapshotCache:
+    """
+    kline/ticker snapshot cache.
+    - klines: (symbol, interval) -> rows of the current candle boundary, newest-first (Bybit shape)
+    - a smaller `limit` is served by slicing a larger cached fetch
+    - tickers: symbol -> raw Bybit ticker dict, filled per symbol or in bulk (load_tickers)
+    """
+
+    def __init__(self, kline_ttl_sec: float | None = None, ticker_ttl_sec: float | None = None, kline_min_fetch: int | None = None):
+        self.kline_ttl_sec = _env_float("MD_KLINE_TTL_SEC", 8.0) if kline_ttl_sec is None else float(kline_ttl_sec)
+        self.ticker_ttl_sec = _env_float("MD_TICKER_TTL_SEC", 2.0) if ticker_ttl_sec is None else float(ticker_ttl_sec)
+        # Fetch at least this many bars so the 180/220/240/300-bar consumers share one request.
+        self.kline_min_fetch = _env_int("MD_KLINE_MIN_FETCH", 300) if kline_min_fetch is None else int(kline_min_fetch)
+        # Bulk table rows stay valid for one scan (SCAN_LIMIT symbols), not just one tick.
+        self.bulk_ttl_sec = _env_float("MD_BULK_TICKER_TTL_SEC", 15.0)
+        self._lock = threading.Lock()
+        self._klines: dict[tuple[str, str], dict[str, Any]] = {}
+        self._tickers: dict[str, tuple[float, Any, float]] = {}
+        self._bulk_ts = 0.0
+        self._bulk_size = 0
+        self._stats = {"kline_hit": 0, "kline_miss": 0, "ticker_hit": 0, "ticker_miss": 0, "bulk_refresh": 0}
+
+    # ---------------- klines ----------------
+    def klines(self, symbol: str, interval: Any, limit: int, fetch: Callable[[str, str, int], list]) -> list:
+        sym = str(symbol or "").upper()
+        itv = str(interval)
+        limit = max(1, int(limit or 1))
+        now = time.time()
+        key = (sym, itv)
+
+        with self._lock:
+            ent = self._klines.get(key)
+            if ent is not None and self._kline_fresh(ent, itv, limit, now):
+                self._stats["kline_hit"] += 1
+                return ent["rows"][:limit]
+            self._stats["kline_miss"] += 1
+
+        want = min(1000, max(limit, self.kline_min_fetch))
+        rows = list(fetch(sym, itv, want) or [])
+        if rows:
+            with self._lock:
+                self._klines[key] = {
+                    "rows": rows,
+                    "boundary": candle_boundary(itv, now),
+                    "ts": now,
+                    "fetched": want,
+                }
+        return rows[:limit]
+
+    def _kline_fresh(self, ent: dict, interval: str, limit: int, now: float) -> bool:
+        if ent.get("boundary") != candle_boundary(interval, now):
+            return False
+        if now - float(ent.get("ts") or 0) > self.kline_ttl_sec:
+            return False
+        rows = ent.get("rows") or []
+        # A short response means the exchange had no more history: it still covers `limit`.
+        return limit <= len(rows) or len(rows) < int(ent.get("fetched") or 0)
+
+    # ---------------- tickers ----------------
+    def ticker(self, symbol: str, fetch: Callable[[str], Any]):
+        sym = str(symbol or "").upper()
+        now = time.time()
+        with self._lock:
+            ent = self._tickers.get(sym)
+            if ent is not None and now - ent[0] <= ent[2]:
+                self._stats["ticker_hit"] += 1
+                return ent[1]
+            self._stats["ticker_miss"] += 1
+
+        t = fetch(sym)
+        if t:
+            with self._lock:
+                self._tickers[sym] = (now, t, self.ticker_ttl_sec)
+        return t
+
+    def put_ticker(self, symbol: str, t: Any):
+        """Store a ticker fetched elsewhere (fresh, normal ticker TTL)."""
+        sym = str(symbol or "").upper()
+        if sym and t:
+            with self._lock:
+                self._tickers[sym] = (time.time(), t, self.ticker_ttl_sec)
+
+    def peek_ticker(self, symbol: str):
+        """Cached ticker if still fresh, else None. Never fetches, never counts."""
+        sym = str(symbol or "").upper()
+        with self._lock:
+            ent = self._tickers.get(sym)
+            if ent is not None and time.time() - ent[0] <= ent[2]:
+                return ent[1]
+        return None
+
+    def load_tickers(self, rows: list) -> int:
+        """Seed the ticker table from a category-wide /v5/market/tickers list."""
+        now = time.time()
+        n = 0
+        with self._lock:
+            for t in rows or []:
+                sym = str((t or {}).get("symbol") or "").upper()
+                if not sym:
+                    continue
+                self._tickers[sym] = (now, t, self.bulk_ttl_sec)
+                n += 1
+            if n:
+                self._bulk_ts = now
+                self._bulk_size = n
+                self._stats["bulk_refresh"] += 1
+        return n
+
+    def bulk_age(self) -> float:
+        with self._lock:
+            return (time.time() - self._bulk_ts) if self._bulk_ts > 0 else float("inf")
+
+    # ---------------- maintenance ----------------
+    def invalidate(self, symbol: str | None = None):
+        with self._lock:
+            if symbol is None:
+                self._klines.clear()
+                self._tickers.clear()
+                return
+            sym = str(symbol).upper()
+            self._tickers.pop(sym, None)
+            for key in [k for k in self._klines if k[0] == sym]:
+                self._klines.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            st = dict(self._stats)
+            st["kline_entries"] = len(self._klines)
+            st["ticker_entries"] = len(self._tickers)
+            st["bulk_size"] = self._bulk_size
+            st["bulk_age_sec"] = round(time.time() - self._bulk_ts, 1) if self._bulk_ts > 0 else None
+        for kind in ("kline", "ticker"):
+            total = st[f"{kind}_hit"] + st[f"{kind}_miss"]
+            st[f"{kind}_hit_rate"] = round(st[f"{kind}_hit"] / total, 4) if total else 0.0
+        return st
+
+
+class KlineRingBuffer:
+    """
+    Incremental kline store.
+    - seed: one full `limit` fetch per (symbol, interval)
+    - update: fetch_page(symbol, interval, limit, start=last_open_ms) for the new bars only
+    - rows are kept oldest-first internally and returned newest-first (Bybit shape)
+    - a gap (too many bars missing, or the update does not reach back to the last bar) reseeds
+    """
+
+    def __init__(self, capacity: int | None = None, seed_limit: int | None = None, max_catchup: int | None = None):
+        self.capacity = max(50, _env_int("MD_KLINE_RING_SIZE", 1000) if capacity is None else int(capacity))
+        self.seed_limit = _env_int("MD_KLINE_RING_SEED", 300) if seed_limit is None else int(seed_limit)
+        self.max_catchup = _env_int("MD_KLINE_RING_MAX_CATCHUP", 200) if max_catchup is None else int(max_catchup)
+        self._lock = threading.Lock()
+        self._bufs: dict[tuple[str, str], dict[str, Any]] = {}
+        self._stats = {"seed": 0, "update": 0, "bars_fetched": 0}
+
+    @staticmethod
+    def _open_ms(row: Any) -> int:
+        try:
+            return int(float(row[0]))
+        except Exception:
+            return -1
+
+    def klines(self, symbol: str, interval: Any, limit: int, fetch_page: Callable[..., list]) -> list:
+        sym = str(symbol or "").upper()
+        itv = str(interval)
+        limit = max(1, min(int(limit or 1), self.capacity))
+        key = (sym, itv)
+
+        with self._lock:
+            ent = self._bufs.get(key)
+            need_seed = ent is None or (len(ent["rows"]) < limit and ent["seeded"] < limit)
+            last_open = self._open_ms(ent["rows"][-1]) if (ent is not None and ent["rows"]) else -1
+
+        if not need_seed and last_open > 0:
+            step_ms = interval_seconds(itv) * 1000
+            missing = int((time.time() * 1000 - last_open) // step_ms) + 1
+            if missing > self.max_catchup:
+                need_seed = True
+            else:
+                rows = list(fetch_page(sym, itv, min(1000, missing + 1), start=last_open) or [])
+                if self._merge(key, rows, last_open):
+                    with self._lock:
+                        self._stats["update"] += 1
+                        self._stats["bars_fetched"] += len(rows)
+                        return list(reversed(self._bufs[key]["rows"]))[:limit]
+                need_seed = True
+
+        want = min(1000, max(limit, self.seed_limit))
+        rows = list(fetch_page(sym, itv, want) or [])
+        if not rows:
+            return []
+        ordered = sorted((r for r in rows if self._open_ms(r) >= 0), key=self._open_ms)
+        with self._lock:
+            self._bufs[key] = {"rows": deque(ordered, maxlen=self.capacity), "seeded": want}
+            self._stats["seed"] += 1
+            self._stats["bars_fetched"] += len(rows)
+        return list(reversed(ordered))[:limit]
+
+    def _merge(self, key: tuple[str, str], rows: list, last_open: int) -> bool:
+        """Append bars newer than the last stored one and replace the forming bar."""
+        if not rows:
+            return False
+        ordered = sorted((r for r in rows if self._open_ms(r) >= 0), key=self._open_ms)
+        if not ordered or self._open_ms(ordered[0]) > last_open:
+            return False  # update does not overlap the stored tail -> gap
+        with self._lock:
+            ent = self._bufs.get(key)
+            if ent is None or not ent["rows"]:
+                return False
+            buf = ent["rows"]
+            for r in ordered:
+                t = self._open_ms(r)
+                tail = self._open_ms(buf[-1])
+                if t == tail:
+                    buf[-1] = r
+                elif t > tail:
+                    buf.append(r)
+        return True
+
+    def invalidate(self, symbol: str | None = None):
+        with self._lock:
+            if symbol is None:
+                self._bufs.clear()
+                return
+            sym = str(symbol).upper()
+            for key in [k for k in self._bufs if k[0] == sym]:
+                self._bufs.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            st = dict(self._stats)
+            st["buffers"] = len(self._bufs)
+        return st
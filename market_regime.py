@@ -1,79 +1,25 @@
 from typing import List, Dict, Any
 
+import indicators as ind
+
 
 def ema(values: List[float], period: int) -> float:
     if not values:
         return 0.0
-    k = 2 / (period + 1)
-    out = values[0]
-    for v in values[1:]:
-        out = (v * k) + (out * (1 - k))
-    return out
+    return ind.last(ind.ema(values, period))
 
 
 def atr(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> float:
     if len(closes) < period + 1:
         return 0.0
-    trs = []
-    for i in range(1, len(closes)):
-        tr = max(
-            highs[i] - lows[i],
-            abs(highs[i] - closes[i - 1]),
-            abs(lows[i] - closes[i - 1]),
-        )
-        trs.append(tr)
-    if len(trs) < period:
-        return 0.0
-    return sum(trs[-period:]) / period
+    n = period + 1
+    return ind.last(ind.atr(highs[-n:], lows[-n:], closes[-n:], period))
 
 
 def adx(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> float:
     if len(closes) < period + 2:
         return 0.0
-
-    tr_list: List[float] = []
-    plus_dm: List[float] = []
-    minus_dm: List[float] = []
-
-    for i in range(1, len(closes)):
-        up_move = highs[i] - highs[i - 1]
-        down_move = lows[i - 1] - lows[i]
-        plus_dm.append(up_move if (up_move > down_move and up_move > 0) else 0.0)
-        minus_dm.append(down_move if (down_move > up_move and down_move > 0) else 0.0)
-        tr = max(
-            highs[i] - lows[i],
-            abs(highs[i] - closes[i - 1]),
-            abs(lows[i] - closes[i - 1]),
-        )
-        tr_list.append(tr)
-
-    if len(tr_list) < period:
-        return 0.0
-
-    atr_sm = sum(tr_list[:period]) / period
-    plus_sm = sum(plus_dm[:period]) / period
-    minus_sm = sum(minus_dm[:period]) / period
-    dx_values: List[float] = []
-
-    for i in range(period, len(tr_list)):
-        atr_sm = ((atr_sm * (period - 1)) + tr_list[i]) / period
-        plus_sm = ((plus_sm * (period - 1)) + plus_dm[i]) / period
-        minus_sm = ((minus_sm * (period - 1)) + minus_dm[i]) / period
-
-        if atr_sm <= 0:
-            continue
-        plus_di = 100.0 * (plus_sm / atr_sm)
-        minus_di = 100.0 * (minus_sm / atr_sm)
-        denom = plus_di + minus_di
-        if denom <= 0:
-            dx_values.append(0.0)
-        else:
-            dx_values.append(100.0 * abs(plus_di - minus_di) / denom)
-
-    if not dx_values:
-        return 0.0
-    tail = dx_values[-period:] if len(dx_values) >= period else dx_values
-    return sum(tail) / len(tail)
+    return ind.last(ind.adx(highs, lows, closes, period, method="wilder"))
 
 
 def detect_market_regime_from_ohlcv(ohlcv) -> str:
@@ -15,6 +15,11 @@ import time
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
+try:
+    from storage_utils import tail_jsonl
+except Exception:  # pragma: no cover
+    tail_jsonl = None
+
 
 def _env(name: str, default: str = "") -> str:
     return str(os.getenv(name, default)).strip()
@@ -63,6 +68,8 @@ def _read_json(path: Path, default: Any) -> Any:
 def _tail_jsonl(path: Path, limit: int = 200) -> List[Dict[str, Any]]:
     if not path.exists():
         return []
+    if tail_jsonl is not None:
+        return tail_jsonl(str(path), limit)
     try:
         lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()[-limit:]
     except Exception:
@@ -113,6 +113,22 @@ def cap_mode_params(mp: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+def closed_trade_summary(window_sec: float = 86400.0) -> str:
+    """data/loss_events.jsonl 의 최근 window 청산 요약 (trade_logger 인덱스 조회)."""
+    try:
+        import trade_logger
+        from storage_utils import data_path
+
+        log = trade_logger.open_log(data_path("loss_events.jsonl"))
+        rows = log.since(time.time() - float(window_sec))
+    except Exception as e:
+        return f"closed_24h=n/a ({e})"
+    pnl = sum(float(r.get("pnl", 0.0) or 0.0) for r in rows)
+    wins = sum(1 for r in rows if float(r.get("pnl", 0.0) or 0.0) > 0)
+    wr = (wins / len(rows) * 100.0) if rows else 0.0
+    return f"closed_24h={len(rows)} wr={wr:.1f}% pnl≈{pnl:.2f} (log={len(log)})"
+
+
 def compact_status(trader_obj: Any) -> str:
     total, wr, consec, day = observed_stats(trader_obj)
     blocked, msg = should_block_entry(trader_obj)
@@ -122,6 +138,7 @@ def compact_status(trader_obj: Any) -> str:
         f"on={_env_bool('OPS_SAFETY_ON', True)} block_now={blocked}",
         f"reason={msg}",
         f"trades={total} wr={wr:.1f}% consec_losses={consec} day≈{day:.2f}",
+        closed_trade_summary(),
         f"lev_cap={_env_float('OPS_LEVERAGE_CAP', 8.0)} order_cap={_env_float('OPS_ORDER_USDT_CAP', 30.0)}",
         "risky_on=" + (", ".join(flags) if flags else "none"),
     ]
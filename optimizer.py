@@ -4,24 +4,22 @@
 # - "수익만"이 아니라 DD/거래수/안정성까지 같이 점수화(과최적화 완화)
 import os
 from dataclasses import asdict
+from functools import partial
+import backtest_cache
+import walkforward_executor
 from backtest_engine import Params, simulate
 
+# 같은 fold 데이터 + 같은 Params 는 이전 실행 결과(backtest_cache) 재사용
+ENGINE_VERSION = backtest_cache.source_version(
+    "optimizer", __file__, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backtest_engine.py"))
+_CANDLE_FIELDS = ("ts", "open", "high", "low", "close", "volume")
+
 def split_walkforward(candles, n_folds=4):
     """
     시간순으로 fold 분할:
     fold k: train=앞부분, test=그 다음 구간
     """
-    L = len(candles)
-    step = L // (n_folds + 1)
-    folds = []
-    for k in range(1, n_folds+1):
-        train_end = step * k
-        test_end = step * (k+1)
-        train = candles[:train_end]
-        test = candles[train_end:test_end]
-        if len(train) > 200 and len(test) > 200:
-            folds.append((train, test))
-    return folds
+    return [(candles[a:b], candles[c:d]) for (a, b), (c, d) in walkforward_executor.anchored_folds(len(candles), n_folds)]
 
 def score_result(r):
     """
@@ -38,43 +36,53 @@ def score_result(r):
     # dd가 pnl보다 커지면 폭망이니까 강하게 벌점
     return pnl - (dd * 1.3)
 
-def grid_search(candles, allow_long=True, allow_short=True, notional_usdt=100.0):
-    folds = split_walkforward(candles, n_folds=4)
-    if not folds:
+def _fold_unit(fps, notional_usdt, w, train, test, p):
+    """(fold w, Params p) 1칸: train/test 시뮬레이션 (walkforward_executor 작업 단위)"""
+    cache = backtest_cache.default()
+    key = {"params": asdict(p), "notional_usdt": notional_usdt}
+    fp_train, fp_test = fps[w]
+    # train 성능(참고용)
+    r_train = cache.memo(ENGINE_VERSION, fp_train, key, lambda: simulate(train, p, notional_usdt=notional_usdt, log_path=None))
+    # test 성능(진짜 평가)
+    r_test = cache.memo(ENGINE_VERSION, fp_test, key, lambda: simulate(test, p, notional_usdt=notional_usdt, log_path=None))
+    return {"train": r_train, "test": r_test}
+
+def grid_search(candles, allow_long=True, allow_short=True, notional_usdt=100.0, workers=None):
+    """
+    (fold x params) 칸들은 서로 독립 -> walkforward_executor 로 process pool 병렬 실행.
+    workers: None=cpu 수, 1=직렬. 결과/순위는 직렬 실행과 동일.
+    """
+    spans = walkforward_executor.anchored_folds(len(candles), n_folds=4)
+    if not spans:
         raise RuntimeError("Not enough candles for walk-forward")
 
     # ✅ 그리드는 너무 넓히면 과최적화 + 느림
     enter_scores = [55, 60, 65, 70, 75]
     stop_atrs = [1.2, 1.5, 1.8, 2.1]
     tp_rs = [1.2, 1.5, 2.0]
+    grid = [Params(enter_score=es, stop_atr=sa, tp_r=tr, allow_long=allow_long, allow_short=allow_short)
+            for es in enter_scores for sa in stop_atrs for tr in tp_rs]
+
+    fps = [(backtest_cache.candles_fingerprint(candles[a:b], _CANDLE_FIELDS), backtest_cache.candles_fingerprint(candles[c:d], _CANDLE_FIELDS))
+           for (a, b), (c, d) in spans]
+    cells = walkforward_executor.run_grid(candles, spans, grid, partial(_fold_unit, fps, notional_usdt), workers=workers)
 
     best = None
     all_rows = []
+    for k, p in enumerate(grid):
+        fold_detail = [cells[w][k] for w in range(len(spans))]
+        fold_scores = [score_result(d["test"]) for d in fold_detail]
 
-    for es in enter_scores:
-        for sa in stop_atrs:
-            for tr in tp_rs:
-                p = Params(enter_score=es, stop_atr=sa, tp_r=tr, allow_long=allow_long, allow_short=allow_short)
-                fold_scores = []
-                fold_detail = []
-                for (train, test) in folds:
-                    # train 성능(참고용)
-                    r_train = simulate(train, p, notional_usdt=notional_usdt, log_path=None)
-                    # test 성능(진짜 평가)
-                    r_test = simulate(test, p, notional_usdt=notional_usdt, log_path=None)
-                    fold_scores.append(score_result(r_test))
-                    fold_detail.append({"train": r_train, "test": r_test})
-
-                # ✅ “평균”만 보지 말고 “최악”도 같이 봄 (안정성)
-                avg_s = sum(fold_scores) / len(fold_scores)
-                worst_s = min(fold_scores)
+        # ✅ “평균”만 보지 말고 “최악”도 같이 봄 (안정성)
+        avg_s = sum(fold_scores) / len(fold_scores)
+        worst_s = min(fold_scores)
 
-                stability = worst_s * 0.6 + avg_s * 0.4  # 최악을 더 중요시
-                row = {"params": asdict(p), "avg_score": avg_s, "worst_score": worst_s, "stability": stability}
-                all_rows.append(row)
+        stability = worst_s * 0.6 + avg_s * 0.4  # 최악을 더 중요시
+        row = {"params": asdict(p), "avg_score": avg_s, "worst_score": worst_s, "stability": stability}
+        all_rows.append(row)
 
-                if (best is None) or (stability > best["stability"]):
-                    best = row
+        if (best is None) or (stability > best["stability"]):
+            best = row
 
     # 정렬해서 상위 10개 리턴
     all_rows.sort(key=lambda x: x["stability"], reverse=True)
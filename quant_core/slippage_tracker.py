@@ -1,7 +1,7 @@
 import time
 from typing import Optional, Dict, Any
 
-from storage_utils import data_path, safe_read_json, atomic_write_json
+from storage_utils import data_path, put_state_json, read_state_json
 
 _SLIP_FILE = data_path("slippage_stats.json")
 
@@ -13,7 +13,7 @@ class SlippageTracker:
     - 정확한 체결가 기반으로 바꾸고 싶으면 execute_*에서 fillPrice를 받는 형태로 확장하면 됨.
     """
     def __init__(self):
-        self._st = safe_read_json(_SLIP_FILE, default={
+        self._st = read_state_json(_SLIP_FILE, default={
             "count": 0,
             "avg_bps": 0.0,
             "last": None,
@@ -32,7 +32,7 @@ class SlippageTracker:
 
         self._st["last"] = {"symbol": symbol, "bps": bps, "expected": expected_price, "observed": observed_price, "ts": int(time.time())}
         self._st["ts"] = int(time.time())
-        atomic_write_json(_SLIP_FILE, self._st)
+        put_state_json(_SLIP_FILE, self._st)
 
     def avg_bps(self, symbol: Optional[str] = None) -> float:
         if symbol:
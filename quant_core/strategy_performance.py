@@ -1,7 +1,7 @@
 import time
 from typing import Dict, Any, Optional, Tuple
 
-from storage_utils import data_path, safe_read_json, atomic_write_json
+from storage_utils import data_path, put_state_json, read_state_json
 
 _FILE = data_path("strategy_perf.json")
 
@@ -23,11 +23,11 @@ class StrategyPerformance:
         self.disable_below = float(disable_below_winrate)
         self.disable_for = int(disable_for_min) * 60
 
-        self.st = safe_read_json(_FILE, default={"by_strategy": {}, "ts": int(time.time())})
+        self.st = read_state_json(_FILE, default={"by_strategy": {}, "ts": int(time.time())})
 
     def _save(self):
         self.st["ts"] = int(time.time())
-        atomic_write_json(_FILE, self.st)
+        put_state_json(_FILE, self.st)
 
     def record_trade(self, strategy: str, pnl_usdt: float):
         if not strategy:
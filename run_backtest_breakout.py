@@ -2,11 +2,15 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+from bisect import bisect_left
 from dataclasses import dataclass
 from typing import List
 
+import numpy as np
 import pandas as pd
 
+import candle_store
+
 
 def parse_symbols(text: str) -> List[str]:
     return [x.strip().upper() for x in text.split(",") if x.strip()]
@@ -63,14 +67,17 @@ def adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
     ).max(axis=1).astype("float64")
 
     atr_s = tr.ewm(alpha=1 / period, adjust=False).mean()
-    plus_di = 100.0 * (plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, pd.NA))
-    minus_di = 100.0 * (minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, pd.NA))
-    dx = ((plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, pd.NA)) * 100.0
+    plus_di = 100.0 * (plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, np.nan))
+    minus_di = 100.0 * (minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, np.nan))
+    dx = ((plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)) * 100.0
 
     return dx.ewm(alpha=1 / period, adjust=False).mean().fillna(0.0)
 
 
 def load_csv(path: str) -> pd.DataFrame:
+    if candle_store.is_store(path):
+        df = candle_store.load(path).to_frame()
+        return df[(df["open"] > 0) & (df["high"] > 0) & (df["low"] > 0) & (df["close"] > 0)].copy()
     df = pd.read_csv(path)
 
     rename_map = {}
@@ -109,6 +116,7 @@ def load_csv(path: str) -> pd.DataFrame:
 
 def load_symbol_csv(symbol: str, interval: str) -> pd.DataFrame:
     candidates = [
+        candle_store.store_path(symbol, interval),
         f"{symbol}_{interval}m.csv",
         f"{symbol}_{interval}.csv",
         f"{symbol}.csv",
@@ -155,9 +163,9 @@ def add_indicators(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
     out["ema_slow"] = ema(out["close"], cfg.ema_slow)
     out["atr"] = atr(out, cfg.atr_period)
     out["adx"] = adx(out, cfg.adx_period)
-    out["atr_pct"] = (out["atr"] / out["close"].replace(0, pd.NA) * 100.0).fillna(0.0)
+    out["atr_pct"] = (out["atr"] / out["close"].replace(0, np.nan) * 100.0).fillna(0.0)
     out["bar_move_pct"] = (
-        ((out["close"] - out["close"].shift(1)).abs() / out["close"].shift(1).replace(0, pd.NA)) * 100.0
+        ((out["close"] - out["close"].shift(1)).abs() / out["close"].shift(1).replace(0, np.nan)) * 100.0
     ).fillna(0.0)
 
     out["breakout_high"] = out["high"].shift(1).rolling(cfg.breakout_lookback, min_periods=cfg.breakout_lookback).max()
@@ -170,50 +178,91 @@ def cost_pct(cfg: Config) -> float:
     return (cfg.fee_pct_side * 2.0) + ((cfg.slip_bps_side / 100.0) * 2.0)
 
 
+def _col(df: pd.DataFrame, name: str) -> np.ndarray:
+    return df[name].to_numpy(dtype="float64")
+
+
+def entry_side_array(df: pd.DataFrame, cfg: Config) -> np.ndarray:
+    """bar별 breakout 진입 방향: 1=LONG, -1=SHORT, 0=없음 (포지션/쿨다운은 backtest_symbol이 본다)."""
+    close, atr_now, atr_pct = _col(df, "close"), _col(df, "atr"), _col(df, "atr_pct")
+    bo_high, bo_low = _col(df, "breakout_high"), _col(df, "breakout_low")
+    ef, es = _col(df, "ema_fast"), _col(df, "ema_slow")
+    ok = (
+        ~np.isnan(atr_now)
+        & (atr_now > 0)
+        & ~np.isnan(bo_high)
+        & ~np.isnan(bo_low)
+        & ~(_col(df, "adx") < cfg.adx_min)
+        & (cfg.atr_min_pct <= atr_pct)
+        & (atr_pct <= cfg.atr_max_pct)
+        & ~(_col(df, "bar_move_pct") > cfg.avoid_chase_pct)
+    )
+    long_ok = (close > bo_high) & (ef > es)
+    short_ok = cfg.allow_short & (close < bo_low) & (ef < es)
+    return np.where(ok & long_ok, 1, np.where(ok & short_ok, -1, 0)).astype(np.int8)
+
+
 def backtest_symbol(df: pd.DataFrame, cfg: Config):
     balance = cfg.initial_balance
     peak = balance
     max_dd = 0.0
     cooldown_until = -1
-    pos = None
     trades = []
 
     start_i = max(cfg.breakout_lookback + 5, 60)
     fee_slip = cost_pct(cfg)
 
-    for i in range(start_i, len(df)):
-        row = df.iloc[i]
-
-        if pos is not None:
-            side = pos["side"]
-            bars_held = i - pos["entry_i"]
+    # 진입 조건은 전체 구간 벡터 계산, 루프는 포지션 상태만 돈다 (run_backtest_pro와 동일 구조).
+    n = len(df)
+    high = _col(df, "high").tolist()
+    low = _col(df, "low").tolist()
+    close = _col(df, "close").tolist()
+    atr_a = _col(df, "atr").tolist()
+    side_a = entry_side_array(df, cfg)
+    signals = (np.flatnonzero(side_a[start_i:]) + start_i).tolist()
+
+    k = bisect_left(signals, start_i)
+    while k < len(signals):
+        i = signals[k]
+        side = "LONG" if side_a[i] > 0 else "SHORT"
+        entry = close[i]
+        atr_now = atr_a[i]
+        if side == "LONG":
+            sl_price = entry - atr_now * cfg.sl_atr
+            tp_price = entry + atr_now * cfg.tp_atr
+        else:
+            sl_price = entry + atr_now * cfg.sl_atr
+            tp_price = entry - atr_now * cfg.tp_atr
+
+        exit_i = None
+        for j in range(i + 1, n):
             exit_reason = None
             exit_price = None
 
             if side == "LONG":
-                if row["low"] <= pos["sl_price"]:
+                if low[j] <= sl_price:
                     exit_reason = "SL"
-                    exit_price = pos["sl_price"]
-                elif row["high"] >= pos["tp_price"]:
+                    exit_price = sl_price
+                elif high[j] >= tp_price:
                     exit_reason = "TP"
-                    exit_price = pos["tp_price"]
+                    exit_price = tp_price
             else:
-                if row["high"] >= pos["sl_price"]:
+                if high[j] >= sl_price:
                     exit_reason = "SL"
-                    exit_price = pos["sl_price"]
-                elif row["low"] <= pos["tp_price"]:
+                    exit_price = sl_price
+                elif low[j] <= tp_price:
                     exit_reason = "TP"
-                    exit_price = pos["tp_price"]
+                    exit_price = tp_price
 
-            if exit_reason is None and cfg.time_exit_bars > 0 and bars_held >= cfg.time_exit_bars:
+            if exit_reason is None and cfg.time_exit_bars > 0 and (j - i) >= cfg.time_exit_bars:
                 exit_reason = "TIME"
-                exit_price = row["close"]
+                exit_price = close[j]
 
             if exit_reason is not None:
                 if side == "LONG":
-                    raw_ret = ((exit_price - pos["entry_price"]) / pos["entry_price"]) * 100.0
+                    raw_ret = ((exit_price - entry) / entry) * 100.0
                 else:
-                    raw_ret = ((pos["entry_price"] - exit_price) / pos["entry_price"]) * 100.0
+                    raw_ret = ((entry - exit_price) / entry) * 100.0
 
                 net_ret = raw_ret - fee_slip
                 balance *= (1.0 + net_ret / 100.0)
@@ -228,56 +277,14 @@ def backtest_symbol(df: pd.DataFrame, cfg: Config):
                         "reason": exit_reason,
                     }
                 )
-                pos = None
-                cooldown_until = i + 1
-                continue
-
-        if pos is not None:
-            continue
-        if i <= cooldown_until:
-            continue
-
-        atr_now = row["atr"]
-        if pd.isna(atr_now) or atr_now <= 0:
-            continue
-        if pd.isna(row["breakout_high"]) or pd.isna(row["breakout_low"]):
-            continue
-        if row["adx"] < cfg.adx_min:
-            continue
-        if not (cfg.atr_min_pct <= row["atr_pct"] <= cfg.atr_max_pct):
-            continue
-        if row["bar_move_pct"] > cfg.avoid_chase_pct:
-            continue
-
-        long_ok = (
-            row["close"] > row["breakout_high"]
-            and row["ema_fast"] > row["ema_slow"]
-        )
+                exit_i = j
+                break
 
-        short_ok = (
-            cfg.allow_short
-            and row["close"] < row["breakout_low"]
-            and row["ema_fast"] < row["ema_slow"]
-        )
+        if exit_i is None:
+            break
 
-        if long_ok:
-            entry = row["close"]
-            pos = {
-                "side": "LONG",
-                "entry_i": i,
-                "entry_price": entry,
-                "sl_price": entry - atr_now * cfg.sl_atr,
-                "tp_price": entry + atr_now * cfg.tp_atr,
-            }
-        elif short_ok:
-            entry = row["close"]
-            pos = {
-                "side": "SHORT",
-                "entry_i": i,
-                "entry_price": entry,
-                "sl_price": entry + atr_now * cfg.sl_atr,
-                "tp_price": entry - atr_now * cfg.tp_atr,
-            }
+        cooldown_until = exit_i + 1
+        k = bisect_left(signals, cooldown_until + 1, k + 1)
 
     wins = [t for t in trades if t["ret_pct"] > 0]
     losses = [t for t in trades if t["ret_pct"] <= 0]
@@ -10,12 +10,21 @@
 #   python run_backtest_opt.py --symbols BTCUSDT,ETHUSDT --interval 15 --days 180 --short on
 #   python run_backtest_opt.py --symbols BTCUSDT,ETHUSDT --interval 15 --days 180 --seed-db
 #   python run_backtest_opt.py --symbols BTCUSDT --interval 15 --days 365 --grid on
+#
+# In-process (auto_search.py / auto_param_tuner*.py):
+#   from run_backtest_opt import run_backtest_opt
+#   res = run_backtest_opt("BTCUSDT", days=180, enter_score=65, sl_atr=1.2, tp_atr=1.0, log=None)
+#   res["best_by_symbol"]["BTCUSDT"] -> {"trades", "wins", "losses", "winrate", "balance_pct", "params"}
+#   candles / indicator series / results stay cached in the process (clear_caches()).
 
-import os, csv, time, math, argparse, datetime as dt
+import os, csv, time, math, argparse, hashlib, datetime as dt
 from itertools import product
-import requests
+import numpy as np
 
-BYBIT_BASE = "https://api.bybit.com"
+import backtest_cache
+import candle_store
+import kline_downloader
+import indicators as ind
 
 # ---- optional Supabase seeding ----
 try:
@@ -31,54 +40,12 @@ def now_ms() -> int:
     return int(time.time() * 1000)
 
 def fetch_kline_page(category: str, symbol: str, interval: str, start_ms: int, end_ms: int, limit: int = 1000):
-    url = f"{BYBIT_BASE}/v5/market/kline"
-    params = {
-        "category": category,
-        "symbol": symbol,
-        "interval": interval,
-        "start": start_ms,
-        "end": end_ms,
-        "limit": limit,
-    }
-    r = requests.get(url, params=params, timeout=20)
-    r.raise_for_status()
-    j = r.json()
-    if str(j.get("retCode")) != "0":
-        raise RuntimeError(f"Bybit retCode={j.get('retCode')} retMsg={j.get('retMsg')}")
-    lst = j.get("result", {}).get("list", []) or []
-    rows = []
-    for it in lst:
-        ts = int(float(it[0]))      # ms
-        o = float(it[1]); h = float(it[2]); l = float(it[3]); c = float(it[4])
-        v = float(it[5]) if len(it) > 5 else 0.0
-        rows.append((ts, o, h, l, c, v))
-    rows.sort(key=lambda x: x[0])
-    return rows
+    # one [start_ms, end_ms] window through the shared downloader (rate budget + retries)
+    return kline_downloader.shared(category).fetch_window(symbol, interval, start_ms, end_ms)
 
 def download_klines(category: str, symbol: str, interval: str, start_ms: int, end_ms: int):
-    all_rows = []
-    cur = start_ms
-    while cur < end_ms:
-        rows = fetch_kline_page(category, symbol, interval, cur, end_ms, limit=1000)
-        if not rows:
-            break
-        all_rows.extend(rows)
-        last_ts = rows[-1][0]
-        nxt = last_ts + 1
-        if nxt <= cur:
-            break
-        cur = nxt
-        time.sleep(0.12)
-
-    seen = set()
-    dedup = []
-    for r in all_rows:
-        if r[0] in seen:
-            continue
-        seen.add(r[0])
-        dedup.append(r)
-    dedup.sort(key=lambda x: x[0])
-    return dedup
+    # windows fetched in parallel; ascending, de-duplicated (ts, o, h, l, c, v)
+    return kline_downloader.download_rows(category, symbol, interval, start_ms, end_ms)
 
 def write_csv(out_path: str, rows):
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
@@ -93,63 +60,34 @@ def write_csv(out_path: str, rows):
 # Indicators
 # =========================
 def ema(values, period):
-    k = 2 / (period + 1)
-    out = []
-    e = values[0]
-    for v in values:
-        e = v * k + e * (1 - k)
-        out.append(e)
-    return out
+    return ind.ema(values, period).tolist()
 
 def rsi(values, period=14):
-    gains = []
-    losses = []
-    rsis = [50]
-    for i in range(1, len(values)):
-        diff = values[i] - values[i - 1]
-        gains.append(max(diff, 0))
-        losses.append(max(-diff, 0))
-        if i < period:
-            rsis.append(50)
-            continue
-        avg_gain = sum(gains[i-period:i]) / period
-        avg_loss = sum(losses[i-period:i]) / period
-        if avg_loss == 0:
-            rsis.append(100)
-        else:
-            rs = avg_gain / avg_loss
-            rsis.append(100 - (100 / (1 + rs)))
-    return rsis
+    if len(values) < 2:
+        return [50]
+    r = ind.rsi(values, period, zero_loss="100")
+    return [50.0 if math.isnan(v) else v for v in r.tolist()]
 
 def atr(candles, period=14):
-    trs = []
-    for i in range(1, len(candles)):
-        h = candles[i]["high"]
-        l = candles[i]["low"]
-        pc = candles[i-1]["close"]
-        tr = max(h - l, abs(h - pc), abs(l - pc))
-        trs.append(tr)
-
-    if not trs:
-        return [0.0] * len(candles)
-
-    atrs = [trs[0]]
-    for i in range(1, len(trs)):
-        if i < period:
-            atrs.append(trs[i])
-        else:
-            atrs.append(sum(trs[i-period:i]) / period)
-
-    atrs = [atrs[0]] + atrs
-    if len(atrs) < len(candles):
-        atrs += [atrs[-1]] * (len(candles) - len(atrs))
-    return atrs
+    if not candles:
+        return []
+    highs = [c["high"] for c in candles]
+    lows = [c["low"] for c in candles]
+    closes = [c["close"] for c in candles]
+    return ind.atr(highs, lows, closes, period, method="lagged").tolist()
+
+
+def indicator_series(candles, ema_fast_n, ema_slow_n, rsi_n, atr_n):
+    closes = [c["close"] for c in candles]
+    return ema(closes, ema_fast_n), ema(closes, ema_slow_n), rsi(closes, rsi_n), atr(candles, atr_n)
 
 
 # =========================
 # Backtest (LONG/SHORT + TIME EXIT)
 # =========================
 def load_csv_candles(path):
+    if candle_store.is_store(path):
+        return candle_store.load(path).to_dicts(fields=("open", "high", "low", "close"))
     candles = []
     with open(path, "r", newline="") as f:
         r = csv.DictReader(f)
@@ -201,15 +139,16 @@ def backtest_one(
     time_exit_bars: int,
     allow_short: bool,
     seed_db: bool,
+    series=None,
 ):
     closes = [c["close"] for c in candles]
     if len(closes) < max(ema_slow_n, rsi_n, atr_n) + 50:
         return {"symbol": symbol, "error": "not enough candles", "trades": 0}
 
-    ef = ema(closes, ema_fast_n)
-    es = ema(closes, ema_slow_n)
-    rs = rsi(closes, rsi_n)
-    at = atr(candles, atr_n)
+    # series: (ema_fast, ema_slow, rsi, atr) precomputed by the in-process API
+    if series is None:
+        series = indicator_series(candles, ema_fast_n, ema_slow_n, rsi_n, atr_n)
+    ef, es, rs, at = series
 
     pos = None
     # pos: dict(side, entry, sl, tp, entry_i)
@@ -331,6 +270,218 @@ def grid_params(grid_on: bool, enter_score: int, sl_atr: float, tp_atr: float):
     return list(product(enter_list, sl_list, tp_list))
 
 
+# =========================
+# In-process API + caches
+# =========================
+# One tuning run calls the same symbol hundreds of times. Keep everything that does
+# not depend on enter/sl/tp in memory:
+# - _KLINES:  (category, symbol, interval) -> downloaded rows; a shorter `days` window
+#             is sliced from a longer download instead of hitting Bybit again
+# - _CANDLES: (category, symbol, interval, start_ms, end_ms) -> (candles, data_hash)
+# - _SERIES:  (data_hash, ema_fast, ema_slow, rsi, atr) -> indicator series
+# - _RESULTS: (symbol, data_hash, every backtest param) -> backtest_one result
+# Below _RESULTS sits backtest_cache (sqlite, survives the process): a re-run of the
+# tuner / walkforward_validator only simulates cells whose data or params changed.
+KLINE_CACHE_SEC = float(os.getenv("BT_KLINE_CACHE_SEC", "3600"))
+
+_KLINES = {}
+_CANDLES = {}
+_SERIES = {}
+_RESULTS = {}
+_STATS = {"download": 0, "kline_hit": 0, "series_hit": 0, "series_miss": 0, "result_hit": 0, "result_miss": 0, "disk_hit": 0}
+ENGINE_VERSION = backtest_cache.source_version("run_backtest_opt", __file__, ind.__file__)
+
+
+def clear_caches():
+    for d in (_KLINES, _CANDLES, _SERIES, _RESULTS):
+        d.clear()
+    for k in _STATS:
+        _STATS[k] = 0
+
+
+def cache_stats() -> dict:
+    st = dict(_STATS)
+    st.update(klines=len(_KLINES), candles=len(_CANDLES), series=len(_SERIES), results=len(_RESULTS))
+    return st
+
+
+def data_hash(candles) -> str:
+    arr = np.asarray([(c["open"], c["high"], c["low"], c["close"]) for c in candles], dtype=np.float64)
+    return hashlib.sha1(arr.tobytes()).hexdigest()
+
+
+def load_candles(category: str, symbol: str, interval: str, days: int, outdir: str | None = None, log=print):
+    """(candles, data_hash) for the last `days`, downloading only when the cache cannot cover it."""
+    key = (category, symbol, str(interval))
+    span_ms = int(days) * 24 * 60 * 60 * 1000
+    ent = _KLINES.get(key)
+    fresh = ent is not None and (time.time() - ent["ts"]) <= KLINE_CACHE_SEC
+    if fresh and ent["end_ms"] - span_ms >= ent["start_ms"]:
+        _STATS["kline_hit"] += 1
+    else:
+        end_ms = now_ms()
+        start_ms = end_ms - span_ms
+        rows = download_klines(category, symbol, str(interval), start_ms, end_ms)
+        if not rows:
+            return None, None
+        _STATS["download"] += 1
+        ent = _KLINES[key] = {"ts": time.time(), "start_ms": start_ms, "end_ms": end_ms, "rows": rows}
+        if outdir:
+            suffix = f"{interval}m" if str(interval).isdigit() else str(interval)
+            out = os.path.join(outdir, f"{symbol}_{suffix}.csv")
+            write_csv(out, rows)
+            if log:
+                log(f"✅ {symbol}: candles={len(rows)} -> {out}")
+
+    start_ms = ent["end_ms"] - span_ms
+    ckey = key + (start_ms, ent["end_ms"])
+    hit = _CANDLES.get(ckey)
+    if hit is None:
+        # same row filter as a fresh download of this window (start <= ts)
+        candles = [{"open": o, "high": h, "low": l, "close": c} for ts, o, h, l, c, v in ent["rows"] if ts >= start_ms]
+        hit = _CANDLES[ckey] = (candles, data_hash(candles))
+    return hit
+
+
+def _copy_result(res):
+    out = dict(res)
+    if "params" in out:
+        out["params"] = dict(out["params"])
+    return out
+
+
+def _cached_backtest(symbol, candles, dh, *, fee, slip, enter_score, ema_fast_n, ema_slow_n, rsi_n, atr_n,
+                     sl_atr, tp_atr, time_exit_bars, allow_short, seed_db):
+    rkey = (symbol, dh, fee, slip, enter_score, ema_fast_n, ema_slow_n, rsi_n, atr_n,
+            sl_atr, tp_atr, time_exit_bars, allow_short)
+    # seed_db sends every trade to coin_stats: never answer it from the cache
+    if not seed_db and rkey in _RESULTS:
+        _STATS["result_hit"] += 1
+        return _copy_result(_RESULTS[rkey])
+    _STATS["result_miss"] += 1
+
+    pkey = None
+    if not seed_db:
+        pkey = backtest_cache.make_key(ENGINE_VERSION, dh, list(rkey[:1] + rkey[2:]))
+        hit = backtest_cache.default().get(pkey)
+        if hit is not None:
+            _STATS["disk_hit"] += 1
+            _RESULTS[rkey] = _copy_result(hit)
+            return hit
+
+    skey = (dh, ema_fast_n, ema_slow_n, rsi_n, atr_n)
+    series = _SERIES.get(skey)
+    if series is None:
+        _STATS["series_miss"] += 1
+        series = _SERIES[skey] = indicator_series(candles, ema_fast_n, ema_slow_n, rsi_n, atr_n)
+    else:
+        _STATS["series_hit"] += 1
+
+    res = backtest_one(
+        symbol, candles, fee=fee, slip=slip, enter_score=enter_score, ema_fast_n=ema_fast_n,
+        ema_slow_n=ema_slow_n, rsi_n=rsi_n, atr_n=atr_n, sl_atr=sl_atr, tp_atr=tp_atr,
+        time_exit_bars=time_exit_bars, allow_short=allow_short, seed_db=seed_db, series=series,
+    )
+    _RESULTS[rkey] = _copy_result(res)
+    if pkey is not None:
+        backtest_cache.default().put(pkey, res, engine=ENGINE_VERSION)
+    return res
+
+
+def best_for_symbol(symbol, candles, dh, candidates, *, fee=0.0006, slip=0.0005, ema_fast=9, ema_slow=21,
+                    rsi_n=14, atr_n=14, time_exit_bars=0, allow_short=False, seed_db=False):
+    """Best of the (enter_score, sl_atr, tp_atr) candidates on one symbol's candles (first error aborts)."""
+    best = None
+    for (e, sl, tp) in candidates:
+        res = _cached_backtest(
+            symbol, candles, dh,
+            fee=float(fee), slip=float(slip), enter_score=int(e),
+            ema_fast_n=int(ema_fast), ema_slow_n=int(ema_slow), rsi_n=int(rsi_n), atr_n=int(atr_n),
+            sl_atr=float(sl), tp_atr=float(tp), time_exit_bars=int(time_exit_bars),
+            allow_short=bool(allow_short), seed_db=bool(seed_db),
+        )
+        if "error" in res:
+            return res
+        # choose best by balance then winrate
+        if best is None or (res["balance_pct"], res["winrate"]) > (best["balance_pct"], best["winrate"]):
+            best = res
+    return best
+
+
+def run_backtest_opt(
+    symbols,
+    *,
+    interval: str = "15",
+    days: int = 180,
+    category: str = "linear",
+    outdir: str | None = "data",
+    fee: float = 0.0006,
+    slip: float = 0.0005,
+    enter_score: int = 60,
+    ema_fast: int = 9,
+    ema_slow: int = 21,
+    rsi_n: int = 14,
+    atr_n: int = 14,
+    sl_atr: float = 1.5,
+    tp_atr: float = 2.0,
+    allow_short: bool = False,
+    time_exit_bars: int = 0,
+    grid: bool = False,
+    seed_db: bool = False,
+    log=print,
+):
+    """
+    Library entry point of this script (same numbers as the CLI, no stdout scraping).
+    returns {"best_by_symbol": {sym: best result | {"error": ...}}, "summary": [ok rows, best first],
+             "errors": {sym: msg}, "cache": cache_stats()}
+    log: callable for the usual CLI lines, None = silent.
+    """
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    syms = [s.strip().upper() for s in symbols if s and s.strip()]
+    interval = str(interval)
+
+    loaded = {}
+    errors = {}
+    for sym in syms:
+        try:
+            candles, dh = load_candles(category, sym, interval, days, outdir=outdir, log=log)
+        except Exception as e:
+            errors[sym] = f"download error: {e}"
+            if log:
+                log(f"❌ {sym}: download error: {e}")
+            continue
+        if not candles:
+            errors[sym] = "no data"
+            if log:
+                log(f"❌ {sym}: no data")
+            continue
+        loaded[sym] = (candles, dh)
+
+    candidates = grid_params(grid, enter_score, sl_atr, tp_atr)
+    if log:
+        log(f"\nBacktest grid: {len(candidates)} combos | short={allow_short} | time_exit_bars={time_exit_bars}")
+
+    best_by_symbol = {}
+    for sym, (candles, dh) in loaded.items():
+        best = best_for_symbol(
+            sym, candles, dh, candidates, fee=fee, slip=slip, ema_fast=ema_fast, ema_slow=ema_slow,
+            rsi_n=rsi_n, atr_n=atr_n, time_exit_bars=time_exit_bars, allow_short=allow_short, seed_db=seed_db,
+        )
+        best_by_symbol[sym] = best
+        if "error" in best:
+            errors[sym] = best["error"]
+            if log:
+                log(f"⚠️ {sym}: {best['error']}")
+        elif log:
+            p = best["params"]
+            log(f"🏆 {sym}: trades={best['trades']} win={best['winrate']}% bal={best['balance_pct']}%  params={p}")
+
+    ok = [v for v in best_by_symbol.values() if v and "error" not in v]
+    ok.sort(key=lambda x: (x["balance_pct"], x["winrate"]), reverse=True)
+    return {"best_by_symbol": best_by_symbol, "summary": ok, "errors": errors, "cache": cache_stats()}
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--symbols", required=True, help="BTCUSDT,ETHUSDT,SOLUSDT")
@@ -364,67 +515,29 @@ def main():
     if args.seed_db and record_coin_stat is None:
         print("⚠️ seed-db requested but ai_coin_performance.record import failed. Seeding will be skipped.")
 
-    end_ms = now_ms()
-    start_ms = end_ms - int(args.days) * 24 * 60 * 60 * 1000
-
-    # download CSVs
-    suffix = f"{args.interval}m" if args.interval.isdigit() else args.interval
-    csv_paths = {}
-    for sym in syms:
-        out = os.path.join(args.outdir, f"{sym}_{suffix}.csv")
-        try:
-            rows = download_klines(args.category, sym, args.interval, start_ms, end_ms)
-            if not rows:
-                print(f"❌ {sym}: no data")
-                continue
-            write_csv(out, rows)
-            csv_paths[sym] = out
-            print(f"✅ {sym}: candles={len(rows)} -> {out}")
-        except Exception as e:
-            print(f"❌ {sym}: download error: {e}")
-
-    # run backtests
-    candidates = grid_params(grid_on, args.enter_score, args.sl_atr, args.tp_atr)
-    print(f"\nBacktest grid: {len(candidates)} combos | short={allow_short} | time_exit_bars={args.time_exit_bars}")
-
-    best_by_symbol = {}
-    for sym, csv_path in csv_paths.items():
-        candles = load_csv_candles(csv_path)
-        best = None
-        for (enter_score, sl_atr, tp_atr) in candidates:
-            res = backtest_one(
-                sym,
-                candles,
-                fee=args.fee,
-                slip=args.slip,
-                enter_score=int(enter_score),
-                ema_fast_n=args.ema_fast,
-                ema_slow_n=args.ema_slow,
-                rsi_n=args.rsi,
-                atr_n=args.atr,
-                sl_atr=float(sl_atr),
-                tp_atr=float(tp_atr),
-                time_exit_bars=int(args.time_exit_bars),
-                allow_short=allow_short,
-                seed_db=args.seed_db,
-            )
-            if "error" in res:
-                best = res
-                break
-            # choose best by balance then winrate
-            if best is None or (res["balance_pct"], res["winrate"]) > (best["balance_pct"], best["winrate"]):
-                best = res
-        best_by_symbol[sym] = best
-        if "error" in best:
-            print(f"⚠️ {sym}: {best['error']}")
-        else:
-            p = best["params"]
-            print(f"🏆 {sym}: trades={best['trades']} win={best['winrate']}% bal={best['balance_pct']}%  params={p}")
+    res = run_backtest_opt(
+        syms,
+        interval=args.interval,
+        days=args.days,
+        category=args.category,
+        outdir=args.outdir,
+        fee=args.fee,
+        slip=args.slip,
+        enter_score=args.enter_score,
+        ema_fast=args.ema_fast,
+        ema_slow=args.ema_slow,
+        rsi_n=args.rsi,
+        atr_n=args.atr,
+        sl_atr=args.sl_atr,
+        tp_atr=args.tp_atr,
+        allow_short=allow_short,
+        time_exit_bars=args.time_exit_bars,
+        grid=grid_on,
+        seed_db=args.seed_db,
+    )
 
     print("\n===== TOP SUMMARY =====")
-    ok = [v for v in best_by_symbol.values() if v and "error" not in v]
-    ok.sort(key=lambda x: (x["balance_pct"], x["winrate"]), reverse=True)
-    for r in ok:
+    for r in res["summary"]:
         p = r["params"]
         print(f"{r['symbol']:10s} bal={r['balance_pct']:7.2f}% win={r['winrate']:6.2f}% trades={r['trades']:4d}  "
               f"enter={p['enter_score']} sl={p['sl_atr']} tp={p['tp_atr']} short={p['short']} timeBars={p['time_exit_bars']}")
@@ -3,11 +3,19 @@
 
 import argparse
 import itertools
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass, asdict
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 
+import numpy as np
 import pandas as pd
 
+import backtest_cache
+import candle_store
+
 
 def parse_bool_list(text: str):
     vals = []
@@ -41,7 +49,7 @@ def rsi(series: pd.Series, period: int = 14) -> pd.Series:
     down = -delta.clip(upper=0.0)
     avg_up = up.ewm(alpha=1 / period, adjust=False).mean()
     avg_down = down.ewm(alpha=1 / period, adjust=False).mean()
-    rs = avg_up / avg_down.replace(0, pd.NA)
+    rs = avg_up / avg_down.replace(0, np.nan)
     out = 100 - (100 / (1 + rs))
     return out.fillna(50.0).astype("float64")
 
@@ -90,13 +98,16 @@ def adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
     ).max(axis=1).astype("float64")
 
     atr_s = tr.ewm(alpha=1 / period, adjust=False).mean()
-    plus_di = 100.0 * (plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, pd.NA))
-    minus_di = 100.0 * (minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, pd.NA))
-    dx = ((plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, pd.NA)) * 100.0
+    plus_di = 100.0 * (plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, np.nan))
+    minus_di = 100.0 * (minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, np.nan))
+    dx = ((plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)) * 100.0
     return dx.ewm(alpha=1 / period, adjust=False).mean().fillna(0.0).astype("float64")
 
 
 def load_csv(path: str) -> pd.DataFrame:
+    if candle_store.is_store(path):
+        df = candle_store.load(path).to_frame()
+        return df[(df["open"] > 0) & (df["high"] > 0) & (df["low"] > 0) & (df["close"] > 0)].copy()
     df = pd.read_csv(path)
 
     rename_map = {}
@@ -143,11 +154,11 @@ def enrich_indicators(df: pd.DataFrame, use_htf: bool) -> pd.DataFrame:
     out["ema200"] = ema(out["close"], 200)
     out["rsi14"] = rsi(out["close"], 14)
     out["atr14"] = atr(out, 14)
-    out["atr_pct"] = (out["atr14"] / out["close"].replace(0, pd.NA) * 100.0).fillna(0.0).astype("float64")
+    out["atr_pct"] = (out["atr14"] / out["close"].replace(0, np.nan) * 100.0).fillna(0.0).astype("float64")
     out["adx14"] = adx(out, 14)
     out["vol_sma20"] = out["volume"].rolling(window=20, min_periods=1).mean().astype("float64")
-    out["body_pct"] = (((out["close"] - out["open"]).abs() / out["open"].replace(0, pd.NA)) * 100.0).fillna(0.0).astype("float64")
-    out["bar_move_pct"] = (((out["close"] - out["close"].shift(1)).abs() / out["close"].shift(1).replace(0, pd.NA)) * 100.0).fillna(0.0).astype("float64")
+    out["body_pct"] = (((out["close"] - out["open"]).abs() / out["open"].replace(0, np.nan)) * 100.0).fillna(0.0).astype("float64")
+    out["bar_move_pct"] = (((out["close"] - out["close"].shift(1)).abs() / out["close"].shift(1).replace(0, np.nan)) * 100.0).fillna(0.0).astype("float64")
 
     out["htf_trend"] = 0
     if use_htf and isinstance(out.index, pd.DatetimeIndex):
@@ -406,17 +417,58 @@ def run_backtest(df: pd.DataFrame, cfg: BTConfig) -> Dict:
     }
 
 
-def grid_search(df: pd.DataFrame, configs: List[BTConfig]) -> pd.DataFrame:
-    rows = []
-    total = len(configs)
-    for idx, cfg in enumerate(configs, start=1):
-        enriched = enrich_indicators(df, use_htf=cfg.htf_filter)
-        res = run_backtest(enriched, cfg)
-        row = res.copy()
-        row.update({f"cfg_{k}": v for k, v in asdict(cfg).items()})
-        rows.append(row)
-        if idx % 25 == 0 or idx == total:
-            print(f"[GRID] {idx}/{total}")
+# =========================
+# Parallel sweep
+# - enrich_indicators() runs once per htf setting (not once per config)
+# - the enriched columns go to one memory-mapped .npy per setting; workers map them
+#   read-only instead of receiving a pickled DataFrame per task
+# - configs are sent in chunks, result rows come back as chunks finish
+# =========================
+_worker_frames: Dict[bool, pd.DataFrame] = {}
+ENGINE_VERSION = backtest_cache.source_version("run_backtest_opt_winrate", __file__)
+
+
+def _enriched_frames(df: pd.DataFrame, configs: List[BTConfig]) -> Dict[bool, pd.DataFrame]:
+    return {flag: enrich_indicators(df, use_htf=flag) for flag in sorted({bool(c.htf_filter) for c in configs})}
+
+
+def _float_block(frame: pd.DataFrame) -> pd.DataFrame:
+    # one float64 block: df.iloc[i] stays a plain float Series (several x faster than mixed dtypes)
+    return pd.DataFrame(frame.to_numpy(dtype="float64"), columns=list(frame.columns), copy=False)
+
+
+def _frame_to_npy(frame: pd.DataFrame, path: str) -> Dict:
+    cols = list(frame.columns)
+    arr = np.lib.format.open_memmap(path, mode="w+", dtype="float64", shape=(len(frame), len(cols)))
+    for j, c in enumerate(cols):
+        arr[:, j] = frame[c].to_numpy(dtype="float64")
+    arr.flush()
+    del arr
+    return {"path": path, "columns": cols}
+
+
+def _frame_from_npy(meta: Dict) -> pd.DataFrame:
+    arr = np.load(meta["path"], mmap_mode="r")
+    return pd.DataFrame(arr, columns=meta["columns"], copy=False)
+
+
+def _worker_init(metas: Dict[bool, Dict]):
+    _worker_frames.clear()
+    for flag, meta in metas.items():
+        _worker_frames[flag] = _frame_from_npy(meta)
+
+
+def _result_row(res: Dict, cfg: BTConfig) -> Dict:
+    row = res.copy()
+    row.update({f"cfg_{k}": v for k, v in asdict(cfg).items()})
+    return row
+
+
+def _run_chunk(chunk: List[tuple]) -> List[tuple]:
+    return [(idx, _result_row(run_backtest(_worker_frames[bool(cfg.htf_filter)], cfg), cfg)) for idx, cfg in chunk]
+
+
+def _sort_results(rows: List[Dict]) -> pd.DataFrame:
     out = pd.DataFrame(rows)
     if not out.empty:
         out = out.sort_values(
@@ -426,6 +478,87 @@ def grid_search(df: pd.DataFrame, configs: List[BTConfig]) -> pd.DataFrame:
     return out
 
 
+def grid_search(
+    df: pd.DataFrame,
+    configs: List[BTConfig],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    on_row: Optional[Callable[[Dict], None]] = None,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Run every config and return the ranked result table.
+    workers: process count (None -> os.cpu_count(), 1 -> in-process)
+    on_row: called with each result row as soon as its chunk finishes
+    use_cache: answer configs already run on the same candles from backtest_cache
+    """
+    total = len(configs)
+    if total == 0:
+        return _sort_results([])
+
+    results: List[Optional[Dict]] = [None] * total
+    done = 0
+
+    def _collect(idx: int, row: Dict):
+        nonlocal done
+        results[idx] = row
+        done += 1
+        if on_row is not None:
+            on_row(row)
+        if done % 25 == 0 or done == total:
+            print(f"[GRID] {done}/{total}")
+
+    # cells already simulated on the same data (any earlier run) come from backtest_cache
+    cache = backtest_cache.default() if use_cache else None
+    keys: List[str] = []
+    if cache is not None and cache.enabled:
+        data_fp = backtest_cache.fingerprint(df.index.asi8 if hasattr(df.index, "asi8") else np.arange(len(df)),
+                                             *(df[c] for c in ("open", "high", "low", "close", "volume")))
+        keys = [backtest_cache.make_key(ENGINE_VERSION, data_fp, asdict(cfg)) for cfg in configs]
+        cached = cache.get_many(keys)
+        for idx, key in enumerate(keys):
+            if key in cached:
+                _collect(idx, _result_row(cached[key], configs[idx]))
+        if cached:
+            print(f"[GRID] cache hit {len(cached)}/{total}")
+
+    todo = [(idx, cfg) for idx, cfg in enumerate(configs) if results[idx] is None]
+    if not todo:
+        return _sort_results(results)
+    workers = int(workers or os.cpu_count() or 1)
+    workers = max(1, min(workers, len(todo)))
+    frames = _enriched_frames(df, [cfg for _, cfg in todo])
+    fresh: List[tuple] = []
+
+    def _collect_new(idx: int, row: Dict):
+        if keys:
+            fresh.append((keys[idx], {k: v for k, v in row.items() if not k.startswith("cfg_")}))
+        _collect(idx, row)
+
+    if workers <= 1:
+        blocks = {flag: _float_block(frame) for flag, frame in frames.items()}
+        for idx, cfg in todo:
+            _collect_new(idx, _result_row(run_backtest(blocks[bool(cfg.htf_filter)], cfg), cfg))
+        if cache is not None:
+            cache.put_many(fresh, engine=ENGINE_VERSION)
+        return _sort_results(results)
+
+    if chunk_size is None:
+        chunk_size = max(1, min(64, math.ceil(len(todo) / (workers * 4))))
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    with tempfile.TemporaryDirectory(prefix="grid_") as tmp:
+        metas = {flag: _frame_to_npy(frame, os.path.join(tmp, f"enriched_htf{int(flag)}.npy")) for flag, frame in frames.items()}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=(metas,)) as pool:
+            futures = [pool.submit(_run_chunk, chunk) for chunk in chunks]
+            for fut in as_completed(futures):
+                for idx, row in fut.result():
+                    _collect_new(idx, row)
+    if cache is not None:
+        cache.put_many(fresh, engine=ENGINE_VERSION)
+    return _sort_results(results)
+
+
 def build_config_grid(args):
     enter_scores = parse_int_list(args.enter_scores)
     tp_pcts = parse_float_list(args.tp_pcts)
@@ -494,12 +627,16 @@ def main():
     ap.add_argument("--avoid_chases", default="true,false")
     ap.add_argument("--chase_bar_pct", type=float, default=1.2)
     ap.add_argument("--move_sl_to_be_after_partial", action="store_true")
+    ap.add_argument("--workers", type=int, default=0, help="process count (0 = all cores, 1 = no pool)")
+    ap.add_argument("--no_cache", action="store_true", help="ignore backtest_cache (data/backtest_cache.db)")
+    ap.add_argument("--chunk_size", type=int, default=0, help="configs per work unit (0 = auto)")
     args = ap.parse_args()
 
     df = load_csv(args.csv)
     configs = build_config_grid(args)
     print(f"[INFO] grid count: {len(configs)}")
-    result_df = grid_search(df, configs)
+    result_df = grid_search(df, configs, workers=args.workers or None, chunk_size=args.chunk_size or None,
+                            use_cache=not args.no_cache)
     result_df.to_csv(args.out, index=False, encoding="utf-8-sig")
 
     cols = [
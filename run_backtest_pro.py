@@ -3,11 +3,15 @@
 
 import argparse
 import math
+from bisect import bisect_left
 from dataclasses import dataclass, asdict
 from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
+import candle_store
+
 
 # =========================
 # 유틸
@@ -25,7 +29,7 @@ def rsi(series: pd.Series, period: int = 14) -> pd.Series:
     avg_up = up.ewm(alpha=1 / period, adjust=False).mean()
     avg_down = down.ewm(alpha=1 / period, adjust=False).mean()
 
-    rs = avg_up / avg_down.replace(0, pd.NA)
+    rs = avg_up / avg_down.replace(0, np.nan)
     out = 100 - (100 / (1 + rs))
     return out.fillna(50.0).astype("float64")
 
@@ -76,9 +80,9 @@ def adx(df: pd.DataFrame, period: int = 14) -> pd.Series:
     ).max(axis=1).astype("float64")
 
     atr_s = tr.ewm(alpha=1 / period, adjust=False).mean()
-    plus_di = 100.0 * (plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, pd.NA))
-    minus_di = 100.0 * (minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, pd.NA))
-    dx = ((plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, pd.NA)) * 100.0
+    plus_di = 100.0 * (plus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, np.nan))
+    minus_di = 100.0 * (minus_dm.ewm(alpha=1 / period, adjust=False).mean() / atr_s.replace(0, np.nan))
+    dx = ((plus_di - minus_di).abs() / (plus_di + minus_di).replace(0, np.nan)) * 100.0
     return dx.ewm(alpha=1 / period, adjust=False).mean().fillna(0.0).astype("float64")
 
 
@@ -102,6 +106,9 @@ def tf_to_resample_rule(interval: str) -> str:
 
 
 def load_csv(path: str) -> pd.DataFrame:
+    if candle_store.is_store(path):
+        df = candle_store.load(path).to_frame()
+        return df[(df["open"] > 0) & (df["high"] > 0) & (df["low"] > 0) & (df["close"] > 0)].copy()
     df = pd.read_csv(path)
 
     rename_map = {}
@@ -140,6 +147,7 @@ def load_csv(path: str) -> pd.DataFrame:
 
 def load_symbol_csv(symbol: str, interval: str) -> pd.DataFrame:
     candidates = [
+        candle_store.store_path(symbol, interval),
         f"{symbol}_{interval}m.csv",
         f"{symbol}_{interval}.csv",
         f"{symbol}.csv",
@@ -205,12 +213,12 @@ def add_indicators(df: pd.DataFrame, cfg: Config) -> pd.DataFrame:
     out["ema_200"] = ema(out["close"], 200)
     out["rsi"] = rsi(out["close"], cfg.rsi_period)
     out["atr"] = atr(out, cfg.atr_period)
-    out["atr_pct"] = (out["atr"] / out["close"].replace(0, pd.NA) * 100.0).fillna(0.0).astype("float64")
+    out["atr_pct"] = (out["atr"] / out["close"].replace(0, np.nan) * 100.0).fillna(0.0).astype("float64")
     out["adx"] = adx(out, cfg.adx_period)
 
     out["vol_sma20"] = out["volume"].rolling(window=20, min_periods=1).mean().astype("float64")
-    out["body_pct"] = (((out["close"] - out["open"]).abs() / out["open"].replace(0, pd.NA)) * 100.0).fillna(0.0)
-    out["bar_move_pct"] = (((out["close"] - out["close"].shift(1)).abs() / out["close"].shift(1).replace(0, pd.NA)) * 100.0).fillna(0.0)
+    out["body_pct"] = (((out["close"] - out["open"]).abs() / out["open"].replace(0, np.nan)) * 100.0).fillna(0.0)
+    out["bar_move_pct"] = (((out["close"] - out["close"].shift(1)).abs() / out["close"].shift(1).replace(0, np.nan)) * 100.0).fillna(0.0)
 
     out["htf_trend"] = 0
     if cfg.htf_filter and isinstance(out.index, pd.DatetimeIndex):
@@ -285,6 +293,66 @@ def build_entry_score(df: pd.DataFrame, i: int, side: str, cfg: Config) -> int:
     return int(score)
 
 
+def _col(df: pd.DataFrame, name: str) -> np.ndarray:
+    return df[name].to_numpy(dtype="float64")
+
+
+def _prev(x: np.ndarray) -> np.ndarray:
+    out = np.empty_like(x)
+    out[:1] = np.nan
+    out[1:] = x[:-1]
+    return out
+
+
+def entry_score_arrays(df: pd.DataFrame, cfg: Config):
+    """build_entry_score()를 전체 구간에 한 번에 계산 -> (long_score, short_score) int 배열 (bar 0은 prev 없음)."""
+    close, high, low = _col(df, "close"), _col(df, "high"), _col(df, "low")
+    ef, es, e200 = _col(df, "ema_fast"), _col(df, "ema_slow"), _col(df, "ema_200")
+    r, htf = _col(df, "rsi"), _col(df, "htf_trend")
+    prev_high, prev_low, prev_ef = _prev(high), _prev(low), _prev(ef)
+
+    long_s = (
+        25 * (htf == 1)
+        + 20 * ((ef > es) & (es > e200))
+        + 15 * ((close > ef) & (prev_low <= prev_ef))
+        + 10 * ((45 <= r) & (r <= 62))
+        + 10 * (close > prev_high)
+    )
+    short_s = (
+        25 * (htf == -1)
+        + 20 * ((ef < es) & (es < e200))
+        + 15 * ((close < ef) & (prev_high >= prev_ef))
+        + 10 * ((38 <= r) & (r <= 55))
+        + 10 * (close < prev_low)
+    )
+
+    atr_pct = _col(df, "atr_pct")
+    common = (
+        15 * (_col(df, "adx") >= cfg.adx_min)
+        + 10 * ((cfg.atr_min_pct <= atr_pct) & (atr_pct <= cfg.atr_max_pct))
+        + 5 * ((not cfg.volume_filter) | (_col(df, "volume") >= _col(df, "vol_sma20")))
+        - 20 * (_col(df, "bar_move_pct") > cfg.avoid_chase_pct)
+    )
+    return (long_s + common).astype(np.int64), (short_s + common).astype(np.int64)
+
+
+def entry_side_array(df: pd.DataFrame, cfg: Config) -> np.ndarray:
+    """bar별 진입 방향: 1=LONG, -1=SHORT, 0=없음 (포지션/쿨다운은 backtest_symbol이 본다)."""
+    atr_now, atr_pct, htf = _col(df, "atr"), _col(df, "atr_pct"), _col(df, "htf_trend")
+    ok = (
+        ~np.isnan(atr_now)
+        & (atr_now > 0)
+        & (cfg.atr_min_pct <= atr_pct)
+        & (atr_pct <= cfg.atr_max_pct)
+        & ~(_col(df, "adx") < cfg.adx_min)
+        & ~(_col(df, "bar_move_pct") > cfg.avoid_chase_pct)
+    )
+    long_score, short_score = entry_score_arrays(df, cfg)
+    go_long = (htf == 1) & (long_score >= cfg.enter_score) & (long_score >= short_score)
+    go_short = cfg.allow_short & (htf == -1) & (short_score >= cfg.enter_score) & (short_score > long_score)
+    return np.where(ok & go_long, 1, np.where(ok & go_short, -1, 0)).astype(np.int8)
+
+
 # =========================
 # 백테스트
 # =========================
@@ -297,47 +365,66 @@ def backtest_symbol(df: pd.DataFrame, cfg: Config) -> Dict:
     peak = balance
     max_dd = 0.0
 
-    pos = None
     trades = []
     cooldown_until = -1
 
     start_i = max(220, 2)
     fee_slip = cost_pct(cfg)
 
-    for i in range(start_i, len(df)):
-        row = df.iloc[i]
+    # 컬럼은 한 번만 꺼내고, 진입 조건은 전체 구간을 미리 벡터로 계산.
+    # 루프는 포지션 상태만 돈다: 무포지션이면 다음 진입 bar로 점프, 보유 중이면 청산 bar까지 스캔.
+    n = len(df)
+    high = _col(df, "high").tolist()
+    low = _col(df, "low").tolist()
+    close = _col(df, "close").tolist()
+    atr_a = _col(df, "atr").tolist()
+    side_a = entry_side_array(df, cfg)
+    signals = (np.flatnonzero(side_a[start_i:]) + start_i).tolist()
+
+    k = bisect_left(signals, start_i)
+    while k < len(signals):
+        i = signals[k]
+        side = "LONG" if side_a[i] > 0 else "SHORT"
+        entry = close[i]
+        atr_now = atr_a[i]
+
+        if side == "LONG":
+            sl_price = entry - (atr_now * cfg.sl_atr)
+            tp_price = entry + (atr_now * cfg.tp_atr)
+        else:
+            sl_price = entry + (atr_now * cfg.sl_atr)
+            tp_price = entry - (atr_now * cfg.tp_atr)
 
         # 청산
-        if pos is not None:
-            side = pos["side"]
-            bars_held = i - pos["entry_i"]
+        exit_i = None
+        for j in range(i + 1, n):
             exit_reason = None
             exit_price = None
 
             if side == "LONG":
-                if row["low"] <= pos["sl_price"]:
+                if low[j] <= sl_price:
                     exit_reason = "SL"
-                    exit_price = pos["sl_price"]
-                elif row["high"] >= pos["tp_price"]:
+                    exit_price = sl_price
+                elif high[j] >= tp_price:
                     exit_reason = "TP"
-                    exit_price = pos["tp_price"]
+                    exit_price = tp_price
             else:
-                if row["high"] >= pos["sl_price"]:
+                if high[j] >= sl_price:
                     exit_reason = "SL"
-                    exit_price = pos["sl_price"]
-                elif row["low"] <= pos["tp_price"]:
+                    exit_price = sl_price
+                elif low[j] <= tp_price:
                     exit_reason = "TP"
-                    exit_price = pos["tp_price"]
+                    exit_price = tp_price
 
-            if exit_reason is None and cfg.time_exit_bars > 0 and bars_held >= cfg.time_exit_bars:
+            if exit_reason is None and cfg.time_exit_bars > 0 and (j - i) >= cfg.time_exit_bars:
                 exit_reason = "TIME"
-                exit_price = row["close"]
+                exit_price = close[j]
 
             if exit_reason is not None:
                 if side == "LONG":
-                    raw_ret = ((exit_price - pos["entry_price"]) / pos["entry_price"]) * 100.0
+                    raw_ret = ((exit_price - entry) / entry) * 100.0
                 else:
-                    raw_ret = ((pos["entry_price"] - exit_price) / pos["entry_price"]) * 100.0
+                    raw_ret = ((entry - exit_price) / entry) * 100.0
 
                 net_ret = raw_ret - fee_slip
                 balance *= (1.0 + net_ret / 100.0)
@@ -352,55 +439,15 @@ def backtest_symbol(df: pd.DataFrame, cfg: Config) -> Dict:
                         "reason": exit_reason,
                     }
                 )
-                pos = None
-                cooldown_until = i + 1
-                continue
-
-        # 신규 진입
-        if pos is not None:
-            continue
-        if i <= cooldown_until:
-            continue
-
-        atr_now = row["atr"]
-        if pd.isna(atr_now) or atr_now <= 0:
-            continue
-        if not (cfg.atr_min_pct <= row["atr_pct"] <= cfg.atr_max_pct):
-            continue
-        if row["adx"] < cfg.adx_min:
-            continue
-        if row["bar_move_pct"] > cfg.avoid_chase_pct:
-            continue
-
-        long_score = build_entry_score(df, i, "LONG", cfg)
-        short_score = build_entry_score(df, i, "SHORT", cfg)
-
-        chosen = None
-
-        if row["htf_trend"] == 1 and long_score >= cfg.enter_score and long_score >= short_score:
-            chosen = "LONG"
-        elif cfg.allow_short and row["htf_trend"] == -1 and short_score >= cfg.enter_score and short_score > long_score:
-            chosen = "SHORT"
-
-        if chosen is None:
-            continue
-
-        entry = row["close"]
-
-        if chosen == "LONG":
-            sl_price = entry - (atr_now * cfg.sl_atr)
-            tp_price = entry + (atr_now * cfg.tp_atr)
-        else:
-            sl_price = entry + (atr_now * cfg.sl_atr)
-            tp_price = entry - (atr_now * cfg.tp_atr)
+                exit_i = j
+                break
+
+        if exit_i is None:
+            break  # 마지막까지 보유 (미청산 포지션은 집계하지 않음)
 
-        pos = {
-            "side": chosen,
-            "entry_i": i,
-            "entry_price": entry,
-            "sl_price": sl_price,
-            "tp_price": tp_price,
-        }
+        # 신규 진입은 청산 bar 이후 cooldown이 지나야 가능
+        cooldown_until = exit_i + 1
+        k = bisect_left(signals, cooldown_until + 1, k + 1)
 
     wins = [t for t in trades if t["ret_pct"] > 0]
     losses = [t for t in trades if t["ret_pct"] <= 0]
@@ -6,6 +6,8 @@ from dataclasses import dataclass
 from typing import List
 import pandas as pd
 
+import candle_store
+
 def parse_symbols(text: str) -> List[str]:
     return [x.strip().upper() for x in text.split(",") if x.strip()]
 
@@ -26,6 +28,8 @@ def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     return tr.ewm(alpha=1/period, adjust=False).mean()
 
 def load_csv(path: str) -> pd.DataFrame:
+    if candle_store.is_store(path):
+        return candle_store.load(path).to_frame()
     df = pd.read_csv(path)
     df.columns = [c.lower() for c in df.columns]
     df = df.rename(columns={"time":"timestamp","date":"timestamp"})
@@ -9,9 +9,23 @@ Why this exists
 - This file removes that mismatch for verification/backtest runs.
 - It does not place orders and does not call Bybit.
 
+Replay modes
+- stream (default): the candles are parsed once into numeric Bybit-shaped rows and
+  every bar gets a zero-copy newest-first view of its window (KlineView). The
+  indicator state in indicator_stream advances one closed bar per step, exactly as
+  in live trading, so a bar costs O(1) instead of O(window).
+- window: the old path, rebuilding the string kline window for every bar. Kept
+  for comparing results.
+- series: signal_engine.evaluate_series() scores every bar in one NumPy pass
+  before the loop; the loop only walks positions. Same signals as stream (see
+  signal_parity_check.py), and the result carries the block-reason histogram.
+
 Usage
     python run_backtest_signal_engine.py --csv BTCUSDT_15m.csv --symbol BTCUSDT
     python run_backtest_signal_engine.py --csv BTCUSDT_15m.csv --allow-short --out trades.csv
+    python run_backtest_signal_engine.py --csv BTCUSDT_15m.csv --replay window
+    python run_backtest_signal_engine.py --csv BTCUSDT_15m.csv --allow-short --replay series
+    python run_backtest_signal_engine.py --csv data/candles/BTCUSDT_15 --replay series   # candle_store dir
 """
 
 from __future__ import annotations
@@ -32,8 +46,10 @@ os.environ.setdefault("DRY_RUN", "true")
 os.environ.setdefault("SIGNAL_ENGINE_ON", "true")
 os.environ.setdefault("SIGNAL_HTF_ON", "false")
 os.environ.setdefault("SIGNAL_HTF_HARD", "false")
+os.environ.setdefault("SIGNAL_STREAM_ON", "true")
 
-from signal_engine import evaluate_signal_detail  # noqa: E402
+import candle_store  # noqa: E402
+from signal_engine import evaluate_both_sides, evaluate_series, evaluate_signal_detail  # noqa: E402
 
 
 @dataclass
@@ -64,6 +80,44 @@ class Trade:
     bars: int
 
 
+class KlineView:
+    """Newest-first read-only view of `n` rows ending before `end` in an oldest-first list.
+
+    Behaves like the Bybit kline list for the engine (len, [i], [a:b], iteration)
+    without copying: slices are views again.
+    """
+
+    __slots__ = ("_rows", "_end", "_n")
+
+    def __init__(self, rows: list[tuple], end: int, n: int):
+        self._rows = rows
+        self._end = int(end)
+        self._n = max(0, min(int(n), self._end))
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self._n)
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return KlineView(self._rows, self._end - start, max(0, stop - start))
+        if idx < 0:
+            idx += self._n
+        if not 0 <= idx < self._n:
+            raise IndexError("kline view index out of range")
+        return self._rows[self._end - 1 - idx]
+
+    def __iter__(self):
+        rows = self._rows
+        for k in range(self._end - 1, self._end - 1 - self._n, -1):
+            yield rows[k]
+
+    def __reversed__(self):
+        return iter(self._rows[self._end - self._n:self._end])
+
+
 class OfflineTraderModule:
     EMA_FAST = 20
     EMA_SLOW = 50
@@ -72,13 +126,19 @@ class OfflineTraderModule:
     ENTRY_INTERVAL = "15"
     KLINE_LIMIT = 260
 
-    def __init__(self, symbol: str):
+    def __init__(self, symbol: str, candles: list[Candle] | None = None, window: int = 260):
         self.symbol = symbol
-        self._klines: list[list[str]] = []
+        self._klines: list[list[str]] | KlineView = []
+        self._rows = to_numeric_rows(candles) if candles else []
+        self._window = int(window)
 
     def set_window(self, candles: list[Candle]) -> None:
         self._klines = to_bybit_klines(candles)
 
+    def set_cursor(self, end: int) -> None:
+        """Window = candles[end - window:end] of the pre-parsed series (no copy)."""
+        self._klines = KlineView(self._rows, end, self._window)
+
     def get_klines(self, symbol: str, interval: str, limit: int = 240):
         return self._klines[: max(1, int(limit or len(self._klines)))]
 
@@ -113,6 +173,14 @@ def read_csv_candles(path: str) -> list[Candle]:
     if not p.exists():
         raise FileNotFoundError(path)
     rows: list[Candle] = []
+    if candle_store.is_store(p):
+        cols = candle_store.load(str(p)).range()
+        for ts, o, h, l, c, v in zip(*(getattr(cols, k).tolist() for k in candle_store.COLUMNS)):
+            if o > 0 and h > 0 and l > 0 and c > 0:
+                rows.append(Candle(ts=int(ts), open=o, high=h, low=l, close=c, volume=v))
+        if len(rows) < 260:
+            raise ValueError(f"need at least 260 candles, got {len(rows)}")
+        return rows
     with p.open("r", encoding="utf-8-sig", newline="") as f:
         reader = csv.DictReader(f)
         if not reader.fieldnames:
@@ -152,6 +220,14 @@ def to_bybit_klines(candles: Iterable[Candle]) -> list[list[str]]:
     return list(reversed(rows))
 
 
+def to_numeric_rows(candles: Iterable[Candle]) -> list[tuple]:
+    """Oldest-first Bybit-shaped rows with floats instead of strings (parsed once)."""
+    return [
+        (int(c.ts), float(c.open), float(c.high), float(c.low), float(c.close), float(c.volume), float(c.volume * c.close))
+        for c in candles
+    ]
+
+
 def side_return_pct(side: str, entry: float, exit_price: float) -> float:
     if side == "SHORT":
         return ((entry - exit_price) / entry) * 100.0
@@ -166,7 +242,9 @@ def apply_costs(raw_pct: float, fee_rate: float, slip_bps: float) -> float:
 
 
 def run_backtest(candles: list[Candle], args: argparse.Namespace) -> tuple[dict[str, Any], list[Trade]]:
-    fake = OfflineTraderModule(args.symbol)
+    replay = str(getattr(args, "replay", "stream"))
+    stream = replay == "stream"
+    fake = OfflineTraderModule(args.symbol, candles if replay == "stream" else None, int(args.window))
     mp = {
         "enter_score": int(args.enter_score),
         "lev": float(args.leverage),
@@ -181,6 +259,14 @@ def run_backtest(candles: list[Candle], args: argparse.Namespace) -> tuple[dict[
     pos: dict[str, Any] | None = None
     cooldown_until = -1
     start = max(260, int(args.window))
+    sides = [side for side, on in (("LONG", args.allow_long), ("SHORT", args.allow_short)) if on]
+    series = None
+    if replay == "series":
+        rows = to_numeric_rows(candles)
+        series = evaluate_series(
+            [r[2] for r in rows], [r[3] for r in rows], [r[4] for r in rows], [r[5] for r in rows],
+            mp, avoid_low_rsi=False, trader_module=fake, window=int(args.window),
+        )
 
     for i in range(start, len(candles)):
         row = candles[i]
@@ -235,14 +321,36 @@ def run_backtest(candles: list[Candle], args: argparse.Namespace) -> tuple[dict[
         if pos is not None or i <= cooldown_until:
             continue
 
-        window = candles[i - int(args.window): i]
-        fake.set_window(window)
-        price = float(window[-1].close)
+        price = float(candles[i - 1].close)
+        if series is not None:
+            # the window ends at bar i - 1 (its raw[0]), like set_cursor(i)
+            t = i - 1
+            passed = [side for side in sides if series.blocks[side][t] == 0]
+            if not passed:
+                continue
+            side = max(passed, key=lambda x: int(series.score[x][t]))
+            pos = {
+                "entry_i": i,
+                "entry_ts": row.ts,
+                "side": side,
+                "entry": price,
+                "sl": float(series.sl[side][t]),
+                "tp": float(series.tp[side][t]),
+                "score": int(series.score[side][t]),
+            }
+            continue
+
+        if stream:
+            fake.set_cursor(i)
+        else:
+            fake.set_window(candles[i - int(args.window): i])
 
         candidates = []
-        if args.allow_long:
+        if args.allow_long and args.allow_short:
+            candidates.extend(evaluate_both_sides(args.symbol, price, mp, avoid_low_rsi=False, trader_module=fake).values())
+        elif args.allow_long:
             candidates.append(evaluate_signal_detail(args.symbol, "LONG", price, mp, avoid_low_rsi=False, trader_module=fake))
-        if args.allow_short:
+        elif args.allow_short:
             candidates.append(evaluate_signal_detail(args.symbol, "SHORT", price, mp, avoid_low_rsi=False, trader_module=fake))
 
         candidates = [c for c in candidates if c.ok and c.sl is not None and c.tp is not None]
@@ -268,6 +376,7 @@ def run_backtest(candles: list[Candle], args: argparse.Namespace) -> tuple[dict[
     avg_net = statistics.mean([t.pnl_pct_net for t in trades]) if trades else 0.0
     result = {
         "engine": "signal_engine.evaluate_signal_detail",
+        "replay": replay,
         "symbol": args.symbol,
         "trades": len(trades),
         "wins": len(wins),
@@ -280,6 +389,8 @@ def run_backtest(candles: list[Candle], args: argparse.Namespace) -> tuple[dict[
         "max_drawdown_pct": round(max_dd_pct, 4),
         "open_position_left": bool(pos is not None),
     }
+    if series is not None:
+        result["block_histogram"] = {side: {k: v for k, v in series.block_histogram(side).items() if v} for side in sides}
     return result, trades
 
 
@@ -314,6 +425,7 @@ def main() -> int:
     ap.add_argument("--order-usdt", type=float, default=float(os.getenv("ORDER_USDT_SAFE", "30")))
     ap.add_argument("--leverage", type=float, default=float(os.getenv("LEVERAGE_SAFE", "3")))
     ap.add_argument("--initial-equity", type=float, default=1000.0)
+    ap.add_argument("--replay", choices=("stream", "window", "series"), default="stream")
     args = ap.parse_args()
 
     candles = read_csv_candles(args.csv)
@@ -3,11 +3,14 @@
 One shared signal engine for live trading, /why-style diagnosis, and backtests.
 
 Design goals
-- Keep this dependency-free and runtime-patch friendly.
+- Keep this light (indicators.py / NumPy only) and runtime-patch friendly.
 - Make LONG and SHORT scoring symmetric.
 - Return a stable tuple for the existing trader.py API:
     ok, reason, score, sl, tp, atr
 - Also expose detailed metadata for logging and later winrate analysis.
+- evaluate_series() scores a whole OHLCV history at once (backtests / research):
+  per-bar LONG/SHORT score, block bitmask (BLOCK_BITS), SL and TP with the same
+  env thresholds as the per-call path.
 
 This module does not place orders. It only evaluates whether a candidate trade is
 worth taking.
@@ -20,6 +23,15 @@ import math
 import os
 from typing import Any, Iterable
 
+import numpy as np
+
+import indicators as ind
+
+try:
+    from indicator_stream import default_book as _stream_book
+except Exception:  # keep this module importable on its own
+    _stream_book = None
+
 
 def _env_bool(name: str, default: bool = False) -> bool:
     raw = str(os.getenv(name, str(default))).strip().lower()
@@ -54,82 +66,51 @@ def _safe_float(v: Any, default: float = 0.0) -> float:
 
 
 def _ema(vals: Iterable[float], period: int) -> float:
-    vals = [float(x) for x in vals if x is not None]
+    vals = [x for x in vals if x is not None]
     if not vals:
         return 0.0
-    period = max(1, int(period))
-    k = 2.0 / (period + 1.0)
-    e = float(vals[0])
-    for v in vals[1:]:
-        e = float(v) * k + e * (1.0 - k)
-    return e
+    return ind.last(ind.ema(vals, max(1, int(period))))
 
 
 def _rsi(closes: list[float], period: int) -> float:
     p = max(2, int(period))
     if len(closes) < p + 1:
         return 50.0
-    gain = 0.0
-    loss = 0.0
-    for i in range(-p, 0):
-        diff = float(closes[i]) - float(closes[i - 1])
-        if diff > 0:
-            gain += diff
-        else:
-            loss -= diff
-    if loss <= 0:
-        return 100.0 if gain > 0 else 50.0
-    rs = gain / loss
-    return 100.0 - (100.0 / (1.0 + rs))
+    return ind.last(ind.rsi(closes[-(p + 1):], p, zero_loss="strict"), 50.0)
 
 
 def _atr(highs: list[float], lows: list[float], closes: list[float], period: int) -> float:
     p = max(2, int(period))
     if len(closes) < p + 1:
         return max(0.0, float(closes[-1]) * 0.005) if closes else 0.0
-    trs: list[float] = []
-    start = max(1, len(closes) - p)
-    for i in range(start, len(closes)):
-        trs.append(max(
-            float(highs[i]) - float(lows[i]),
-            abs(float(highs[i]) - float(closes[i - 1])),
-            abs(float(lows[i]) - float(closes[i - 1])),
-        ))
-    return sum(trs) / max(1, len(trs))
+    n = p + 1
+    return ind.last(ind.atr(highs[-n:], lows[-n:], closes[-n:], p))
 
 
 def _adx(highs: list[float], lows: list[float], closes: list[float], period: int) -> float:
     p = max(2, int(period))
     if len(closes) < p + 2:
         return 0.0
-    plus_dm: list[float] = []
-    minus_dm: list[float] = []
-    tr: list[float] = []
-    for i in range(1, len(closes)):
-        up = float(highs[i]) - float(highs[i - 1])
-        down = float(lows[i - 1]) - float(lows[i])
-        plus_dm.append(up if up > down and up > 0 else 0.0)
-        minus_dm.append(down if down > up and down > 0 else 0.0)
-        tr.append(max(
-            float(highs[i]) - float(lows[i]),
-            abs(float(highs[i]) - float(closes[i - 1])),
-            abs(float(lows[i]) - float(closes[i - 1])),
-        ))
-
-    dx_vals: list[float] = []
-    start = max(p, len(tr) - p * 3)
-    for end in range(start, len(tr) + 1):
-        tr_sum = sum(tr[end - p:end])
-        if tr_sum <= 0:
-            continue
-        plus = 100.0 * sum(plus_dm[end - p:end]) / tr_sum
-        minus = 100.0 * sum(minus_dm[end - p:end]) / tr_sum
-        denom = plus + minus
-        dx_vals.append(0.0 if denom <= 0 else 100.0 * abs(plus - minus) / denom)
-    if not dx_vals:
-        return 0.0
-    tail = dx_vals[-p:] if len(dx_vals) >= p else dx_vals
-    return sum(tail) / len(tail)
+    return ind.last(ind.adx(highs, lows, closes, p, method="window"))
+
+
+def _stream_indicators(symbol: str, interval: str, raw: list[Any], ema_fast: int, ema_slow: int, rsi_period: int, atr_period: int, adx_period: int) -> dict[str, float] | None:
+    """Same values as the batch _ema/_rsi/_atr/_adx calls below, from per-symbol streaming state.
+    None -> caller uses the batch formulas (stream disabled, or klines without open timestamps)."""
+    if _stream_book is None or not _env_bool("SIGNAL_STREAM_ON", True):
+        return None
+    specs = {
+        "ema_fast": ("ema", ema_fast, ema_fast * 3),
+        "ema_slow": ("ema", ema_slow, ema_slow * 3),
+        "ema200": ("ema", 200, 240),
+        "rsi": ("rsi", rsi_period),
+        "atr": ("atr", atr_period),
+        "adx": ("adx", adx_period),
+    }
+    try:
+        return _stream_book.sync(symbol, interval, raw, specs)
+    except Exception:
+        return None
 
 
 def _mean(vals: list[float]) -> float:
@@ -286,63 +267,94 @@ def _fallback_result(symbol: str, side: str, price: float, mp: dict, note: str)
     return SignalResult(False, symbol, str(side).upper(), float(price or 0.0), 0, reason, sl, tp, atr_v, "UNKNOWN", {"note": note})
 
 
-def evaluate_signal_detail(symbol: str, side: str, price: float, mp: dict, avoid_low_rsi: bool = False, trader_module: Any = None) -> SignalResult:
-    """Evaluate one side of one symbol.
-
-    `trader_module` is intentionally passed in by the runtime patch so this module
-    remains testable and import-safe.
-    """
-    side = str(side or "LONG").upper()
-    price = float(price or 0.0)
-    if price <= 0:
-        return _fallback_result(symbol, side, price, mp, "bad price")
-
-    if trader_module is None:
-        try:
-            import trader as trader_module  # type: ignore
-        except Exception:
-            trader_module = None
-    if trader_module is None or not hasattr(trader_module, "get_klines"):
-        return _fallback_result(symbol, side, price, mp, "trader module unavailable")
-
+def _periods(trader_module: Any) -> tuple[int, int, int, int, int, str, int, int]:
+    """(ema_fast, ema_slow, rsi, atr, adx, entry_interval, kline_limit, min_needed)."""
     ema_fast = int(_get_attr(trader_module, "EMA_FAST", _env_int("EMA_FAST", 20)))
     ema_slow = int(_get_attr(trader_module, "EMA_SLOW", _env_int("EMA_SLOW", 50)))
     rsi_period = int(_get_attr(trader_module, "RSI_PERIOD", _env_int("RSI_PERIOD", 14)))
     atr_period = int(_get_attr(trader_module, "ATR_PERIOD", _env_int("ATR_PERIOD", 14)))
     entry_interval = str(_get_attr(trader_module, "ENTRY_INTERVAL", os.getenv("ENTRY_INTERVAL", "15")))
     kline_limit = max(int(_get_attr(trader_module, "KLINE_LIMIT", _env_int("KLINE_LIMIT", 240))), 240, ema_slow * 4)
+    min_needed = max(ema_slow * 3, atr_period + 30, 120)
+    adx_period = _env_int("SIGNAL_ADX_PERIOD", 14)
+    return ema_fast, ema_slow, rsi_period, atr_period, adx_period, entry_interval, kline_limit, min_needed
+
+
+def _features(symbol: str, price: float, trader_module: Any) -> tuple[dict[str, Any] | None, str]:
+    """Side-independent inputs: klines, indicators, volume ratio and the HTF trend.
+
+    Returns (features, "") or (None, fallback note).
+    """
+    ema_fast, ema_slow, rsi_period, atr_period, adx_period, entry_interval, kline_limit, min_needed = _periods(trader_module)
 
     try:
         raw = trader_module.get_klines(symbol, entry_interval, kline_limit) or []
     except Exception as e:
-        return _fallback_result(symbol, side, price, mp, f"kline error: {e}")
+        return None, f"kline error: {e}"
 
-    highs, lows, closes, vols = _parse_klines(raw)
-    min_needed = max(ema_slow * 3, atr_period + 30, 120)
-    if len(closes) < min_needed:
-        return _fallback_result(symbol, side, price, mp, f"kline 부족 {len(closes)}/{min_needed}")
+    stream = _stream_indicators(symbol, entry_interval, raw, ema_fast, ema_slow, rsi_period, atr_period, adx_period) if len(raw) >= min_needed else None
+    if stream is not None:
+        # indicators come from the stream; only the newest bars are parsed (price / volume ratio)
+        highs, lows, closes, vols = _parse_klines(raw[:40])
+        n_bars = len(raw)
+    else:
+        highs, lows, closes, vols = _parse_klines(raw)
+        n_bars = len(closes)
+    if n_bars < min_needed:
+        return None, f"kline 부족 {n_bars}/{min_needed}"
 
     # Prefer exchange current price if passed price is stale but sane.
     close_price = float(closes[-1])
     if close_price > 0 and abs(close_price / price - 1.0) < 0.03:
         price = close_price
 
-    ef = _ema(closes[-ema_fast * 3:], ema_fast)
-    es = _ema(closes[-ema_slow * 3:], ema_slow)
-    ema200 = _ema(closes[-240:], 200) if len(closes) >= 220 else 0.0
-    rsi_v = _rsi(closes, rsi_period)
-    atr_v = _atr(highs, lows, closes, atr_period)
-    adx_v = _adx(highs, lows, closes, _env_int("SIGNAL_ADX_PERIOD", 14))
-    atr_pct = atr_v / max(price, 1e-9)
-    ema_gap_pct = abs(ef - es) / max(price, 1e-9)
-    chase_atr = abs(price - ef) / max(atr_v, 1e-9)
+    if stream is not None:
+        ef = stream["ema_fast"]
+        es = stream["ema_slow"]
+        ema200 = stream["ema200"] if n_bars >= 220 else 0.0
+        rsi_v = stream["rsi"]
+        atr_v = stream["atr"]
+        adx_v = stream["adx"]
+    else:
+        ef = _ema(closes[-ema_fast * 3:], ema_fast)
+        es = _ema(closes[-ema_slow * 3:], ema_slow)
+        ema200 = _ema(closes[-240:], 200) if len(closes) >= 220 else 0.0
+        rsi_v = _rsi(closes, rsi_period)
+        atr_v = _atr(highs, lows, closes, atr_period)
+        adx_v = _adx(highs, lows, closes, adx_period)
     vol_ratio = 1.0
     if len(vols) >= 30:
         recent = _mean(vols[-5:])
         base = _mean(vols[-35:-5])
         vol_ratio = recent / max(base, 1e-9)
 
-    htf = _htf_trend(symbol, trader_module, ema_fast, ema_slow)
+    return {
+        "price": price,
+        "ema_fast_period": ema_fast,
+        "ema_slow_period": ema_slow,
+        "rsi_period": rsi_period,
+        "atr_period": atr_period,
+        "ef": ef,
+        "es": es,
+        "ema200": ema200,
+        "rsi": rsi_v,
+        "atr": atr_v,
+        "adx": adx_v,
+        "atr_pct": atr_v / max(price, 1e-9),
+        "ema_gap_pct": abs(ef - es) / max(price, 1e-9),
+        "chase_atr": abs(price - ef) / max(atr_v, 1e-9),
+        "vol_ratio": vol_ratio,
+        "htf": _htf_trend(symbol, trader_module, ema_fast, ema_slow),
+    }, ""
+
+
+def _side_result(symbol: str, side: str, f: dict[str, Any], mp: dict, avoid_low_rsi: bool) -> SignalResult:
+    price = f["price"]
+    ef, es, ema200 = f["ef"], f["es"], f["ema200"]
+    rsi_v, atr_v, adx_v = f["rsi"], f["atr"], f["adx"]
+    atr_pct, ema_gap_pct, chase_atr = f["atr_pct"], f["ema_gap_pct"], f["chase_atr"]
+    vol_ratio, htf = f["vol_ratio"], f["htf"]
+
     regime = _detect_regime(side, price, ef, es, ema200, adx_v, atr_pct)
     score = _score_side(side, price, ef, es, ema200, rsi_v, adx_v, atr_pct, ema_gap_pct, chase_atr, vol_ratio, htf)
 
@@ -416,8 +428,8 @@ def evaluate_signal_detail(symbol: str, side: str, price: float, mp: dict, avoid
     reason = (
         f"{head}\n"
         f"- price={price:.6f}\n"
-        f"- EMA{ema_fast}={ef:.6f}, EMA{ema_slow}={es:.6f}, EMA200={ema200:.6f}\n"
-        f"- RSI{rsi_period}={rsi_v:.2f} | ATR{atr_period}={atr_v:.6f} ({atr_pct:.4%}) | ADX={adx_v:.2f}\n"
+        f"- EMA{f['ema_fast_period']}={ef:.6f}, EMA{f['ema_slow_period']}={es:.6f}, EMA200={ema200:.6f}\n"
+        f"- RSI{f['rsi_period']}={rsi_v:.2f} | ATR{f['atr_period']}={atr_v:.6f} ({atr_pct:.4%}) | ADX={adx_v:.2f}\n"
         f"- gap={ema_gap_pct:.4%} | chase={chase_atr:.2f}ATR | vol_ratio={vol_ratio:.2f} | htf={htf} | regime={regime}\n"
         f"- score={score} threshold={threshold}\n"
         f"- result={'PASS' if ok else 'BLOCK'}{' | ' + '; '.join(blocks[:4]) if blocks else ''}\n"
@@ -426,5 +438,278 @@ def evaluate_signal_detail(symbol: str, side: str, price: float, mp: dict, avoid
     return SignalResult(ok, symbol, side, price, score, reason, sl, tp, atr_v, regime, meta)
 
 
+def _resolve_trader(trader_module: Any) -> Any:
+    if trader_module is None:
+        try:
+            import trader as trader_module  # type: ignore
+        except Exception:
+            trader_module = None
+    if trader_module is None or not hasattr(trader_module, "get_klines"):
+        return None
+    return trader_module
+
+
+def evaluate_signal_detail(symbol: str, side: str, price: float, mp: dict, avoid_low_rsi: bool = False, trader_module: Any = None) -> SignalResult:
+    """Evaluate one side of one symbol.
+
+    `trader_module` is intentionally passed in by the runtime patch so this module
+    remains testable and import-safe.
+    """
+    side = str(side or "LONG").upper()
+    price = float(price or 0.0)
+    if price <= 0:
+        return _fallback_result(symbol, side, price, mp, "bad price")
+
+    trader_module = _resolve_trader(trader_module)
+    if trader_module is None:
+        return _fallback_result(symbol, side, price, mp, "trader module unavailable")
+
+    f, note = _features(symbol, price, trader_module)
+    if f is None:
+        return _fallback_result(symbol, side, price, mp, note)
+    return _side_result(symbol, side, f, mp, avoid_low_rsi)
+
+
+def evaluate_both_sides(symbol: str, price: float, mp: dict, avoid_low_rsi: bool = False, trader_module: Any = None) -> dict[str, SignalResult]:
+    """LONG and SHORT from one feature pass (one kline fetch, one indicator/HTF computation).
+
+    Same results as two evaluate_signal_detail() calls; returns {"LONG": ..., "SHORT": ...}.
+    """
+    price = float(price or 0.0)
+    if price <= 0:
+        return {side: _fallback_result(symbol, side, price, mp, "bad price") for side in ("LONG", "SHORT")}
+
+    trader_module = _resolve_trader(trader_module)
+    if trader_module is None:
+        return {side: _fallback_result(symbol, side, price, mp, "trader module unavailable") for side in ("LONG", "SHORT")}
+
+    f, note = _features(symbol, price, trader_module)
+    if f is None:
+        return {side: _fallback_result(symbol, side, price, mp, note) for side in ("LONG", "SHORT")}
+    return {side: _side_result(symbol, side, f, mp, avoid_low_rsi) for side in ("LONG", "SHORT")}
+
+
 def evaluate_signal(symbol: str, side: str, price: float, mp: dict, avoid_low_rsi: bool = False, trader_module: Any = None):
     return evaluate_signal_detail(symbol, side, price, mp, avoid_low_rsi=avoid_low_rsi, trader_module=trader_module).as_tuple()
+
+
+# ---------------------------------------------------------------------------
+# Series API: every bar of a history at once (backtests / research notebooks)
+# ---------------------------------------------------------------------------
+# One bit per block rule of _side_result(); 0 == PASS.
+BLOCK_BITS: dict[str, int] = {
+    "AVOID_LOW_RSI": 1 << 0,
+    "TREND_FAIL": 1 << 1,
+    "RSI_RANGE_FAIL": 1 << 2,
+    "ADX_LOW": 1 << 3,
+    "ATR_LOW": 1 << 4,
+    "ATR_HIGH": 1 << 5,
+    "EMA_GAP_LOW": 1 << 6,
+    "CHASE_BLOCK": 1 << 7,
+    "VOL_RATIO_LOW": 1 << 8,
+    "HTF_BLOCK": 1 << 9,       # HTF_DOWN_BLOCK_LONG / HTF_UP_BLOCK_SHORT
+    "EMA200_BLOCK": 1 << 10,   # EMA200_BLOCK_LONG / EMA200_BLOCK_SHORT
+    "SCORE_LOW": 1 << 11,
+    "NO_DATA": 1 << 12,        # not enough history: the per-call path returns its fallback
+}
+
+REGIMES = ("HIGH_VOL", "LOW_VOL", "CHOP", "TREND_UP", "TREND_DOWN", "RANGE", "UNKNOWN")
+
+
+def block_key(block: str) -> str:
+    """Per-call block text ("ADX_LOW 12.3<20.0", "HTF_DOWN_BLOCK_LONG") -> BLOCK_BITS name."""
+    head = str(block or "").split(" ", 1)[0]
+    if head.startswith("HTF_"):
+        return "HTF_BLOCK"
+    if head.startswith("EMA200_"):
+        return "EMA200_BLOCK"
+    return head
+
+
+def block_names(mask: int) -> list[str]:
+    return [name for name, bit in BLOCK_BITS.items() if int(mask) & bit]
+
+
+@dataclass
+class SignalSeries:
+    valid: np.ndarray                 # bool, enough history for a real evaluation
+    features: dict[str, np.ndarray]   # price, ef, es, ema200, rsi, atr, adx, atr_pct, ema_gap_pct, chase_atr, vol_ratio
+    regime: np.ndarray                # index into REGIMES
+    score: dict[str, np.ndarray]      # "LONG"/"SHORT" -> int score
+    blocks: dict[str, np.ndarray]     # side -> BLOCK_BITS mask
+    sl: dict[str, np.ndarray]
+    tp: dict[str, np.ndarray]
+    threshold: int
+
+    def ok(self, side: str) -> np.ndarray:
+        return self.blocks[str(side).upper()] == 0
+
+    def block_histogram(self, side: str) -> dict[str, int]:
+        mask = self.blocks[str(side).upper()]
+        return {name: int(np.count_nonzero(mask & bit)) for name, bit in BLOCK_BITS.items()}
+
+
+def _score_series(side: str, f: dict[str, np.ndarray], htf: np.ndarray) -> np.ndarray:
+    """_score_side() over arrays."""
+    price, ef, es, ema200, rsi_v = f["price"], f["ef"], f["es"], f["ema200"], f["rsi"]
+    if side == "LONG":
+        score = (
+            15 * (price > es)
+            + 20 * (ef > es)
+            + 8 * ((ema200 <= 0) | (price > ema200))
+            + np.where((45.0 <= rsi_v) & (rsi_v <= 65.0), 22, np.where((40.0 <= rsi_v) & (rsi_v <= 72.0), 10, 0))
+            + np.where(htf == 1, 8, np.where(htf == -1, -12, 0))
+        )
+    else:
+        score = (
+            15 * (price < es)
+            + 20 * (ef < es)
+            + 8 * ((ema200 <= 0) | (price < ema200))
+            + np.where((35.0 <= rsi_v) & (rsi_v <= 55.0), 22, np.where((28.0 <= rsi_v) & (rsi_v <= 60.0), 10, 0))
+            + np.where(htf == -1, 8, np.where(htf == 1, -12, 0))
+        )
+    adx_v = f["adx"]
+    score = score + np.where(adx_v >= 28, 12, np.where(adx_v >= 22, 9, np.where(adx_v >= 18, 5, 0)))
+    atr_pct = f["atr_pct"]
+    score = score + 7 * ((_env_float("SIGNAL_MIN_ATR_PCT", 0.0040) <= atr_pct) & (atr_pct <= _env_float("SIGNAL_MAX_ATR_PCT", 0.035)))
+    score = score + 5 * (f["ema_gap_pct"] >= _env_float("SIGNAL_MIN_EMA_GAP_PCT", 0.0020))
+    score = score + 5 * (f["chase_atr"] <= _env_float("SIGNAL_ANTI_CHASE_ATR", 1.7))
+    score = score + 3 * (f["vol_ratio"] >= _env_float("SIGNAL_MIN_VOL_RATIO", 0.75))
+    return np.clip(score, 0, 100).astype(np.int64)
+
+
+def _blocks_series(side: str, f: dict[str, np.ndarray], htf: np.ndarray, score: np.ndarray, threshold: int, avoid_low_rsi: bool) -> np.ndarray:
+    """The block rules of _side_result() over arrays -> BLOCK_BITS mask."""
+    price, ef, es, ema200, rsi_v = f["price"], f["ef"], f["es"], f["ema200"], f["rsi"]
+    b = BLOCK_BITS
+    if side == "LONG":
+        trend_ok = (price > es) & (ef > es)
+        rsi_ok = (_env_float("SIGNAL_LONG_RSI_MIN", 40.0) <= rsi_v) & (rsi_v <= _env_float("SIGNAL_LONG_RSI_MAX", 72.0))
+        htf_block = htf == -1
+        ema200_block = price < ema200
+    else:
+        trend_ok = (price < es) & (ef < es)
+        rsi_ok = (_env_float("SIGNAL_SHORT_RSI_MIN", 28.0) <= rsi_v) & (rsi_v <= _env_float("SIGNAL_SHORT_RSI_MAX", 60.0))
+        htf_block = htf == 1
+        ema200_block = price > ema200
+
+    mask = np.zeros(len(price), dtype=np.int64)
+    if avoid_low_rsi and side == "LONG":
+        mask |= b["AVOID_LOW_RSI"] * (rsi_v < _env_float("SIGNAL_AVOID_LOW_RSI", 40.0))
+    mask |= b["TREND_FAIL"] * ~trend_ok
+    mask |= b["RSI_RANGE_FAIL"] * ~rsi_ok
+    if _env_bool("SIGNAL_HARD_ADX", True):
+        mask |= b["ADX_LOW"] * (f["adx"] < _env_float("SIGNAL_MIN_ADX", 20.0))
+    mask |= b["ATR_LOW"] * (f["atr_pct"] < _env_float("SIGNAL_MIN_ATR_PCT", 0.0040))
+    mask |= b["ATR_HIGH"] * (f["atr_pct"] > _env_float("SIGNAL_MAX_ATR_PCT", 0.035))
+    mask |= b["EMA_GAP_LOW"] * (f["ema_gap_pct"] < _env_float("SIGNAL_MIN_EMA_GAP_PCT", 0.0020))
+    mask |= b["CHASE_BLOCK"] * (f["chase_atr"] > _env_float("SIGNAL_ANTI_CHASE_ATR", 1.7))
+    if _env_bool("SIGNAL_HARD_VOLUME", False):
+        mask |= b["VOL_RATIO_LOW"] * (f["vol_ratio"] < _env_float("SIGNAL_MIN_VOL_RATIO", 0.75))
+    if _env_bool("SIGNAL_HTF_HARD", False):
+        mask |= b["HTF_BLOCK"] * htf_block
+    if _env_bool("SIGNAL_EMA200_HARD", False):
+        mask |= b["EMA200_BLOCK"] * ((ema200 > 0) & ema200_block)
+    mask |= b["SCORE_LOW"] * (score < threshold)
+    return mask
+
+
+def evaluate_series(
+    highs: Iterable[float],
+    lows: Iterable[float],
+    closes: Iterable[float],
+    volumes: Iterable[float] | None = None,
+    mp: dict | None = None,
+    avoid_low_rsi: bool = False,
+    htf: Iterable[str] | None = None,
+    trader_module: Any = None,
+    window: int | None = None,
+) -> SignalSeries:
+    """Score every bar of an oldest-first OHLCV history with NumPy.
+
+    Bar t gets what evaluate_both_sides() returns when the kline window ends at bar t
+    (at most `window` bars, default the engine's kline limit) and price = close[t]:
+    same indicators, env thresholds, score, blocks, SL and TP.
+    `htf` is an optional per-bar trend ("up"/"down"/...); default "off" everywhere.
+    Periods come from `trader_module` attributes / env like the per-call path.
+    """
+    mp = mp or {}
+    ema_fast, ema_slow, rsi_period, atr_period, adx_period, _, kline_limit, min_needed = _periods(trader_module)
+    window = kline_limit if window is None else min(int(window), kline_limit)
+
+    h = np.asarray(highs, dtype=np.float64).reshape(-1)
+    l = np.asarray(lows, dtype=np.float64).reshape(-1)
+    c = np.asarray(closes, dtype=np.float64).reshape(-1)
+    n = len(c)
+    v = np.ones(n) if volumes is None else np.asarray(volumes, dtype=np.float64).reshape(-1)
+    n_bars = np.minimum(np.arange(1, n + 1), window)
+    valid = (n_bars >= min_needed) & (c > 0)
+
+    price = c
+    ef = ind.ema_window(c, max(1, ema_fast), ema_fast * 3)
+    es = ind.ema_window(c, max(1, ema_slow), ema_slow * 3)
+    ema200 = np.where(n_bars >= 220, ind.ema_window(c, 200, 240), 0.0)
+    rsi_v = np.nan_to_num(ind.rsi(c, max(2, rsi_period), zero_loss="strict"), nan=50.0)
+    atr_v = ind.atr(h, l, c, max(2, atr_period))
+    adx_v = np.nan_to_num(ind.adx(h, l, c, max(2, adx_period), method="window"), nan=0.0)
+
+    recent = ind.rolling_sum(v, 5) / 5.0
+    base = np.full(n, np.nan)
+    if n > 5:
+        base[5:] = (ind.rolling_sum(v, 30) / 30.0)[:-5]
+    with np.errstate(invalid="ignore"):
+        vol_ratio = np.where(n_bars >= 35, recent / np.maximum(base, 1e-9), 1.0)
+
+    # not enough history -> _fallback_result(): atr = 0.5% of price, score 0
+    atr_v = np.where(valid, atr_v, np.maximum(0.0, c * 0.005))
+    safe_price = np.maximum(price, 1e-9)
+    f = {
+        "price": price,
+        "ef": ef,
+        "es": es,
+        "ema200": ema200,
+        "rsi": rsi_v,
+        "atr": atr_v,
+        "adx": adx_v,
+        "atr_pct": atr_v / safe_price,
+        "ema_gap_pct": np.abs(ef - es) / safe_price,
+        "chase_atr": np.abs(price - ef) / np.maximum(atr_v, 1e-9),
+        "vol_ratio": vol_ratio,
+    }
+
+    if htf is None:
+        htf_code = np.zeros(n, dtype=np.int8)
+    else:
+        labels = [str(x).lower() for x in htf]
+        htf_code = np.asarray([1 if x == "up" else -1 if x == "down" else 0 for x in labels], dtype=np.int8)
+
+    atr_pct = f["atr_pct"]
+    regime = np.select(
+        [
+            ~valid,
+            atr_pct >= _env_float("SIGNAL_HIGH_VOL_PCT", 0.035),
+            atr_pct <= _env_float("SIGNAL_LOW_VOL_PCT", 0.003),
+            adx_v < _env_float("SIGNAL_CHOP_ADX", 16.0),
+            (price > es) & (ef > es) & ((ema200 <= 0) | (price > ema200)),
+            (price < es) & (ef < es) & ((ema200 <= 0) | (price < ema200)),
+        ],
+        [REGIMES.index(x) for x in ("UNKNOWN", "HIGH_VOL", "LOW_VOL", "CHOP", "TREND_UP", "TREND_DOWN")],
+        REGIMES.index("RANGE"),
+    ).astype(np.int8)
+
+    threshold = int(_safe_float(mp.get("enter_score"), _env_int("ENTER_SCORE_SAFE", 70)))
+    stop_dist = atr_v * _safe_float(mp.get("stop_atr"), 1.5)
+    tp_dist = stop_dist * _safe_float(mp.get("tp_r"), 1.5)
+    score: dict[str, np.ndarray] = {}
+    blocks: dict[str, np.ndarray] = {}
+    sl: dict[str, np.ndarray] = {}
+    tp: dict[str, np.ndarray] = {}
+    for side in ("LONG", "SHORT"):
+        sc = np.where(valid, _score_series(side, f, htf_code), 0)
+        mask = _blocks_series(side, f, htf_code, sc, threshold, avoid_low_rsi)
+        score[side] = sc
+        blocks[side] = np.where(valid, mask, BLOCK_BITS["NO_DATA"])
+        sl[side] = price - stop_dist if side == "LONG" else price + stop_dist
+        tp[side] = price + tp_dist if side == "LONG" else price - tp_dist
+
+    return SignalSeries(valid, f, regime, score, blocks, sl, tp, threshold)
@@ -3,21 +3,29 @@
 Runtime wiring: make trader.py use signal_engine.evaluate_signal() for live entries.
 Import this after the old stability patch and before allin_guard_experimental_patch_v1
 so later patches can still wrap the unified signal function.
+
+`_score_symbol` asks for LONG, then SHORT, and opposite_recheck_patch_v1 asks for both
+again with the same price. The first call evaluates both sides in one pass
+(signal_engine.evaluate_both_sides) and keeps the pair for SIGNAL_PAIR_TTL_SEC, so the
+other side and the re-check are served without another kline/indicator/HTF pass.
 """
 
 from __future__ import annotations
 
 import os
+import threading
+import time
 
 try:
     import trader as _t
     from trader import Trader
-    from signal_engine import evaluate_signal
+    from signal_engine import evaluate_signal, evaluate_both_sides
 except Exception as _e:  # pragma: no cover
     print(f"[SIGNAL_ENGINE_PATCH] boot failed: {_e}", flush=True)
     _t = None
     Trader = None  # type: ignore
     evaluate_signal = None  # type: ignore
+    evaluate_both_sides = None  # type: ignore
 
 
 def _env_bool(name: str, default: bool = False) -> bool:
@@ -30,10 +38,70 @@ def _env_bool(name: str, default: bool = False) -> bool:
 
 
 SIGNAL_ENGINE_ON = _env_bool("SIGNAL_ENGINE_ON", True)
+SIGNAL_PAIR_TTL_SEC = float(os.getenv("SIGNAL_PAIR_TTL_SEC", "2.0"))
+
+_pair_lock = threading.Lock()
+_pair_cache: dict = {}  # (symbol, price, avoid, mp, candle) -> (ts, {"LONG": SignalResult, "SHORT": SignalResult})
+_pair_stats = {"hit": 0, "miss": 0}
+
+
+def _pair_key(symbol: str, price: float, mp: dict, avoid_low_rsi: bool):
+    mp = mp if isinstance(mp, dict) else {}
+    interval = getattr(_t, "ENTRY_INTERVAL", "15")
+    return (
+        str(symbol).upper(),
+        float(price or 0.0),
+        bool(avoid_low_rsi),
+        mp.get("enter_score"),
+        mp.get("stop_atr"),
+        mp.get("tp_r"),
+        _t.candle_boundary(interval) if hasattr(_t, "candle_boundary") else 0,
+    )
+
+
+def evaluate_pair(symbol: str, price: float, mp: dict, avoid_low_rsi: bool = False) -> dict:
+    """Both sides for (symbol, price, mp), shared for SIGNAL_PAIR_TTL_SEC."""
+    if SIGNAL_PAIR_TTL_SEC <= 0:
+        return evaluate_both_sides(symbol, price, mp, avoid_low_rsi=avoid_low_rsi, trader_module=_t)
+    key = _pair_key(symbol, price, mp, avoid_low_rsi)
+    now = time.time()
+    with _pair_lock:
+        ent = _pair_cache.get(key)
+        if ent is not None and now - ent[0] <= SIGNAL_PAIR_TTL_SEC:
+            _pair_stats["hit"] += 1
+            return ent[1]
+        _pair_stats["miss"] += 1
+    pair = evaluate_both_sides(symbol, price, mp, avoid_low_rsi=avoid_low_rsi, trader_module=_t)
+    with _pair_lock:
+        if len(_pair_cache) >= 512:
+            for k in [k for k, v in _pair_cache.items() if now - v[0] > SIGNAL_PAIR_TTL_SEC]:
+                _pair_cache.pop(k, None)
+            if len(_pair_cache) >= 512:
+                _pair_cache.clear()
+        _pair_cache[key] = (now, pair)
+    return pair
+
+
+def clear_signal_pairs():
+    with _pair_lock:
+        _pair_cache.clear()
+
+
+def signal_pair_stats() -> dict:
+    with _pair_lock:
+        st = dict(_pair_stats)
+        st["entries"] = len(_pair_cache)
+    total = st["hit"] + st["miss"]
+    st["hit_rate"] = round(st["hit"] / total, 4) if total else 0.0
+    return st
+
 
 if _t is not None and Trader is not None and evaluate_signal is not None and SIGNAL_ENGINE_ON:
     def _compute_signal_and_exits(symbol: str, side: str, price: float, mp: dict, avoid_low_rsi: bool = False):
-        return evaluate_signal(symbol, side, price, mp, avoid_low_rsi=avoid_low_rsi, trader_module=_t)
+        side_u = str(side or "LONG").upper()
+        if evaluate_both_sides is None or side_u not in ("LONG", "SHORT"):
+            return evaluate_signal(symbol, side, price, mp, avoid_low_rsi=avoid_low_rsi, trader_module=_t)
+        return evaluate_pair(symbol, price, mp, avoid_low_rsi=avoid_low_rsi)[side_u].as_tuple()
 
     _t.compute_signal_and_exits = _compute_signal_and_exits
 
@@ -41,6 +109,15 @@ if _t is not None and Trader is not None and evaluate_signal is not None and SIG
         return _t.compute_signal_and_exits(symbol, side, price, mp, avoid_low_rsi=avoid_low_rsi)
 
     Trader.compute_signal_and_exits = _method_compute_signal_and_exits
+
+    _prev_md_cache_stats = getattr(_t, "md_cache_stats", None)
+    if callable(_prev_md_cache_stats):
+        def _md_cache_stats():
+            st = _prev_md_cache_stats()
+            st["signal_pair"] = signal_pair_stats()
+            return st
+
+        _t.md_cache_stats = _md_cache_stats
     print("[SIGNAL_ENGINE_PATCH] loaded: live/backtest-style signal unified", flush=True)
 else:
     print("[SIGNAL_ENGINE_PATCH] disabled", flush=True)
@@ -14,6 +14,15 @@ Purpose
 This script never places orders and never calls Bybit/Telegram. It monkey-patches
 trader.get_klines/get_price/get_ticker with offline data before evaluation.
 
+It also replays the candles bar by bar through indicator_stream (the streaming
+EMA/RSI/ATR/ADX state signal_engine uses live) and checks every bar against the
+batch formulas in signal_engine / trader._hard_adx.
+
+Finally signal_engine.evaluate_series() (whole history in one NumPy pass) is
+checked bar by bar against evaluate_both_sides(): ok / score / block set / regime
+/ SL / TP / ATR, once with the lenient env below and once with live-like
+thresholds so every block rule is exercised.
+
 Usage
     python signal_parity_check.py
     python signal_parity_check.py --csv data/BTCUSDT_15m.csv --samples 25
@@ -28,6 +37,7 @@ import math
 import os
 import sys
 import time
+import types
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Iterable
@@ -81,6 +91,21 @@ SAFE_ENV = {
 }
 
 
+# evaluate_series() parity profiles (applied on top of SAFE_ENV).
+SERIES_ENV_PROFILES = {
+    "lenient": {},
+    "live": {
+        "SIGNAL_MIN_ADX": "20",
+        "SIGNAL_MIN_ATR_PCT": "0.0040",
+        "SIGNAL_MAX_ATR_PCT": "0.035",
+        "SIGNAL_MIN_EMA_GAP_PCT": "0.0020",
+        "SIGNAL_ANTI_CHASE_ATR": "1.7",
+        "SIGNAL_HARD_VOLUME": "true",
+        "SIGNAL_EMA200_HARD": "true",
+    },
+}
+
+
 def set_safe_env() -> None:
     for k, v in SAFE_ENV.items():
         os.environ.setdefault(k, v)
@@ -226,9 +251,14 @@ def patch_market_data(trader_module: Any, candles: list[Candle], symbol: str) ->
 
 def check_one_window(bot_main: Any, trader_module: Any, signal_engine: Any, candles: list[Candle], symbol: str, mp: dict[str, Any]) -> list[dict[str, Any]]:
     price = patch_market_data(trader_module, candles, symbol)
+    runtime_patch = sys.modules.get("signal_engine_runtime_patch_v1")
+    if runtime_patch is not None:
+        runtime_patch.clear_signal_pairs()  # new candles, same symbol: drop the previous window's pair
+    both = signal_engine.evaluate_both_sides(symbol, price, mp, avoid_low_rsi=False, trader_module=trader_module)
     rows: list[dict[str, Any]] = []
     for side in ("LONG", "SHORT"):
         direct = normalize_result(signal_engine.evaluate_signal(symbol, side, price, mp, avoid_low_rsi=False, trader_module=trader_module))
+        paired = normalize_result(both[side].as_tuple())
         module = normalize_result(trader_module.compute_signal_and_exits(symbol, side, price, mp, avoid_low_rsi=False))
         method = normalize_result(bot_main.trader.compute_signal_and_exits(symbol, side, price, mp, avoid_low_rsi=False))
 
@@ -236,6 +266,8 @@ def check_one_window(bot_main: Any, trader_module: Any, signal_engine: Any, cand
             raise AssertionError(f"direct signal reason does not mention SIGNAL_ENGINE: {direct[1][:120]!r}")
         if "SIGNAL_ENGINE" not in module[1]:
             raise AssertionError(f"module signal reason does not mention SIGNAL_ENGINE. A later patch may have replaced it: {module[1][:120]!r}")
+        if direct != paired:
+            raise AssertionError(json.dumps({"side": side, "direct": direct, "evaluate_both_sides": paired}, ensure_ascii=False, indent=2))
         if direct != module:
             raise AssertionError(json.dumps({"side": side, "direct": direct, "module": module}, ensure_ascii=False, indent=2))
         if direct != method:
@@ -253,6 +285,120 @@ def check_one_window(bot_main: Any, trader_module: Any, signal_engine: Any, cand
     return rows
 
 
+def check_stream_parity(trader_module: Any, signal_engine: Any, candles: list[Candle], window: int) -> dict[str, Any]:
+    """Bar-by-bar: indicator_stream values == batch values on the same kline window."""
+    import indicator_stream
+
+    book = indicator_stream.IndicatorBook()
+    ema_fast = int(getattr(trader_module, "EMA_FAST", 20))
+    ema_slow = int(getattr(trader_module, "EMA_SLOW", 50))
+    rsi_p = int(getattr(trader_module, "RSI_PERIOD", 14))
+    atr_p = int(getattr(trader_module, "ATR_PERIOD", 14))
+    specs = {
+        "ema_fast": ("ema", ema_fast, ema_fast * 3),
+        "ema_slow": ("ema", ema_slow, ema_slow * 3),
+        "ema200": ("ema", 200, 240),
+        "rsi": ("rsi", rsi_p),
+        "atr": ("atr", atr_p),
+        "adx": ("adx", 14),
+        "hard_adx": ("wilder_adx", atr_p),
+    }
+    # Wilder smoothing is seeded at the batch window start, the stream at its first bar.
+    tol = {k: 1e-8 for k in specs}
+    tol["hard_adx"] = 1e-4
+    worst = {k: 0.0 for k in specs}
+    bars = 0
+    for end in range(window, len(candles) + 1):
+        w = candles[end - window:end]
+        got = book.sync("PARITY", "15", to_bybit_klines(w), specs)
+        if got is None:
+            raise AssertionError("indicator_stream returned None for timestamped klines")
+        highs = [c.high for c in w]
+        lows = [c.low for c in w]
+        closes = [c.close for c in w]
+        want = {
+            "ema_fast": signal_engine._ema(closes[-ema_fast * 3:], ema_fast),
+            "ema_slow": signal_engine._ema(closes[-ema_slow * 3:], ema_slow),
+            "ema200": signal_engine._ema(closes[-240:], 200),
+            "rsi": signal_engine._rsi(closes, rsi_p),
+            "atr": signal_engine._atr(highs, lows, closes, atr_p),
+            "adx": signal_engine._adx(highs, lows, closes, 14),
+            "hard_adx": trader_module._hard_adx(highs, lows, closes, atr_p) if hasattr(trader_module, "_hard_adx") else got["hard_adx"],
+        }
+        for k, v in want.items():
+            diff = abs(float(got[k]) - float(v)) / max(1.0, abs(float(v)))
+            worst[k] = max(worst[k], diff)
+            if diff > tol[k]:
+                raise AssertionError(f"stream parity {k} bar={end}: stream={got[k]!r} batch={v!r}")
+        bars += 1
+    return {"bars": bars, "max_rel_diff": worst, "book": book.stats()}
+
+
+def check_series_parity(trader_module: Any, signal_engine: Any, candles: list[Candle], window: int, mp: dict[str, Any]) -> dict[str, Any]:
+    """Bar-by-bar: evaluate_series() == evaluate_both_sides() on the same kline window."""
+    kl = to_bybit_klines(candles)
+    rows = list(reversed(kl))  # same string-rounded values the per-call path parses
+    highs = [float(r[2]) for r in rows]
+    lows = [float(r[3]) for r in rows]
+    closes = [float(r[4]) for r in rows]
+    vols = [float(r[5]) for r in rows]
+    fake = types.SimpleNamespace(
+        EMA_FAST=int(getattr(trader_module, "EMA_FAST", 20)),
+        EMA_SLOW=int(getattr(trader_module, "EMA_SLOW", 50)),
+        RSI_PERIOD=int(getattr(trader_module, "RSI_PERIOD", 14)),
+        ATR_PERIOD=int(getattr(trader_module, "ATR_PERIOD", 14)),
+        ENTRY_INTERVAL="15",
+        KLINE_LIMIT=int(window),
+    )
+    out: dict[str, Any] = {}
+    for profile, env in SERIES_ENV_PROFILES.items():
+        saved = {k: os.environ.get(k) for k in env}
+        os.environ.update(env)
+        try:
+            avoid = profile != "lenient"
+            series = signal_engine.evaluate_series(highs, lows, closes, vols, mp, avoid_low_rsi=avoid, trader_module=fake, window=int(window))
+            worst = 0.0
+            bars = 0
+            for end in range(60, len(candles) + 1):
+                w = kl[len(kl) - end: len(kl) - end + int(window)]
+                fake.get_klines = lambda sym, interval, limit=240, _w=w: _w[: max(1, int(limit or len(_w)))]
+                t = end - 1
+                both = signal_engine.evaluate_both_sides(f"SERIES_{profile}", closes[t], mp, avoid_low_rsi=avoid, trader_module=fake)
+                for side, res in both.items():
+                    if "blocks" in res.meta:
+                        want_blocks = sorted({signal_engine.block_key(b) for b in res.meta["blocks"]})
+                    else:
+                        want_blocks = ["NO_DATA"]
+                    got = {
+                        "ok": bool(series.ok(side)[t]),
+                        "score": int(series.score[side][t]),
+                        "blocks": sorted(signal_engine.block_names(series.blocks[side][t])),
+                        "regime": signal_engine.REGIMES[int(series.regime[t])],
+                    }
+                    want = {"ok": bool(res.ok), "score": int(res.score), "blocks": want_blocks, "regime": res.regime}
+                    if got != want:
+                        raise AssertionError(json.dumps({"series_parity": profile, "bar": t, "side": side, "series": got, "per_call": want}, ensure_ascii=False))
+                    for name, a, b in (("sl", series.sl[side][t], res.sl), ("tp", series.tp[side][t], res.tp), ("atr", series.features["atr"][t], res.atr)):
+                        diff = abs(float(a) - float(b)) / max(1.0, abs(float(b)))
+                        worst = max(worst, diff)
+                        if diff > 1e-8:
+                            raise AssertionError(f"series parity {profile} {side} {name} bar={t}: series={a!r} per_call={b!r}")
+                bars += 1
+            out[profile] = {
+                "bars": bars,
+                "max_rel_diff": worst,
+                "pass": {side: int(series.ok(side).sum()) for side in ("LONG", "SHORT")},
+                "blocks_long": {k: v for k, v in series.block_histogram("LONG").items() if v},
+            }
+        finally:
+            for k, v in saved.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+    return out
+
+
 def sample_windows(candles: list[Candle], samples: int, window: int) -> list[list[Candle]]:
     if len(candles) < window:
         raise ValueError(f"need >= {window} candles, got {len(candles)}")
@@ -304,11 +450,32 @@ def main(argv: list[str] | None = None) -> int:
             rows = check_one_window(bot_main, trader_module, signal_engine, candles[-args.window:], args.symbol, mp)
             report.append({"case": kind, "last_close": candles[-1].close, "rows": rows})
 
+    if args.csv:
+        stream_candles = read_csv_candles(args.csv)
+    else:
+        stream_candles = synthetic_candles("up", 300) + synthetic_candles("range", 400)[300:]
+        # re-stamp so the concatenated series keeps strictly increasing open times
+        stream_candles = [Candle(i * 60_000 + 1, c.open, c.high, c.low, c.close, c.volume) for i, c in enumerate(stream_candles)]
+    stream = check_stream_parity(trader_module, signal_engine, stream_candles, args.window)
+    report.append({"case": "indicator_stream", **stream})
+    series = check_series_parity(trader_module, signal_engine, stream_candles, args.window, mp)
+    report.append({"case": "evaluate_series", "profiles": series})
+
     if args.out:
         Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    print("[PARITY] OK: signal_engine == trader.compute_signal_and_exits == main.trader.compute_signal_and_exits")
+    print("[PARITY] OK: signal_engine == evaluate_both_sides == trader.compute_signal_and_exits == main.trader.compute_signal_and_exits")
     for item in report:
+        if item["case"] == "indicator_stream":
+            worst = ", ".join(f"{k}={v:.1e}" for k, v in item["max_rel_diff"].items())
+            print(f"[PARITY] indicator_stream == batch over {item['bars']} bars (max rel diff {worst})")
+            continue
+        if item["case"] == "evaluate_series":
+            for profile, st in item["profiles"].items():
+                print(f"[PARITY] evaluate_series == evaluate_both_sides ({profile}) over {st['bars']} bars, "
+                      f"pass LONG={st['pass']['LONG']} SHORT={st['pass']['SHORT']} (max rel diff {st['max_rel_diff']:.1e})")
+                print(f"  - LONG blocks: {st['blocks_long']}")
+            continue
         print(f"[PARITY] case={item['case']} close={float(item['last_close']):.6f}")
         for row in item["rows"]:
             print(f"  - {row['side']}: ok={row['ok']} score={row['score']} sl={row['sl']} tp={row['tp']} atr={row['atr']}")
@@ -21,6 +21,8 @@ import time
 import uuid
 from typing import Any, Callable, Iterable
 
+import indicators as ind
+
 try:
     import trader as _t
     from trader import Trader
@@ -81,11 +83,7 @@ def _ema(vals: Iterable[float], period: int) -> float:
         return float(fn(vals, int(period)))
     if not vals:
         return 0.0
-    k = 2.0 / (int(period) + 1.0)
-    e = float(vals[0])
-    for v in vals[1:]:
-        e = float(v) * k + e * (1.0 - k)
-    return e
+    return ind.last(ind.ema(vals, int(period)))
 
 
 def _rsi(closes: list[float], period: int) -> float:
@@ -97,15 +95,7 @@ def _rsi(closes: list[float], period: int) -> float:
     p = int(period)
     if len(closes) < p + 1:
         return 50.0
-    gain = loss = 0.0
-    for i in range(-p, 0):
-        diff = closes[i] - closes[i - 1]
-        if diff > 0:
-            gain += diff
-        else:
-            loss -= diff
-    rs = gain / (loss + 1e-9)
-    return 100.0 - (100.0 / (1.0 + rs))
+    return ind.last(ind.rsi(closes[-(p + 1):], p, zero_loss="eps"), 50.0)
 
 
 def _atr(highs: list[float], lows: list[float], closes: list[float], period: int) -> float:
@@ -117,10 +107,8 @@ def _atr(highs: list[float], lows: list[float], closes: list[float], period: int
     p = int(period)
     if len(closes) < p + 1:
         return max(0.0, closes[-1] * 0.005) if closes else 0.0
-    trs = []
-    for i in range(-p, 0):
-        trs.append(max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])))
-    return sum(trs) / max(1, len(trs))
+    n = p + 1
+    return ind.last(ind.atr(highs[-n:], lows[-n:], closes[-n:], p))
 
 
 def _adx(highs: list[float], lows: list[float], closes: list[float], period: int) -> float:
@@ -134,29 +122,7 @@ def _adx(highs: list[float], lows: list[float], closes: list[float], period: int
     p = int(period)
     if len(closes) < p + 2:
         return 0.0
-    plus_dm = []
-    minus_dm = []
-    tr = []
-    for i in range(1, len(closes)):
-        up = highs[i] - highs[i - 1]
-        down = lows[i - 1] - lows[i]
-        plus_dm.append(up if up > down and up > 0 else 0.0)
-        minus_dm.append(down if down > up and down > 0 else 0.0)
-        tr.append(max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])))
-    dx_vals = []
-    start = max(p, len(tr) - p * 3)
-    for end in range(start, len(tr) + 1):
-        tr_sum = sum(tr[end - p:end])
-        if tr_sum <= 0:
-            continue
-        plus = 100.0 * sum(plus_dm[end - p:end]) / tr_sum
-        minus = 100.0 * sum(minus_dm[end - p:end]) / tr_sum
-        denom = plus + minus
-        dx_vals.append(0.0 if denom <= 0 else 100.0 * abs(plus - minus) / denom)
-    if not dx_vals:
-        return 0.0
-    tail = dx_vals[-p:] if len(dx_vals) >= p else dx_vals
-    return sum(tail) / len(tail)
+    return ind.last(ind.adx(highs, lows, closes, p, method="window"))
 
 
 STAB_PATCH_ON = _env_bool("STAB_PATCH_ON", True)
@@ -1,5 +1,5 @@
 # storage_utils.py
-import os, json, time, shutil
+import os, json, time, shutil, atexit, threading
 
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
@@ -9,6 +9,12 @@ def atomic_write_json(path: str, obj, backup: bool = True):
     - tmp 파일로 먼저 쓰고 -> rename으로 원자적 교체
     - 기존 파일은 .bak로 백업(옵션)
     """
+    _atomic_write_text(path, _dumps(obj), backup=backup)
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+def _atomic_write_text(path: str, text: str, backup: bool = True):
     d = os.path.dirname(path) or "."
     ensure_dir(d)
 
@@ -23,7 +29,7 @@ def atomic_write_json(path: str, obj, backup: bool = True):
             pass
 
     with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+        f.write(text)
 
     os.replace(tmp, path)
 
@@ -61,3 +67,277 @@ def data_dir() -> str:
 
 def data_path(filename: str) -> str:
     return os.path.join(data_dir(), filename)
+
+
+# ===== write-behind state files =====
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except Exception:
+        return float(default)
+
+class StateStore:
+    """
+    tick 마다 같은 내용을 atomic_write_json 하던 상태 파일용 write-behind 저장소.
+    - put(path, obj): 직렬화해서 마지막으로 쓴 내용과 비교 ("ts" 같은 시계 키는 제외) -> 바뀐 파일만 dirty
+    - dirty 파일은 flush 간격(STATE_FLUSH_SEC, 기본 5초)마다 한 번에 기록, 프로세스 종료 시(atexit) 마지막 flush
+    - 내용이 안 바뀌어도 STATE_HEARTBEAT_SEC(기본 60초)마다 한 번은 다시 써서 파일 ts 가 너무 오래되지 않게 함
+    - put(..., force=True) / flush(): 진입/청산/kill switch 같은 중요한 순간엔 즉시 동기 기록
+    - get(path, default): 아직 안 써진 최신 내용 우선 (read-modify-write 하는 곳용)
+    - stats(): 파일별 put / write / coalesced 카운터
+    STATE_COALESCE=0 이면 예전처럼 put 마다 바로 기록.
+    """
+
+    def __init__(self, flush_sec=None, heartbeat_sec=None, enabled=None, ignore_keys=("ts",)):
+        self.flush_sec = _env_float("STATE_FLUSH_SEC", 5.0) if flush_sec is None else float(flush_sec)
+        self.heartbeat_sec = _env_float("STATE_HEARTBEAT_SEC", 60.0) if heartbeat_sec is None else float(heartbeat_sec)
+        if enabled is None:
+            enabled = str(os.getenv("STATE_COALESCE", "1")).strip().lower() not in ("0", "false", "no", "off")
+        self.enabled = bool(enabled)
+        self.ignore_keys = tuple(ignore_keys or ())
+        self._lock = threading.RLock()
+        self._pending = {}   # path -> (text, backup)
+        self._written = {}   # path -> (signature, written_at)
+        self._counts = {}    # path -> {"puts", "writes", "coalesced"}
+        self._last_flush = time.time()
+
+    def _signature(self, obj) -> str:
+        if isinstance(obj, dict) and self.ignore_keys:
+            obj = {k: v for k, v in obj.items() if k not in self.ignore_keys}
+        return json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+
+    def _count(self, path: str) -> dict:
+        return self._counts.setdefault(path, {"puts": 0, "writes": 0, "coalesced": 0})
+
+    def put(self, path: str, obj, force: bool = False, backup: bool = True):
+        text = _dumps(obj)
+        sig = self._signature(obj)
+        now = time.time()
+        with self._lock:
+            c = self._count(path)
+            c["puts"] += 1
+            last = self._written.get(path)
+            stale = last is None or (now - last[1]) >= self.heartbeat_sec
+            if not self.enabled or force or sig != (last or ("",))[0] or stale:
+                if path in self._pending:
+                    c["coalesced"] += 1
+                self._pending[path] = (text, backup, sig)
+            else:
+                # 디스크 내용과 (ts 빼고) 동일 -> 기록 생략
+                self._pending.pop(path, None)
+                c["coalesced"] += 1
+            if not self.enabled or force:
+                self._write(path)
+            elif now - self._last_flush >= self.flush_sec:
+                self.flush()
+
+    def get(self, path: str, default):
+        with self._lock:
+            ent = self._pending.get(path)
+        if ent is not None:
+            try:
+                return json.loads(ent[0])
+            except Exception:
+                pass
+        return safe_read_json(path, default)
+
+    def _write(self, path: str) -> bool:
+        ent = self._pending.pop(path, None)
+        if ent is None:
+            return False
+        text, backup, sig = ent
+        try:
+            _atomic_write_text(path, text, backup=backup)
+        except Exception:
+            # 다음 flush 때 다시 시도 (더 새 내용이 들어왔으면 그걸로)
+            self._pending.setdefault(path, ent)
+            return False
+        self._written[path] = (sig, time.time())
+        self._count(path)["writes"] += 1
+        return True
+
+    def flush(self, paths=None) -> int:
+        with self._lock:
+            self._last_flush = time.time()
+            targets = list(self._pending) if paths is None else [p for p in paths if p in self._pending]
+            return sum(1 for p in targets if self._write(p))
+
+    def maybe_flush(self) -> int:
+        with self._lock:
+            if self._pending and time.time() - self._last_flush >= self.flush_sec:
+                return self.flush()
+        return 0
+
+    def dirty(self) -> list:
+        with self._lock:
+            return list(self._pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {p: dict(c) for p, c in self._counts.items()}
+
+_STATE = None
+_STATE_LOCK = threading.Lock()
+
+def state_store() -> StateStore:
+    global _STATE
+    with _STATE_LOCK:
+        if _STATE is None:
+            _STATE = StateStore()
+            atexit.register(_STATE.flush)
+        return _STATE
+
+def put_state_json(path: str, obj, force: bool = False):
+    """atomic_write_json 대신 쓰는 coalescing 버전 (자주 덮어쓰는 상태 파일용)"""
+    state_store().put(path, obj, force=force)
+
+def read_state_json(path: str, default):
+    return state_store().get(path, default)
+
+def flush_state() -> int:
+    return state_store().flush()
+
+
+# ===== JSONL tail / since reader =====
+_TAIL_BLOCK = 64 * 1024
+
+def _parse_jsonl(line: bytes):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        obj = json.loads(line)
+    except Exception:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+def _record_ts(obj, ts_key: str = "ts"):
+    try:
+        return float(obj.get(ts_key))
+    except Exception:
+        return None
+
+def tail_jsonl(path: str, n: int = 200, block: int = _TAIL_BLOCK) -> list:
+    """
+    마지막 n개 레코드 (오래된 것 -> 최신 순).
+    EOF 에서 block 단위로 거꾸로 읽기 때문에 파일 크기와 상관없이 n 에 비례하는 만큼만 읽음.
+    깨진 줄 / 쓰는 중인 마지막 줄은 건너뜀.
+    """
+    n = int(n)
+    if n <= 0 or not path or not os.path.exists(path):
+        return []
+    out = []
+    try:
+        with open(path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            buf = b""
+            while pos > 0 and len(out) < n:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                lines = buf.split(b"\n")
+                buf = lines[0]  # 앞쪽이 잘린 줄일 수 있음 -> 다음 block 과 합침
+                for line in reversed(lines[1:]):
+                    obj = _parse_jsonl(line)
+                    if obj is not None:
+                        out.append(obj)
+                        if len(out) >= n:
+                            break
+            if pos == 0 and len(out) < n:
+                obj = _parse_jsonl(buf)
+                if obj is not None:
+                    out.append(obj)
+    except Exception:
+        pass
+    out.reverse()
+    return out
+
+class _TsIndex:
+    """
+    append-only JSONL 의 sparse 시간 인덱스: block 경계 k*block 다음 첫 줄의 (시작 offset, ts).
+    한 번 본 경계는 파일이 잘리거나 교체(inode 변경)되기 전까지 다시 안 읽음.
+    """
+
+    def __init__(self, block: int = _TAIL_BLOCK):
+        self.block = int(block)
+        self.ident = None
+        self.size = 0
+        self.points = {}  # k -> (offset, ts)
+
+    def reset_if_changed(self, st):
+        ident = (st.st_ino, st.st_dev)
+        if ident != self.ident or st.st_size < self.size:
+            self.ident = ident
+            self.points = {}
+        self.size = st.st_size
+
+    def probe(self, f, k: int, ts_key: str):
+        hit = self.points.get(k)
+        if hit is not None:
+            return hit
+        off = k * self.block
+        if off > 0:
+            f.seek(off - 1)
+            f.readline()  # 경계에 걸친 줄은 버리고 다음 줄부터
+        else:
+            f.seek(0)
+        for _ in range(64):
+            start = f.tell()
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                return None  # EOF (쓰는 중인 줄 포함): 캐시 안 함
+            obj = _parse_jsonl(line)
+            ts = _record_ts(obj, ts_key) if obj is not None else None
+            if ts is not None:
+                self.points[k] = (start, ts)
+                return start, ts
+        return None
+
+_TS_INDEX = {}
+_TS_INDEX_LOCK = threading.Lock()
+
+def read_jsonl_since(path: str, since_ts: float, limit=None, ts_key: str = "ts") -> list:
+    """
+    ts >= since_ts 인 레코드 (오래된 것 -> 최신 순, limit 있으면 최신 limit 개).
+    ts 가 대략 시간순으로 append 된다는 가정으로 block 경계 sparse 인덱스를 이진 탐색한 뒤
+    그 지점부터만 읽음 -> 지연 시간은 파일 전체가 아니라 구간 크기에 비례.
+    """
+    if not path or not os.path.exists(path):
+        return []
+    since_ts = float(since_ts)
+    key = os.path.abspath(path)
+    with _TS_INDEX_LOCK:
+        idx = _TS_INDEX.get(key)
+        if idx is None:
+            idx = _TS_INDEX[key] = _TsIndex()
+    out = []
+    try:
+        with open(path, "rb") as f:
+            with _TS_INDEX_LOCK:
+                st = os.fstat(f.fileno())
+                idx.reset_if_changed(st)
+                # 가장 뒤쪽의 "ts < since" 경계 찾기
+                lo, hi = 0, st.st_size // idx.block
+                start = 0
+                while lo <= hi:
+                    mid = (lo + hi) // 2
+                    p = idx.probe(f, mid, ts_key)
+                    if p is None or p[1] >= since_ts:
+                        hi = mid - 1
+                    else:
+                        start = p[0]
+                        lo = mid + 1
+            f.seek(start)
+            for line in f:
+                obj = _parse_jsonl(line)
+                if obj is None:
+                    continue
+                ts = _record_ts(obj, ts_key)
+                if ts is not None and ts >= since_ts:
+                    out.append(obj)
+    except Exception:
+        return out
+    if limit is not None and len(out) > int(limit):
+        out = out[-int(limit):]
+    return out
@@ -1,16 +1,486 @@
+"""trade_logger.py
+
+Append-only, segment-rotated JSONL trade log with a sidecar offset index.
+
+    data/trade_log.jsonl              active segment (one JSON object per line)
+    data/trade_log.jsonl.idx          8-byte header + 24 bytes / record:
+                                      <int64 byte offset, float64 ts key, float64 record ts>
+    data/trade_log.000001.jsonl(.idx) sealed segments (rotated at TRADE_LOG_SEGMENT_MB)
+
+- append(obj): one write to the active segment + one 16-byte index entry, O(1)
+- record number -> byte offset is a direct index lookup; since(ts) / between()
+  binary-search the ts key (running max of the records' "ts") for the first
+  candidate and then select on each record's own ts from the index, so a record
+  that arrived out of order is still returned exactly when since <= ts < until
+- history is never truncated; a torn last line (crash mid-write) is dropped and a
+  file written by the old plain appenders is indexed by the first append
+- readers never write: they skip an incomplete last line and keep index entries the
+  .idx is missing in memory; only the writer (write=True / first append) repairs
+
+The active segment keeps its original name, so anything tailing the plain .jsonl
+file keeps working.
+
+    log = open_log(data_path("loss_events.jsonl"))
+    log.append({"ts": time.time(), ...})
+    log.since(time.time() - 86400)
+    log.tail(50)
+
+log_trade(data) / read_trades() keep the old module API on data/trade_log.jsonl
+(the legacy ./trade_log.json list is imported once).
+"""
+
+from __future__ import annotations
+
+import bisect
 import json
-from datetime import datetime
+import os
+import re
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    from storage_utils import data_path
+except Exception:  # pragma: no cover
+    def data_path(name: str) -> str:
+        os.makedirs("data", exist_ok=True)
+        return os.path.join("data", name)
+
+LEGACY_FILE = "trade_log.json"
+TRADE_LOG_PATH = data_path("trade_log.jsonl")
+
+_MAGIC = b"TLIDX\x02\x00\x00"
+_ENTRY = struct.Struct("<qdd")
+_IDX_DTYPE = np.dtype([("off", "<i8"), ("key", "<f8"), ("ts", "<f8")])
+
+
+def _segment_mb() -> float:
+    try:
+        return float(os.getenv("TRADE_LOG_SEGMENT_MB", "16") or 16)
+    except Exception:
+        return 16.0
+
+
+def _record_ts(obj: Any) -> float:
+    if not isinstance(obj, dict):
+        return 0.0
+    for k in ("ts", "time", "timestamp"):
+        v = obj.get(k)
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            return float(v)
+        try:
+            if v is not None:
+                return float(v)
+        except Exception:
+            continue
+    return 0.0
+
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        obj = json.loads(line)
+    except Exception:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+_NO_ENTRIES = np.zeros(0, dtype=_IDX_DTYPE)
+
+
+class _Segment:
+    __slots__ = ("path", "first", "disk", "mem", "size", "min_ts")
+
+    def __init__(self, path: str, first: int, disk: int, size: int, mem: np.ndarray = _NO_ENTRIES):
+        self.path = path
+        self.first = first
+        self.disk = disk  # entries in path.idx
+        self.mem = mem    # entries path.idx is missing (read-only handle)
+        self.size = size
+        self.min_ts = None  # cached for sealed segments
+
+    @property
+    def count(self) -> int:
+        return self.disk + len(self.mem)
+
+    @property
+    def idx_path(self) -> str:
+        return self.path + ".idx"
+
+    def index(self) -> np.ndarray:
+        if self.disk <= 0:
+            return self.mem
+        idx = np.memmap(self.idx_path, dtype=_IDX_DTYPE, mode="r", offset=len(_MAGIC), shape=(self.disk,))
+        return np.concatenate([idx, self.mem]) if len(self.mem) else idx
+
+    def lowest_ts(self, sealed: bool) -> float:
+        if not sealed or self.min_ts is None:
+            ts = self.index()["ts"]
+            m = float(ts.min()) if len(ts) else float("inf")
+            if not sealed:
+                return m
+            self.min_ts = m
+        return self.min_ts
+
+
+class TradeLog:
+    def __init__(self, path: str, segment_mb: Optional[float] = None, write: bool = False):
+        self.path = str(path)
+        stem, ext = os.path.splitext(self.path)
+        self._stem, self._ext = stem, ext or ".jsonl"
+        self.segment_bytes = int((segment_mb if segment_mb is not None else _segment_mb()) * 1024 * 1024)
+        self._lock = threading.RLock()
+        self._f = None
+        self._idx = None
+        self._sealed: List[_Segment] = []
+        self._active: Optional[_Segment] = None
+        self._last_key = float("-inf")
+        self._active_ino = None
+        self._writer = bool(write)
+        self._load()
+
+    # ---------------- layout ----------------
+    def _sealed_paths(self) -> List[str]:
+        d = os.path.dirname(self.path) or "."
+        base = os.path.basename(self._stem)
+        pat = re.compile(re.escape(base) + r"\.(\d{6})" + re.escape(self._ext) + "$")
+        try:
+            names = os.listdir(d)
+        except FileNotFoundError:
+            return []
+        nums = sorted(int(m.group(1)) for m in (pat.match(n) for n in names) if m)
+        return [self._seal_name(n) for n in nums]
+
+    def _seal_name(self, n: int) -> str:
+        return f"{self._stem}.{n:06d}{self._ext}"
+
+    def _load(self):
+        with self._lock:
+            self._close()
+            first = 0
+            self._sealed = []
+            w = self._writer
+            for p in self._sealed_paths():
+                seg = _Segment(p, first, *self._recover(p, repair=w, persist=w))
+                self._sealed.append(seg)
+                first += seg.count
+            if os.path.exists(self.path):
+                self._active = _Segment(self.path, first, *self._recover(self.path, repair=w, persist=w))
+            else:
+                self._active = _Segment(self.path, first, 0, 0)
+            self._last_key = float("-inf")
+            for seg in reversed(self._sealed + [self._active]):
+                if seg.count:
+                    self._last_key = float(seg.index()["key"][-1])
+                    break
+            self._active_ino = self._ino()
+
+    def _ino(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_dev)
+        except OSError:
+            return None
+
+    def _recover(self, path: str, repair: bool, persist: bool):
+        """
+        Index every complete line of path; returns (entries in path.idx, size, missing entries).
+        repair truncates a torn last line (or adds its missing newline) - writer only;
+        otherwise an incomplete last line is skipped until its newline lands.
+        persist appends the missing entries to path.idx (and rebuilds a foreign / stale
+        index); otherwise the file is left untouched and they are returned in memory.
+        """
+        idx_path = path + ".idx"
+        head = b""
+        if os.path.exists(idx_path):
+            with open(idx_path, "rb") as f:
+                head = f.read(len(_MAGIC))
+        if head != _MAGIC and persist:
+            # missing / foreign-format index: rebuild from the data file
+            with open(idx_path, "wb") as f:
+                f.write(_MAGIC)
+            head = _MAGIC
+        isize = os.path.getsize(idx_path) - len(_MAGIC) if head == _MAGIC else 0
+        n = isize // _ENTRY.size
+        fsize = os.path.getsize(path)
+        offs = np.fromfile(idx_path, dtype=_IDX_DTYPE, count=n, offset=len(_MAGIC)) if n else _NO_ENTRIES
+        # drop entries pointing past EOF (file truncated under us)
+        valid = int(np.searchsorted(offs["off"], fsize, side="left")) if n else 0
+        if (valid != n or isize % _ENTRY.size) and persist:
+            with open(idx_path, "r+b") as f:
+                f.truncate(len(_MAGIC) + valid * _ENTRY.size)
+        n = valid
+        key = float(offs["key"][n - 1]) if n else float("-inf")
+        with open(path, "rb") as f:
+            pos = 0
+            if n:
+                f.seek(int(offs["off"][n - 1]))
+                f.readline()
+                pos = f.tell()
+            if pos >= fsize:
+                return n, fsize, _NO_ENTRIES
+            f.seek(pos)
+            tail = f.read()
+        new = []
+        start = 0
+        while start < len(tail):
+            nl = tail.find(b"\n", start)
+            if nl < 0:
+                if not repair:
+                    break
+                line = tail[start:]
+                if _parse(line) is None:
+                    # torn write: drop the partial record
+                    with open(path, "r+b") as f:
+                        f.truncate(pos + start)
+                    fsize = pos + start
+                    break
+                with open(path, "ab") as f:
+                    f.write(b"\n")
+                nl = len(tail)
+                fsize += 1
+            line = tail[start:nl]
+            if line.strip():
+                ts = _record_ts(_parse(line))
+                key = max(key, ts)
+                new.append((pos + start, key, ts))
+            start = nl + 1
+        if not new:
+            return n, fsize, _NO_ENTRIES
+        if persist:
+            with open(idx_path, "ab") as f:
+                f.write(b"".join(_ENTRY.pack(*e) for e in new))
+            return n + len(new), fsize, _NO_ENTRIES
+        return n, fsize, np.array(new, dtype=_IDX_DTYPE)
+
+    def _close(self):
+        for f in (self._f, self._idx):
+            try:
+                if f is not None:
+                    f.close()
+            except Exception:
+                pass
+        self._f = self._idx = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _refresh(self):
+        # another writer rotated / appended (a TradeLog or a plain .jsonl appender): pick it up
+        if self._ino() != self._active_ino:
+            self._load()
+            return
+        seg = self._active
+        try:
+            size = os.path.getsize(seg.path)
+            cnt = max(0, os.path.getsize(seg.idx_path) - len(_MAGIC)) // _ENTRY.size if os.path.exists(seg.idx_path) else 0
+        except OSError:
+            return
+        if size != seg.size or cnt != seg.disk:
+            seg.disk, seg.size, seg.mem = self._recover(seg.path, repair=False, persist=self._writer)
+            if seg.count:
+                self._last_key = max(self._last_key, float(seg.index()["key"][-1]))
+
+    # ---------------- write ----------------
+    def append(self, obj: Dict[str, Any]) -> int:
+        """Append one record; returns its record number."""
+        line = (json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if not self._writer:
+                # first write from this handle: repair the tail and complete the .idx
+                self._writer = True
+                self._load()
+            # index anything appended by someone else first, so offsets stay in file order
+            self._refresh()
+            if self._f is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._f = open(self.path, "ab")
+                self._idx = open(self._active.idx_path, "ab")
+                if self._idx.tell() == 0:
+                    self._idx.write(_MAGIC)
+            seg = self._active
+            off = os.fstat(self._f.fileno()).st_size
+            self._f.write(line)
+            self._f.flush()
+            ts = _record_ts(obj)
+            self._last_key = max(self._last_key, ts)
+            self._idx.write(_ENTRY.pack(off, self._last_key, ts))
+            self._idx.flush()
+            seg.disk += 1
+            seg.size = off + len(line)
+            recno = seg.first + seg.count - 1
+            if seg.size >= self.segment_bytes:
+                self._rotate()
+            return recno
+
+    def _rotate(self):
+        self._close()
+        seg = self._active
+        n = (int(re.search(r"\.(\d{6})" + re.escape(self._ext) + "$", self._sealed[-1].path).group(1)) + 1) if self._sealed else 1
+        dst = self._seal_name(n)
+        os.replace(seg.idx_path, dst + ".idx")
+        os.replace(seg.path, dst)
+        self._sealed.append(_Segment(dst, seg.first, seg.count, seg.size))
+        self._active = _Segment(self.path, seg.first + seg.count, 0, 0)
+        open(self.path, "ab").close()
+        with open(self._active.idx_path, "wb") as f:
+            f.write(_MAGIC)
+        self._active_ino = self._ino()
+
+    # ---------------- read ----------------
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._active.first + self._active.count
+
+    def _segments(self) -> List[_Segment]:
+        return self._sealed + [self._active]
+
+    def _read_span(self, seg: _Segment, lo: int, hi: int) -> List[Dict[str, Any]]:
+        """records lo..hi-1 (segment-local numbers)."""
+        if hi <= lo:
+            return []
+        idx = seg.index()
+        start = int(idx["off"][lo])
+        end = int(idx["off"][hi]) if hi < seg.count else None
+        with open(seg.path, "rb") as f:
+            f.seek(start)
+            blob = f.read() if end is None else f.read(end - start)
+        out = []
+        for line in blob.split(b"\n"):
+            if line.strip():
+                obj = _parse(line)
+                if obj is not None:
+                    out.append(obj)
+        return out
+
+    def _read_rows(self, seg: _Segment, rows: np.ndarray) -> List[Dict[str, Any]]:
+        """records at the given ascending segment-local numbers, one read per contiguous run."""
+        if not len(rows):
+            return []
+        cut = np.nonzero(np.diff(rows) != 1)[0] + 1
+        out: List[Dict[str, Any]] = []
+        for run in np.split(rows, cut):
+            out.extend(self._read_span(seg, int(run[0]), int(run[-1]) + 1))
+        return out
+
+    def read(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records by record number [start, stop) (negative numbers count from the end)."""
+        with self._lock:
+            self._refresh()
+            total = self._active.first + self._active.count
+            start, stop, _ = slice(start, stop).indices(total)
+            segs = self._segments()
+            out: List[Dict[str, Any]] = []
+            i = max(0, bisect.bisect_right([s.first for s in segs], start) - 1)
+            while i < len(segs) and start < stop:
+                seg = segs[i]
+                hi = min(stop, seg.first + seg.count)
+                out.extend(self._read_span(seg, start - seg.first, hi - seg.first))
+                start = max(start, hi)
+                i += 1
+            return out
+
+    def tail(self, n: int) -> List[Dict[str, Any]]:
+        n = int(n)
+        return self.read(-n) if n > 0 else []
+
+    def between(self, since: float, until: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Records with since <= ts (< until), oldest first; limit keeps the newest `limit`."""
+        since = float(since)
+        until = None if until is None else float(until)
+        with self._lock:
+            self._refresh()
+            out: List[Dict[str, Any]] = []
+            segs = self._segments()
+            for i, seg in enumerate(segs):
+                if seg.count == 0:
+                    continue
+                idx = seg.index()
+                if float(idx["key"][-1]) < since:
+                    continue
+                if until is not None and seg.lowest_ts(i < len(segs) - 1) >= until:
+                    continue
+                # everything before lo has ts <= key < since; from lo on select on the
+                # record's own ts, so out-of-order records land on the right side of until
+                lo = int(np.searchsorted(idx["key"], since, side="left"))
+                ts = idx["ts"][lo:]
+                mask = ts >= since
+                if until is not None:
+                    mask &= ts < until
+                out.extend(self._read_rows(seg, np.nonzero(mask)[0] + lo))
+            if limit is not None and len(out) > int(limit):
+                out = out[-int(limit):]
+            return out
+
+    def since(self, ts: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.between(ts, None, limit)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for seg in list(self._segments()):
+            step = 4096
+            for lo in range(0, seg.count, step):
+                yield from self._read_span(seg, lo, min(seg.count, lo + step))
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            segs = self._segments()
+            return {
+                "path": self.path,
+                "records": self._active.first + self._active.count,
+                "segments": len(segs),
+                "bytes": sum(s.size for s in segs),
+            }
+
+
+_LOGS: Dict[str, TradeLog] = {}
+_LOGS_LOCK = threading.Lock()
+
+
+def open_log(path: str, write: bool = False) -> TradeLog:
+    """Shared TradeLog per path (one writer per process); read-only until write / first append."""
+    key = os.path.abspath(path)
+    with _LOGS_LOCK:
+        log = _LOGS.get(key)
+        if log is None:
+            log = _LOGS[key] = TradeLog(path, write=write)
+    if write and not log._writer:
+        with log._lock:
+            if not log._writer:
+                log._writer = True
+                log._load()
+    return log
+
+
+# ---------------- old module API ----------------
+def _default() -> TradeLog:
+    log = open_log(TRADE_LOG_PATH)
+    if len(log) == 0 and os.path.exists(LEGACY_FILE):
+        try:
+            with open(LEGACY_FILE, "r") as f:
+                rows = json.load(f)
+            for r in rows if isinstance(rows, list) else []:
+                if isinstance(r, dict):
+                    log.append(r)
+            os.replace(LEGACY_FILE, LEGACY_FILE + ".migrated")
+        except Exception:
+            pass
+    return log
 
-FILE = "trade_log.json"
 
 def log_trade(data):
     try:
-        with open(FILE, "r") as f:
-            logs = json.load(f)
-    except:
-        logs = []
+        _default().append(dict(data))
+    except Exception:
+        pass
 
-    logs.append(data)
 
-    with open(FILE, "w") as f:
-        json.dump(logs[-500:], f, indent=2)
+def read_trades(limit: Optional[int] = 500, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Newest `limit` trades (all with limit=None), optionally only ts >= since."""
+    log = _default()
+    if since is not None:
+        return log.since(since, limit=limit)
+    return log.read(0) if limit is None else log.tail(limit)
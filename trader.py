@@ -13,10 +13,13 @@ import json
 import hmac
 import hashlib
 import math
+import random
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as _futures_wait
 from urllib.parse import urlencode
 from datetime import datetime, timezone
-from storage_utils import data_dir, data_path, safe_read_json, atomic_write_json
+from storage_utils import data_dir, data_path, put_state_json, read_state_json, state_store, tail_jsonl
 from kill_switch import KillSwitch
 
 # --- optional advanced modules ---
@@ -50,6 +53,29 @@ except Exception:
     InstitutionalRiskModel = None
     is_liquid_ok = None
     WalkForwardScheduler = None
+
+# --- Bybit client-side pacing (optional) ---
+try:
+    from bybit_rate_limiter import EndpointRateLimiter
+except Exception:
+    EndpointRateLimiter = None
+
+# --- per-tick market data snapshot (optional) ---
+try:
+    from market_data_cache import MarketSnapshotCache, KlineRingBuffer, candle_boundary
+except Exception:
+    MarketSnapshotCache = None
+    KlineRingBuffer = None
+
+    def candle_boundary(interval, now=None):
+        s = str(interval or "").upper()
+        sec = {"D": 86400, "W": 604800, "M": 2592000}.get(s) or max(60, int(float(s or 1)) * 60)
+        return int((time.time() if now is None else now) // sec)
+try:
+    from indicator_stream import default_book as _stream_book
+except Exception:
+    _stream_book = None
+import indicators as ind
 # ===== LOT SIZE CACHE =====
 _lot_cache = {}
 # --- optional AI learn module ---
@@ -257,6 +283,9 @@ SYMBOLS_ENV = [s.strip().upper() for s in SYMBOLS_ENV.split(",") if s.strip()]
 
 SCAN_INTERVAL_SEC = int(os.getenv("SCAN_INTERVAL_SEC", "20"))
 SCAN_LIMIT = int(os.getenv("SCAN_LIMIT", "10"))
+# 스캔 네트워크 단계 동시성 (1 = 기존 순차 스캔). HTTP 요청은 BybitHTTP rate limiter 가 그대로 pacing.
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "8"))
+SCAN_PREFETCH_TIMEOUT_SEC = float(os.getenv("SCAN_PREFETCH_TIMEOUT_SEC", "20"))
 MAX_SPREAD_PCT = float(os.getenv("MAX_SPREAD_PCT", "0.12"))
 
 AUTO_DISCOVERY_DEFAULT = str(os.getenv("AUTO_DISCOVERY", "true")).lower() in ("1", "true", "yes", "y", "on")
@@ -284,6 +313,10 @@ GROWTH_LEV_MAX = int(os.getenv("GROWTH_LEV_MAX", "12"))
 
 RECV_WINDOW_BASE = int(os.getenv("RECV_WINDOW", "8000"))
 MAX_RETRIES = int(os.getenv("BYBIT_MAX_RETRIES", "4"))
+HTTP_POOL_SIZE = int(os.getenv("BYBIT_HTTP_POOL_SIZE", "16"))
+BACKOFF_BASE_SEC = float(os.getenv("BYBIT_BACKOFF_BASE_SEC", "0.5"))
+BACKOFF_MAX_SEC = float(os.getenv("BYBIT_BACKOFF_MAX_SEC", "5"))
+RATE_LIMIT_ON = _bool_env("BYBIT_RATE_LIMIT_ON", "true")
 
 BINANCE = "https://api.binance.com/api/v3/ticker/price"
 
@@ -322,9 +355,9 @@ def _safe_json(r: requests.Response):
 def _sign(secret: str, payload: str) -> str:
     return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
 
-def _bybit_server_time_ms():
+def _bybit_server_time_ms(session=None):
     try:
-        r = requests.get(f"{BYBIT_BASE_URL}/v5/market/time", headers=HEADERS, timeout=10, proxies=PROXIES)
+        r = (session or requests).get(f"{BYBIT_BASE_URL}/v5/market/time", headers=HEADERS, timeout=10, proxies=PROXIES)
         j = r.json()
         if "timeSecond" in j:
             return int(float(j["timeSecond"]) * 1000)
@@ -335,19 +368,53 @@ def _bybit_server_time_ms():
 def _is_bybit_lev_not_modified(ret_code: str, ret_msg: str) -> bool:
     return str(ret_code) == "110043" or ("leverage not modified" in (ret_msg or "").lower())
 
+def _backoff_sec(attempt: int) -> float:
+    # exponential + jitter instead of fixed sleeps, so parallel callers don't retry in lockstep
+    base = min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** max(0, attempt)))
+    return base * random.uniform(0.75, 1.25)
+
 class BybitHTTP:
     def __init__(self):
         self._time_offset_ms = 0
         self._last_sync = 0
+        # keep-alive: one pooled session instead of a new TLS handshake per call
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max(1, HTTP_POOL_SIZE), pool_maxsize=max(1, HTTP_POOL_SIZE))
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self.limiter = EndpointRateLimiter() if (RATE_LIMIT_ON and EndpointRateLimiter is not None) else None
 
     def _sync_time(self):
         now = time.time()
         if now - self._last_sync < 60:
             return
-        srv = _bybit_server_time_ms()
+        srv = _bybit_server_time_ms(self._session)
         self._time_offset_ms = srv - int(time.time() * 1000)
         self._last_sync = now
 
+    def stats(self):
+        st = {"pool_size": HTTP_POOL_SIZE, "rate_limit": self.limiter is not None}
+        if self.limiter is not None:
+            st.update(self.limiter.stats())
+        return st
+
+    def _send(self, method: str, path: str, url: str, **kw):
+        if self.limiter is not None:
+            self.limiter.acquire(path)
+        t0 = time.perf_counter()
+        ok = False
+        r = None
+        try:
+            if method == "GET":
+                r = self._session.get(url, timeout=12, proxies=PROXIES, **kw)
+            else:
+                r = self._session.post(url, timeout=12, proxies=PROXIES, **kw)
+            ok = r.status_code < 400
+            return r
+        finally:
+            if self.limiter is not None:
+                self.limiter.observe(path, getattr(r, "headers", None), (time.perf_counter() - t0) * 1000.0, ok)
+
     def request(self, method: str, path: str, params=None, auth=False):
         params = params or {}
         url = f"{BYBIT_BASE_URL}{path}"
@@ -360,9 +427,9 @@ class BybitHTTP:
             try:
                 if not auth:
                     if method == "GET":
-                        r = requests.get(url, params=params, headers=HEADERS, timeout=12, proxies=PROXIES)
+                        r = self._send("GET", path, url, params=params, headers=HEADERS)
                     else:
-                        r = requests.post(url, json=params, headers=HEADERS, timeout=12, proxies=PROXIES)
+                        r = self._send("POST", path, url, json=params, headers=HEADERS)
                     j = _safe_json(r)
                 else:
                     if not BYBIT_API_KEY or not BYBIT_API_SECRET:
@@ -380,7 +447,7 @@ class BybitHTTP:
                             "X-BAPI-SIGN": sign,
                             "X-BAPI-SIGN-TYPE": "2",
                         }
-                        r = requests.get(url, params=params, headers=headers, timeout=12, proxies=PROXIES)
+                        r = self._send("GET", path, url, params=params, headers=headers)
                         j = _safe_json(r)
                     else:
                         body = json.dumps(params, separators=(",", ":"))
@@ -395,7 +462,7 @@ class BybitHTTP:
                             "X-BAPI-SIGN-TYPE": "2",
                             "Content-Type": "application/json",
                         }
-                        r = requests.post(url, headers=headers, data=body, timeout=12, proxies=PROXIES)
+                        r = self._send("POST", path, url, headers=headers, data=body)
                         j = _safe_json(r)
 
                 if r.status_code == 403:
@@ -412,7 +479,22 @@ class BybitHTTP:
                 # ✅ 10002: time sync issue -> resync + retry
                 if ret == "10002":
                     self._last_sync = 0
-                    time.sleep(0.6 + attempt * 0.4)
+                    time.sleep(_backoff_sec(attempt))
+                    continue
+
+                # 10006: rate limited -> pause the whole endpoint class, then retry
+                if ret == "10006":
+                    pause = _backoff_sec(attempt)
+                    try:
+                        reset_ms = float(r.headers.get("X-Bapi-Limit-Reset-Timestamp") or 0)
+                        if reset_ms > 0:
+                            pause = max(pause, reset_ms / 1000.0 - time.time())
+                    except Exception:
+                        pass
+                    if self.limiter is not None:
+                        self.limiter.throttled(path, pause)
+                    else:
+                        time.sleep(min(pause, BACKOFF_MAX_SEC))
                     continue
 
                 # ✅ FIX 1: leverage not modified -> treat success for set-leverage endpoint
@@ -423,7 +505,7 @@ class BybitHTTP:
             except Exception:
                 if attempt == MAX_RETRIES - 1:
                     raise
-                time.sleep(0.6 + attempt * 0.4)
+                time.sleep(_backoff_sec(attempt))
 
         raise RuntimeError("request failed")
 
@@ -433,32 +515,18 @@ http = BybitHTTP()
 # Indicators
 # =========================
 def ema(data, p):
-    k = 2 / (p + 1)
-    e = data[0]
-    for v in data[1:]:
-        e = v * k + e * (1 - k)
-    return e
+    return ind.last(ind.ema(data, p))
 
 def rsi(data, p=14):
     if len(data) < p + 1:
         return None
-    gain = loss = 0.0
-    for i in range(-p, 0):
-        diff = data[i] - data[i - 1]
-        if diff > 0:
-            gain += diff
-        else:
-            loss -= diff
-    rs = gain / (loss + 1e-9)
-    return 100 - (100 / (1 + rs))
+    return ind.last(ind.rsi(data[-(p + 1):], p, zero_loss="eps"))
 
 def atr(high, low, close, p=14):
     if len(close) < p + 1:
         return None
-    trs = []
-    for i in range(-p, 0):
-        trs.append(max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1])))
-    return sum(trs) / p
+    n = p + 1
+    return ind.last(ind.atr(high[-n:], low[-n:], close[-n:], p))
 
 def ai_score(price, ef, es, r, a):
     score = 0
@@ -533,13 +601,77 @@ def _position_idx_for(side: str):
 # =========================
 # Market (per-symbol)
 # =========================
-def get_ticker(symbol: str):
+# Every kline/ticker consumer (regime, inst-risk, signal LONG/SHORT, MTF, runtime patches)
+# goes through get_klines/get_ticker, so one snapshot cache covers them all.
+MD_CACHE_ON = _bool_env("MD_CACHE_ON", "true")
+md_cache = MarketSnapshotCache() if (MD_CACHE_ON and MarketSnapshotCache is not None) else None
+
+# Incremental klines: seed once, then only fetch the bars since the last stored open time.
+MD_KLINE_RING_ON = _bool_env("MD_KLINE_RING_ON", "true")
+kline_ring = KlineRingBuffer() if (MD_KLINE_RING_ON and KlineRingBuffer is not None) else None
+
+def md_cache_stats():
+    if md_cache is None:
+        return {"enabled": False}
+    st = {"enabled": True, **md_cache.stats()}
+    if kline_ring is not None:
+        st["ring"] = kline_ring.stats()
+    st["exit_sig"] = exit_signal_stats()
+    if _stream_book is not None:
+        st["indicators"] = _stream_book.stats()
+    return st
+
+def _fetch_ticker(symbol: str):
     j = http.request("GET", "/v5/market/tickers", {"category": CATEGORY, "symbol": symbol}, auth=False)
     lst = (j.get("result") or {}).get("list") or []
     return lst[0] if lst else None
 
+def get_ticker(symbol: str):
+    if md_cache is None:
+        return _fetch_ticker(symbol)
+    return md_cache.ticker(symbol, _fetch_ticker)
+
+# Bulk ticker table: one category-wide /v5/market/tickers call serves every symbol of a scan.
+MD_BULK_TICKERS_ON = _bool_env("MD_BULK_TICKERS_ON", "true")
+
+def _fetch_ticker_table():
+    j = http.request("GET", "/v5/market/tickers", {"category": CATEGORY}, auth=False)
+    return (j.get("result") or {}).get("list") or []
+
+def refresh_ticker_table(rows=None, max_age: float = 0.0):
+    """Load the bulk ticker table. Reuses a table younger than max_age seconds.
+    Pass `rows` to seed from a tickers list that was already downloaded.
+    """
+    if md_cache is None or not MD_BULK_TICKERS_ON:
+        return 0
+    if rows is None:
+        if max_age > 0 and md_cache.bulk_age() < max_age:
+            return 0
+        rows = _fetch_ticker_table()
+    return md_cache.load_tickers(rows)
+
+def refresh_position_tickers(symbols):
+    """Position guard: stop checks must not run on a bulk-table/TTL-cached price, fetch fresh tickers."""
+    if md_cache is None:
+        return 0
+    n = 0
+    for sym in dict.fromkeys(str(s or "").upper() for s in (symbols or []) if s):
+        try:
+            t = _fetch_ticker(sym)
+            if t:
+                md_cache.put_ticker(sym, t)
+                n += 1
+        except Exception:
+            continue
+    return n
+
 def get_price(symbol: str):
     if DRY_RUN:
+        # bulk table first (already loaded, no extra request), then the Binance fallback
+        t = md_cache.peek_ticker(symbol) if md_cache is not None else None
+        p = float((t or {}).get("markPrice") or (t or {}).get("lastPrice") or 0)
+        if p > 0:
+            return p
         p = fallback_price(symbol)
         if p <= 0:
             raise Exception(f"fallback price failed for {symbol}")
@@ -561,6 +693,11 @@ def get_spread_pct(symbol: str):
     return (ask - bid) / mid * 100.0
 
 def get_klines(symbol: str, interval: str, limit: int):
+    if md_cache is None:
+        return _fetch_klines(symbol, interval, limit)
+    return md_cache.klines(symbol, interval, limit, _fetch_klines)
+
+def _fetch_klines(symbol: str, interval: str, limit: int):
     if DRY_RUN:
         import random
         price = get_price(symbol)
@@ -572,14 +709,83 @@ def get_klines(symbol: str, interval: str, limit: int):
             out.append([0, 0, f"{h}", f"{l}", f"{c}", 0])
             price = c
         return out
-    j = http.request(
-        "GET",
-        "/v5/market/kline",
-        {"category": CATEGORY, "symbol": symbol, "interval": str(interval), "limit": int(limit)},
-        auth=False,
-    )
+    if kline_ring is not None:
+        return kline_ring.klines(symbol, interval, limit, _fetch_kline_page)
+    return _fetch_kline_page(symbol, interval, limit)
+
+def _fetch_kline_page(symbol: str, interval: str, limit: int, start=None):
+    params = {"category": CATEGORY, "symbol": symbol, "interval": str(interval), "limit": int(limit)}
+    if start is not None:
+        params["start"] = int(start)
+    j = http.request("GET", "/v5/market/kline", params, auth=False)
     return (j.get("result") or {}).get("list") or []
 
+# =========================
+# Concurrent scan prefetch
+# =========================
+# _score_symbol 체인은 심볼마다 ticker/kline 을 여러 번 기다린다(네트워크 대기가 대부분).
+# 스캔 후보 전체의 ticker + kline 을 worker pool 에서 먼저 받아 md_cache 를 채우고,
+# 점수 계산(패치 래퍼들이 self.state 를 바꾸는 부분)은 tick 스레드에서 후보 순서대로 돈다.
+_scan_pool_lock = threading.Lock()
+_scan_pool = None
+
+def _get_scan_pool():
+    global _scan_pool
+    with _scan_pool_lock:
+        if _scan_pool is None:
+            _scan_pool = ThreadPoolExecutor(max_workers=max(1, SCAN_CONCURRENCY), thread_name_prefix="scan")
+        return _scan_pool
+
+def _scan_kline_requests():
+    """(interval, limit) pairs the scoring chain asks for; the snapshot cache serves smaller limits."""
+    limit = max(KLINE_LIMIT, EMA_SLOW * 3 + int(globals().get("REGIME_LOOKBACK", 20)) + 10)
+    reqs = [(str(ENTRY_INTERVAL), limit)]
+    try:
+        if USE_MTF_FILTER and int(MTF_TREND_INTERVAL) > 0:
+            reqs.append((str(int(MTF_TREND_INTERVAL)), max(300, EMA_SLOW * 3 + 50)))
+    except Exception:
+        pass
+    if _bool_env("SIGNAL_HTF_ON", "false"):
+        reqs.append((str(os.getenv("SIGNAL_HTF_INTERVAL", os.getenv("MTF_TREND_INTERVAL", "60"))), max(EMA_SLOW * 4, 220)))
+    out = []
+    for r in reqs:
+        if r[0] not in [x[0] for x in out]:
+            out.append(r)
+    return out
+
+def _prefetch_symbol(symbol: str, kline_reqs):
+    """Worker: warm one symbol. Returns a per-symbol result; never touches Trader.state."""
+    res = {"symbol": symbol, "price": None, "error": None}
+    try:
+        res["price"] = get_price(symbol)
+        for interval, limit in kline_reqs:
+            get_klines(symbol, interval, limit)
+    except Exception as e:
+        res["error"] = str(e)
+    return res
+
+def prefetch_scan_inputs(symbols):
+    """
+    Fetch price + klines for every scan candidate on the bounded scan pool.
+    Returns {symbol: {"price", "error"}}; symbols that miss the timeout are simply absent
+    and get fetched inline by the scoring pass.
+    """
+    syms = list(symbols or [])
+    if SCAN_CONCURRENCY <= 1 or md_cache is None or len(syms) < 2:
+        return {}
+    kline_reqs = _scan_kline_requests()
+    pool = _get_scan_pool()
+    futs = {pool.submit(_prefetch_symbol, s, kline_reqs): s for s in syms}
+    done, _ = _futures_wait(list(futs), timeout=SCAN_PREFETCH_TIMEOUT_SEC)
+    out = {}
+    for f in done:
+        try:
+            r = f.result()
+        except Exception as e:
+            r = {"symbol": futs[f], "price": None, "error": str(e)}
+        out[futs[f]] = r
+    return out
+
 # =========================
 # Positions (FIXED: settleCoin)
 # =========================
@@ -671,6 +877,37 @@ def mode_params(mode: str, overrides=None):
         "enter_score": int(overrides.get("enter_score", ENTER_SCORE_SAFE)),
     }
 
+# Position guard fast path: exit score / ATR only change when an ENTRY_INTERVAL candle closes.
+# Between closes _manage_one reuses the last result and pays only the ticker read.
+POSITION_FAST_PATH = _bool_env("POSITION_FAST_PATH", "true")
+_exit_sig_lock = threading.Lock()
+_exit_sig_cache = {}
+_exit_sig_stats = {"hit": 0, "miss": 0}
+
+def position_exit_signal(symbol: str, side: str, price: float, mp: dict, avoid_low_rsi: bool = False):
+    """compute_signal_and_exits() for an open position, recomputed once per closed candle."""
+    if not POSITION_FAST_PATH:
+        return compute_signal_and_exits(symbol, side, price, mp, avoid_low_rsi=avoid_low_rsi)
+    boundary = candle_boundary(ENTRY_INTERVAL)
+    key = (str(symbol).upper(), str(side).upper(), bool(avoid_low_rsi))
+    with _exit_sig_lock:
+        ent = _exit_sig_cache.get(key)
+        if ent is not None and ent[0] == boundary:
+            _exit_sig_stats["hit"] += 1
+            return ent[1]
+        _exit_sig_stats["miss"] += 1
+    res = compute_signal_and_exits(symbol, side, price, mp, avoid_low_rsi=avoid_low_rsi)
+    with _exit_sig_lock:
+        _exit_sig_cache[key] = (boundary, res)
+        if len(_exit_sig_cache) > 200:
+            for k in [k for k, v in _exit_sig_cache.items() if v[0] != boundary]:
+                _exit_sig_cache.pop(k, None)
+    return res
+
+def exit_signal_stats():
+    with _exit_sig_lock:
+        return {"enabled": POSITION_FAST_PATH, **_exit_sig_stats, "entries": len(_exit_sig_cache)}
+
 def compute_signal_and_exits(symbol: str, side: str, price: float, mp: dict, avoid_low_rsi: bool = False):
     kl = get_klines(symbol, ENTRY_INTERVAL, KLINE_LIMIT)
     if len(kl) < max(120, EMA_SLOW * 3):
@@ -1043,10 +1280,10 @@ class Trader:
         self._idempo_ttl = int(os.getenv("IDEMPO_TTL", "120"))  # 2분
 
         # 일일 PnL(간단 집계) - 너의 실현손익 기록 방식에 맞춰 trader 내부에서 업데이트하면 됨
-        self.daily_pnl = float(safe_read_json(data_path("daily_pnl.json"), {"pnl": 0.0}).get("pnl", 0.0))
+        self.daily_pnl = float(read_state_json(data_path("daily_pnl.json"), {"pnl": 0.0}).get("pnl", 0.0))
 
         # 재시작해도 연속손실/기타 유지하고 싶으면 여기서 로드
-        persisted = safe_read_json(data_path("runtime_state.json"), {})
+        persisted = read_state_json(data_path("runtime_state.json"), {})
         try:
             self.consec_losses = int(persisted.get("consec_losses", getattr(self, "consec_losses", 0)) or 0)
         except Exception:
@@ -1229,15 +1466,17 @@ class Trader:
         self._lev_set_cache[key] = True
 
     # ---------------- discovery ----------------
-    def _refresh_discovery(self):
-        if not self.auto_discovery:
-            return
-        if time.time() - self._last_discovery_ts < DISCOVERY_REFRESH_SEC:
+    def discovery_due(self) -> bool:
+        return bool(self.auto_discovery) and (time.time() - self._last_discovery_ts >= DISCOVERY_REFRESH_SEC)
+
+    def _refresh_discovery(self, rows=None):
+        """`rows`: tickers list already downloaded by the caller (main's discovery loop fetches it outside the lock)."""
+        if not self.discovery_due():
             return
         self._last_discovery_ts = time.time()
         try:
-            j = http.request("GET", "/v5/market/tickers", {"category": CATEGORY}, auth=False)
-            lst = (j.get("result") or {}).get("list") or []
+            lst = rows if rows is not None else _fetch_ticker_table()
+            refresh_ticker_table(rows=lst)
             scored = []
             for t in lst:
                 sym = (t.get("symbol") or "").upper()
@@ -1366,21 +1605,43 @@ class Trader:
             return {"ok": okS, "side": "SHORT", "score": scoreS, "reason": reasonS, "sl": slS, "tp": tpS, "atr": aS, "strategy": strat_key}
         return {"ok": okL, "side": "LONG", "score": scoreL, "reason": reasonL, "sl": slL, "tp": tpL, "atr": aL, "strategy": strat_key}
 
+    def scan_due(self) -> bool:
+        return time.time() - self._last_scan_ts >= SCAN_INTERVAL_SEC
+
+    def scan_candidates(self):
+        return self.symbols[:SCAN_LIMIT] if len(self.symbols) > SCAN_LIMIT else self.symbols[:]
+
     def pick_best(self):
-        if time.time() - self._last_scan_ts < SCAN_INTERVAL_SEC:
+        if not self.scan_due():
             return None
         self._last_scan_ts = time.time()
 
         mp = self._mp()
         enter_score = int(mp["enter_score"])
-        candidates = self.symbols[:SCAN_LIMIT] if len(self.symbols) > SCAN_LIMIT else self.symbols[:]
+        candidates = self.scan_candidates()
+
+        # one tickers call for the whole scan (reuses the discovery download of this tick)
+        try:
+            refresh_ticker_table(max_age=2.0)
+        except Exception as e:
+            self.state["ticker_table_error"] = str(e)
+
+        t0 = time.time()
+        pre = {}
+        try:
+            pre = prefetch_scan_inputs(candidates)
+        except Exception as e:
+            self.state["scan_prefetch_error"] = str(e)
+        t1 = time.time()
 
         best = None
         reasons = []
 
+        # 점수 계산은 후보 순서대로 tick 스레드에서 (동시 스캔이어도 결과/reasons 순서 동일)
         for sym in candidates:
             try:
-                price = get_price(sym)
+                p0 = (pre.get(sym) or {}).get("price")
+                price = p0 if p0 else get_price(sym)
                 info = self._score_symbol(sym, price)
                 if not info.get("ok"):
                     reasons.append(f"{sym}:NO({info.get('reason','')})")
@@ -1396,8 +1657,35 @@ class Trader:
                 continue
 
         self.state["last_scan"] = {"picked": best, "reasons": reasons[:12], "enter_score": enter_score, "universe": len(self.symbols)}
+        self.state["scan_timing"] = {
+            "candidates": len(candidates),
+            "prefetched": len(pre),
+            "workers": SCAN_CONCURRENCY if pre else 1,
+            "prefetch_ms": int((t1 - t0) * 1000),
+            "score_ms": int((time.time() - t1) * 1000),
+        }
         return best
 
+    # ---------------- position guard ----------------
+    def _manage_positions(self):
+        for idx in range(len(self.positions) - 1, -1, -1):
+            try:
+                self._manage_one(idx)
+            except Exception as e:
+                self.err_throttled(f"❌ manage 실패: {e}")
+                self._cb_on_error("manage", e)
+
+    def guard_positions(self):
+        """Fast loop: stop/TP/trailing checks only. Same gates as tick() in front of the manage step."""
+        if not self.positions or not self.trading_enabled:
+            return 0
+        if self._ks.in_cooldown():
+            return 0
+        refresh_position_tickers([p.get("symbol") for p in self.positions])
+        n = len(self.positions)
+        self._manage_positions()
+        return n
+
     # ---------------- position sync (실계정) ----------------
     def _sync_real_positions(self):
         if DRY_RUN:
@@ -2002,7 +2290,7 @@ class Trader:
         price = get_price(symbol)
 
         mp = self._mp()
-        ok, reason, score, sl_new, tp_new, a = compute_signal_and_exits(
+        ok, reason, score, sl_new, tp_new, a = position_exit_signal(
             symbol, side, price, mp, avoid_low_rsi=bool(self.state.get("avoid_low_rsi", False))
         )
 
@@ -2035,19 +2323,19 @@ class Trader:
         # partial TP
         if PARTIAL_TP_ON and (not pos.get("tp1_done")) and pos.get("tp1_price") is not None and (not DRY_RUN):
             try:
-                qty_total = get_position_size(symbol)
+                hit_tp1 = (price >= pos["tp1_price"]) if side == "LONG" else (price <= pos["tp1_price"])
+                # position/list only when TP1 is actually hit (not every guard tick)
+                qty_total = get_position_size(symbol) if hit_tp1 else 0.0
                 if qty_total > 0:
-                    hit_tp1 = (price >= pos["tp1_price"]) if side == "LONG" else (price <= pos["tp1_price"])
-                    if hit_tp1:
-                        close_qty = qty_total * float(PARTIAL_TP_PCT)
-                        self._close_qty(symbol, side, close_qty)
-                        pos["tp1_done"] = True
-                        if MOVE_STOP_TO_BE_ON_TP1 and pos.get("entry_price") is not None:
-                            if side == "LONG":
-                                pos["stop_price"] = max(pos["stop_price"], pos["entry_price"])
-                            else:
-                                pos["stop_price"] = min(pos["stop_price"], pos["entry_price"])
-                        self.notify(f"🧩 PARTIAL TP hit: {symbol} closed {PARTIAL_TP_PCT:.0%} @ {price:.6f} | stop-> {pos['stop_price']:.6f}")
+                    close_qty = qty_total * float(PARTIAL_TP_PCT)
+                    self._close_qty(symbol, side, close_qty)
+                    pos["tp1_done"] = True
+                    if MOVE_STOP_TO_BE_ON_TP1 and pos.get("entry_price") is not None:
+                        if side == "LONG":
+                            pos["stop_price"] = max(pos["stop_price"], pos["entry_price"])
+                        else:
+                            pos["stop_price"] = min(pos["stop_price"], pos["entry_price"])
+                    self.notify(f"🧩 PARTIAL TP hit: {symbol} closed {PARTIAL_TP_PCT:.0%} @ {price:.6f} | stop-> {pos['stop_price']:.6f}")
             except Exception as e:
                 self.err_throttled(f"❌ partial TP 실패: {e}")
 
@@ -2071,6 +2359,8 @@ class Trader:
 
     # ---------------- main tick ----------------
     def tick(self):
+        self.state["md_cache"] = md_cache_stats()
+
         # ===== KILL SWITCH / COOLDOWN =====
         if self._ks.in_cooldown():
             return
@@ -2103,12 +2393,16 @@ class Trader:
             self.state["last_event"] = "STOP: consec losses"
             return
 
+        # main.py split loops: discovery / inst weights / position guard run on their own timers
+        split = bool(getattr(self, "_split_loops", False))
+
         # discovery + exchange sync
-        try:
-            self._refresh_discovery()
-            self._cb_on_success()
-        except Exception as e:
-            self._cb_on_error("refresh_discovery", e)
+        if not split:
+            try:
+                self._refresh_discovery()
+                self._cb_on_success()
+            except Exception as e:
+                self._cb_on_error("refresh_discovery", e)
 
         try:
             self._sync_real_positions()
@@ -2116,10 +2410,11 @@ class Trader:
         except Exception as e:
             self._cb_on_error("sync_real_positions", e)
         # institutional portfolio weights (periodic)
-        try:
-            self._recalc_inst_weights()
-        except Exception:
-            pass
+        if not split:
+            try:
+                self._recalc_inst_weights()
+            except Exception:
+                pass
 
 
         # milestone notify (optional)
@@ -2130,23 +2425,19 @@ class Trader:
         except Exception:
             pass
 
-        # manage open positions first
+        # manage open positions first (split loops: guard_positions already does it every POSITION_GUARD_SEC)
         if self.positions:
-            for idx in range(len(self.positions) - 1, -1, -1):
-                try:
-                    self._manage_one(idx)
-                except Exception as e:
-                    self.err_throttled(f"❌ manage 실패: {e}")
-                    self._cb_on_error("manage", e)
+            if not split:
+                self._manage_positions()
             return
 
-        # ===== runtime persist =====
+        # ===== runtime persist ===== (바뀐 것만, flush 간격으로 묶어서 기록)
         try:
-            atomic_write_json(data_path("runtime_state.json"), {
+            put_state_json(data_path("runtime_state.json"), {
                 "consec_losses": int(getattr(self, "consec_losses", 0) or 0),
                 "ts": int(time.time()),
             })
-            atomic_write_json(data_path("daily_pnl.json"), {
+            put_state_json(data_path("daily_pnl.json"), {
                 "pnl": float(getattr(self, "daily_pnl", 0.0) or 0.0),
                 "ts": int(time.time()),
             })
@@ -2274,6 +2565,8 @@ class Trader:
             "settle_coin": SETTLE_COIN,
             "avoid_low_rsi": bool(self.state.get("avoid_low_rsi", False)),
             "use_risk_engine": bool(USE_RISK_ENGINE and calc_position_size is not None),
+            "md_cache": md_cache_stats(),
+            "http": http.stats(),
         }
 # ======================================================================
 # FINAL 10/10 PATCH (ONE-PASTE) - Append to the VERY END of trader.py
@@ -2616,7 +2909,7 @@ if FINAL10_ON:
                     return
                 # Persist runtime settings that users expect to survive restarts
                 try:
-                    atomic_write_json(
+                    put_state_json(
                         data_path("runtime_state.json"),
                         {
                             "consec_losses": int(getattr(self, "consec_losses", 0) or 0),
@@ -2638,7 +2931,7 @@ if FINAL10_ON:
                         },
                     )
                     # keep daily_pnl.json also (compat)
-                    atomic_write_json(data_path("daily_pnl.json"), {"pnl": float(getattr(self, "daily_pnl", 0.0) or 0.0), "ts": int(time.time())})
+                    put_state_json(data_path("daily_pnl.json"), {"pnl": float(getattr(self, "daily_pnl", 0.0) or 0.0), "ts": int(time.time())})
                 except Exception:
                     pass
 
@@ -2653,7 +2946,7 @@ if FINAL10_ON:
 
             # Load more settings if available
             try:
-                persisted = safe_read_json(data_path("runtime_state.json"), {}) or {}
+                persisted = read_state_json(data_path("runtime_state.json"), {}) or {}
                 if "trading_enabled" in persisted:
                     self.trading_enabled = bool(persisted.get("trading_enabled"))
                 if "mode" in persisted and str(persisted.get("mode")):
@@ -2720,12 +3013,12 @@ ADV_REALIZED_SLEEP = float(os.getenv("ADV_REALIZED_SLEEP", "0.8"))
 
 
 def _adv_load_runtime():
-    return safe_read_json(ADVANCED_RUNTIME_FILE, {"by_strategy": {}, "ts": int(time.time())}) or {"by_strategy": {}, "ts": int(time.time())}
+    return read_state_json(ADVANCED_RUNTIME_FILE, {"by_strategy": {}, "ts": int(time.time())}) or {"by_strategy": {}, "ts": int(time.time())}
 
 
 def _adv_save_runtime(st):
     st["ts"] = int(time.time())
-    atomic_write_json(ADVANCED_RUNTIME_FILE, st)
+    put_state_json(ADVANCED_RUNTIME_FILE, st)
 
 
 class _AdvancedStrategyTuner:
@@ -2910,7 +3203,7 @@ def _adv_estimate_trade_pnl(pos: dict, exit_price: float):
 
 def _adv_sync_runtime(self):
     try:
-        atomic_write_json(
+        put_state_json(
             data_path("runtime_state.json"),
             {
                 "consec_losses": int(getattr(self, "consec_losses", 0) or 0),
@@ -2931,7 +3224,7 @@ def _adv_sync_runtime(self):
                 "ts": int(time.time()),
             },
         )
-        atomic_write_json(data_path("daily_pnl.json"), {"pnl": float(getattr(self, "daily_pnl", 0.0) or 0.0), "ts": int(time.time())})
+        put_state_json(data_path("daily_pnl.json"), {"pnl": float(getattr(self, "daily_pnl", 0.0) or 0.0), "ts": int(time.time())})
     except Exception:
         pass
 
@@ -3283,7 +3576,14 @@ if FINAL10_ON:
         lines = [base]
         cooldown_left = max(0, int(float(getattr(self, "_cooldown_until", 0) or 0) - time.time()))
         lines.append(f"🛡️ cb_err_count={int(getattr(self, '_cb_err_count', 0) or 0)} | cooldown_left={cooldown_left}s")
-        lines.append(f"💾 runtime_saved_ts={int((safe_read_json(data_path('runtime_state.json'), {}) or {}).get('ts', 0) or 0)} | last_skip={getattr(self, '_last_skip_reason', '')}")
+        lines.append(f"💾 runtime_saved_ts={int((read_state_json(data_path('runtime_state.json'), {}) or {}).get('ts', 0) or 0)} | last_skip={getattr(self, '_last_skip_reason', '')}")
+        try:
+            st = state_store().stats()
+            writes = sum(c["writes"] for c in st.values())
+            puts = sum(c["puts"] for c in st.values())
+            lines.append(f"💾 state writes={writes}/{puts} puts | dirty={len(state_store().dirty())}")
+        except Exception:
+            pass
         try:
             summary = self._adv_tuner.summary()
             if summary:
@@ -3344,40 +3644,7 @@ HARD_ENTER_SCORE_AGGRO = int(os.getenv("HARD_ENTER_SCORE_AGGRO", "65"))
 def _hard_adx(highs, lows, closes, period=14):
     if len(closes) < period + 2:
         return 0.0
-    tr_list, plus_dm, minus_dm = [], [], []
-    for i in range(1, len(closes)):
-        up_move = highs[i] - highs[i - 1]
-        down_move = lows[i - 1] - lows[i]
-        plus_dm.append(up_move if (up_move > down_move and up_move > 0) else 0.0)
-        minus_dm.append(down_move if (down_move > up_move and down_move > 0) else 0.0)
-        tr = max(
-            highs[i] - lows[i],
-            abs(highs[i] - closes[i - 1]),
-            abs(lows[i] - closes[i - 1]),
-        )
-        tr_list.append(tr)
-    if len(tr_list) < period:
-        return 0.0
-    atr_sm = sum(tr_list[:period]) / period
-    plus_sm = sum(plus_dm[:period]) / period
-    minus_sm = sum(minus_dm[:period]) / period
-    dx_values = []
-    for i in range(period, len(tr_list)):
-        atr_sm = ((atr_sm * (period - 1)) + tr_list[i]) / period
-        plus_sm = ((plus_sm * (period - 1)) + plus_dm[i]) / period
-        minus_sm = ((minus_sm * (period - 1)) + minus_dm[i]) / period
-        if atr_sm <= 0:
-            continue
-        plus_di = 100.0 * (plus_sm / atr_sm)
-        minus_di = 100.0 * (minus_sm / atr_sm)
-        denom = plus_di + minus_di
-        dx = 0.0 if denom <= 0 else 100.0 * abs(plus_di - minus_di) / denom
-        dx_values.append(dx)
-    if not dx_values:
-        return 0.0
-    tail = dx_values[-period:] if len(dx_values) >= period else dx_values
-    return sum(tail) / len(tail)
-
+    return ind.last(ind.adx(highs, lows, closes, period, method="wilder"))
 
 if HARDENING_ON:
     _orig_compute_signal_and_exits_hard = compute_signal_and_exits
@@ -3390,14 +3657,22 @@ if HARDENING_ON:
 
         try:
             kl = get_klines(symbol, ENTRY_INTERVAL, max(KLINE_LIMIT, EMA_SLOW * 3 + 60))
-            kl = list(reversed(kl))
-            closes = [float(x[4]) for x in kl]
-            highs = [float(x[2]) for x in kl]
-            lows = [float(x[3]) for x in kl]
-            adx_v = _hard_adx(highs, lows, closes, ATR_PERIOD)
+            sv = _stream_book.sync(symbol, ENTRY_INTERVAL, kl, {
+                "ef": ("ema", EMA_FAST, EMA_FAST * 3),
+                "es": ("ema", EMA_SLOW, EMA_SLOW * 3),
+                "adx": ("wilder_adx", ATR_PERIOD),
+            }) if (_stream_book is not None and _bool_env("SIGNAL_STREAM_ON", "true") and len(kl) >= ATR_PERIOD + 2) else None
+            if sv is not None:
+                adx_v, ef, es = sv["adx"], sv["ef"], sv["es"]
+            else:
+                kl = list(reversed(kl))
+                closes = [float(x[4]) for x in kl]
+                highs = [float(x[2]) for x in kl]
+                lows = [float(x[3]) for x in kl]
+                adx_v = _hard_adx(highs, lows, closes, ATR_PERIOD)
+                ef = ema(closes[-EMA_FAST * 3:], EMA_FAST)
+                es = ema(closes[-EMA_SLOW * 3:], EMA_SLOW)
             atr_pct = (float(a) / float(price)) if price else 0.0
-            ef = ema(closes[-EMA_FAST * 3:], EMA_FAST)
-            es = ema(closes[-EMA_SLOW * 3:], EMA_SLOW)
             ema_gap_pct = abs(ef - es) / max(price, 1e-9)
             self_need = max(int(mp.get("enter_score", 0)), HARD_ENTER_SCORE_AGGRO if str(globals().get("MODE_DEFAULT", "SAFE")).upper() == "AGGRO" else HARD_ENTER_SCORE_SAFE)
 
@@ -3464,34 +3739,17 @@ try:
     def _ema_series(values, period: int):
         if not values:
             return []
-        k = 2.0 / (period + 1.0)
-        out = []
-        prev = float(values[0])
-        for x in values:
-            x = float(x)
-            prev = x * k + prev * (1.0 - k)
-            out.append(prev)
-        return out
+        return ind.ema(values, period).tolist()
 
     def _atr_pct_from_candles(candles, period: int = 14):
         try:
             if not candles or len(candles) < period + 2:
                 return 0.0
 
-            trs = []
-            prev_close = _safe_float(candles[0].get("close"))
-            for c in candles[1:]:
-                h = _safe_float(c.get("high"))
-                l = _safe_float(c.get("low"))
-                cl = _safe_float(c.get("close"))
-                tr = max(h - l, abs(h - prev_close), abs(l - prev_close))
-                trs.append(tr)
-                prev_close = cl
-
-            if len(trs) < period:
-                return 0.0
-
-            atr = sum(trs[-period:]) / period
+            highs = [_safe_float(c.get("high")) for c in candles]
+            lows = [_safe_float(c.get("low")) for c in candles]
+            closes = [_safe_float(c.get("close")) for c in candles]
+            atr = ind.last(ind.atr(highs, lows, closes, period))
             last_close = _safe_float(candles[-1].get("close"), 1.0)
             if last_close <= 0:
                 return 0.0
@@ -3515,17 +3773,7 @@ try:
         try:
             if len(values) < period + 1:
                 return 50.0
-            gains, losses = [], []
-            for i in range(1, len(values)):
-                diff = float(values[i]) - float(values[i - 1])
-                gains.append(max(diff, 0.0))
-                losses.append(max(-diff, 0.0))
-            avg_gain = sum(gains[-period:]) / period
-            avg_loss = sum(losses[-period:]) / period
-            if avg_loss == 0:
-                return 100.0
-            rs = avg_gain / avg_loss
-            return 100.0 - (100.0 / (1.0 + rs))
+            return ind.last(ind.rsi(values, period, zero_loss="100"), 50.0)
         except Exception:
             return 50.0
 
@@ -4158,13 +4406,13 @@ try:
 
     def _uf_read_json(path, default):
         try:
-            return safe_read_json(path, default)
+            return read_state_json(path, default)
         except Exception:
             return default
 
     def _uf_write_json(path, payload):
         try:
-            atomic_write_json(path, payload)
+            put_state_json(path, payload)
         except Exception:
             pass
 
@@ -6439,7 +6687,6 @@ except Exception as _why3_e:
 try:
     import os as _ops_os
     import time as _ops_time
-    import json as _ops_json
     import socket as _ops_socket
 
     def _ops_env_bool(k, default=False):
@@ -6511,23 +6758,11 @@ try:
             return "decisions.jsonl"
 
     def _ops_read_jsonl_tail(path, max_lines=500):
-        out = []
+        # EOF 에서 거꾸로 읽음: decisions.jsonl 크기와 무관
         try:
-            if not path or not _ops_os.path.exists(path):
-                return out
-            with open(path, "r", encoding="utf-8") as f:
-                lines = f.readlines()[-int(max_lines):]
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    out.append(_ops_json.loads(line))
-                except Exception:
-                    continue
+            return tail_jsonl(path, int(max_lines))
         except Exception:
-            pass
-        return out
+            return []
 
     def _ops_market(symbol):
         sym = _ops_symbol(symbol)
@@ -6634,6 +6869,17 @@ try:
             lines.append(f"Bybit={'OK' if ok else 'NO'} | BTC={bt.get('lastPrice') or bt.get('markPrice') or '-'}")
         except Exception as e:
             lines.append(f"Bybit=ERR {_ops_clip(e, 90)}")
+        try:
+            hs = http.stats()
+            lat = hs.get("latency") or {}
+            slow = sorted(lat.items(), key=lambda kv: float(kv[1].get("p95_ms") or 0), reverse=True)[:2]
+            waits = hs.get("waits") or {}
+            lines.append(
+                f"http pool={hs.get('pool_size')} | rl_wait={waits.get('count', 0)}/{waits.get('total_sec', 0)}s throttled={waits.get('throttled', 0)} | "
+                + " ".join(f"{p.rsplit('/', 1)[-1]}:p50={v.get('p50_ms')}/p95={v.get('p95_ms')}ms" for p, v in slow)
+            )
+        except Exception:
+            pass
 
         # Telegram config check only; do not send test spam
         lines.append(f"Telegram={'OK' if (BOT_TOKEN and CHAT_ID) else 'NO'} | token={bool(BOT_TOKEN)} chat={bool(CHAT_ID)}")
@@ -7307,3 +7553,54 @@ except Exception as _ailev_e:
     except Exception:
         pass
 # END AI AUTO LEVERAGE SAFE PATCH V1
+
+# BEGIN STATE PERSIST COALESCE V1
+# runtime_state.json / daily_pnl.json / advanced_runtime.json / runtime_state_ultimate.json /
+# strategy_perf.json / slippage_stats.json 는 storage_utils.StateStore 로 모아서 기록 (STATE_FLUSH_SEC).
+# 진입 / 청산 / kill switch 발동 직후엔 dirty 파일을 즉시 동기 flush.
+try:
+    def _state_flush_now():
+        try:
+            state_store().flush()
+        except Exception:
+            pass
+
+    _state_prev_enter = Trader._enter
+    def _state_enter(self, *args, **kwargs):
+        try:
+            return _state_prev_enter(self, *args, **kwargs)
+        finally:
+            _state_flush_now()
+    Trader._enter = _state_enter
+
+    _state_prev_exit = Trader._exit_position
+    def _state_exit_position(self, *args, **kwargs):
+        try:
+            return _state_prev_exit(self, *args, **kwargs)
+        finally:
+            _state_flush_now()
+    Trader._exit_position = _state_exit_position
+
+    _state_prev_trip = KillSwitch.trip
+    def _state_trip(self, reason: str) -> str:
+        msg = _state_prev_trip(self, reason)
+        _state_flush_now()
+        return msg
+    KillSwitch.trip = _state_trip
+
+    _state_prev_tick = Trader.tick
+    def _state_tick(self):
+        try:
+            return _state_prev_tick(self)
+        finally:
+            try:
+                state_store().maybe_flush()
+            except Exception:
+                pass
+    Trader.tick = _state_tick
+except Exception as _state_e:
+    try:
+        print("[STATE PERSIST COALESCE V1] load fail:", _state_e, flush=True)
+    except Exception:
+        pass
+# END STATE PERSIST COALESCE V1
@@ -4,6 +4,7 @@ import json
 import sys
 import time
 
+import indicators as ind
 from data_store import update_cache, load_candles
 from walkforward import walk_forward
 from optimizer import pick_best_params
@@ -12,30 +13,18 @@ from make_signal import make_signal_fn
 OUT_FILE = "learn_state.json"
 
 def ema(vals, p):
-    k = 2/(p+1)
-    e = vals[0]
-    for v in vals[1:]:
-        e = v*k + e*(1-k)
-    return e
+    return ind.last(ind.ema(vals, p))
 
 def rsi(vals, p=14):
     if len(vals) < p + 1:
         return None
-    gain=loss=0.0
-    for i in range(-p,0):
-        d = vals[i]-vals[i-1]
-        if d>0: gain+=d
-        else: loss-=d
-    rs = gain/(loss+1e-9)
-    return 100-(100/(1+rs))
+    return ind.last(ind.rsi(vals[-(p + 1):], p, zero_loss="eps"))
 
 def atr(high, low, close, p=14):
     if len(close) < p + 1:
         return None
-    trs=[]
-    for i in range(-p,0):
-        trs.append(max(high[i]-low[i], abs(high[i]-close[i-1]), abs(low[i]-close[i-1])))
-    return sum(trs)/p
+    n = p + 1
+    return ind.last(ind.atr(high[-n:], low[-n:], close[-n:], p))
 
 def ai_score_like(price, ef, es, r, a):
     score=0
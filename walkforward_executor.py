@@ -0,0 +1,399 @@
+"""walkforward_executor.py
+
+Parallel walk-forward engine.
+
+Walk-forward windows (and every param cell inside a window) are independent, so
+they are scheduled as work units on a process pool:
+
+- candles are written once as .npy columns and memory-mapped read-only by every
+  worker (no per-task pickling of candle lists); a worker rebuilds the candle
+  dicts of a slice once and keeps the last few slices around
+- grid mode: one unit = (window x chunk of params) on the train slice; as soon as
+  all cells of a window are in, its best params are tested on the test slice
+- per-window results are handed to `on_window` in completion order, the returned
+  list is always in window order (ties in the best-param pick go to the lower grid
+  index), so the output is identical to the serial run
+
+    engine = Engine({"BTCUSDT": candles}, workers=8)
+    fut = engine.submit(fn, "BTCUSDT", [(lo, hi)], *args)   # fn(candles[lo:hi], *args)
+
+    walk_forward(candles, train_bars, test_bars, make_signal_fn=..., backtest_fn=...,
+                 param_grid=[...], workers=None)
+    run_grid(candles, spans, params, unit_fn)                # unit_fn(w, train, test, param)
+
+workers: None -> os.cpu_count() (WF_WORKERS overrides), 1 -> in-process, same code
+path as before. Callables that cannot be pickled (lambdas, closures) fall back to
+in-process execution.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import pickle
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Span = Tuple[int, int]
+
+_SLICE_CACHE_MAX = 8
+
+
+def default_workers() -> int:
+    try:
+        n = int(str(os.getenv("WF_WORKERS", "0")).strip() or 0)
+    except Exception:
+        n = 0
+    return n if n > 0 else (os.cpu_count() or 1)
+
+
+def picklable(*objs: Any) -> bool:
+    try:
+        for o in objs:
+            pickle.dumps(o)
+        return True
+    except Exception:
+        return False
+
+
+# ---------------- window layout ----------------
+def rolling_windows(n: int, train_bars: int, test_bars: int) -> List[Tuple[int, Span, Span]]:
+    """(start, train span, test span) exactly like the data_store.walk_forward loop."""
+    out = []
+    start = 0
+    train_bars, test_bars = int(train_bars), int(test_bars)
+    if train_bars <= 0 or test_bars <= 0:
+        return out
+    while start + train_bars + test_bars <= n:
+        out.append((start, (start, start + train_bars), (start + train_bars, start + train_bars + test_bars)))
+        start += test_bars
+    return out
+
+
+def anchored_folds(n: int, n_folds: int = 4, min_bars: int = 200) -> List[Tuple[Span, Span]]:
+    """optimizer.split_walkforward as spans: train=[0, step*k), test=[step*k, step*(k+1))."""
+    step = n // (n_folds + 1)
+    out = []
+    for k in range(1, n_folds + 1):
+        tr, te = (0, step * k), (step * k, step * (k + 1))
+        if tr[1] - tr[0] > min_bars and te[1] - te[0] > min_bars:
+            out.append((tr, te))
+    return out
+
+
+# ---------------- shared candles ----------------
+def _column(values: list) -> Optional[np.ndarray]:
+    # exact round trip only: all-int -> int64, all-float -> float64, anything else is pickled
+    kinds = {type(v) for v in values}
+    if kinds == {int}:
+        try:
+            return np.asarray(values, dtype=np.int64)
+        except OverflowError:
+            return None
+    if kinds == {float}:
+        return np.asarray(values, dtype=np.float64)
+    return None
+
+
+def share(series: Dict[str, List[Dict[str, Any]]], tmp: str) -> Dict[str, Any]:
+    """Write each series as .npy columns under tmp; returns the meta the workers attach to."""
+    meta: Dict[str, Any] = {}
+    for s_idx, (name, candles) in enumerate(series.items()):
+        candles = list(candles)
+        fields = list(candles[0].keys()) if candles else []
+        if any(c.keys() != candles[0].keys() for c in candles):
+            meta[name] = {"n": len(candles), "rows": candles}
+            continue
+        cols = {}
+        for f in fields:
+            vals = [c[f] for c in candles]
+            arr = _column(vals)
+            if arr is None:
+                cols[f] = {"values": vals}
+            else:
+                path = os.path.join(tmp, f"s{s_idx}_{len(cols)}.npy")
+                np.save(path, arr)
+                cols[f] = {"path": path}
+        meta[name] = {"n": len(candles), "fields": fields, "cols": cols}
+    return meta
+
+
+class _Shared:
+    def __init__(self, meta: Dict[str, Any]):
+        self.meta = meta
+        self.cols: Dict[str, Dict[str, Any]] = {}
+        for name, m in meta.items():
+            if "cols" in m:
+                self.cols[name] = {f: (np.load(c["path"], mmap_mode="r") if "path" in c else c["values"])
+                                   for f, c in m["cols"].items()}
+        self.cache: "OrderedDict[tuple, list]" = OrderedDict()
+
+    def slice(self, name: str, lo: int, hi: int) -> List[Dict[str, Any]]:
+        key = (name, lo, hi)
+        hit = self.cache.get(key)
+        if hit is not None:
+            self.cache.move_to_end(key)
+            return hit
+        m = self.meta[name]
+        if "rows" in m:
+            out = m["rows"][lo:hi]
+        else:
+            fields = m["fields"]
+            cols = [self.cols[name][f][lo:hi] for f in fields]
+            cols = [c.tolist() if isinstance(c, np.ndarray) else c for c in cols]
+            out = [dict(zip(fields, vals)) for vals in zip(*cols)] if fields else [{} for _ in range(max(0, hi - lo))]
+        self.cache[key] = out
+        while len(self.cache) > _SLICE_CACHE_MAX:
+            self.cache.popitem(last=False)
+        return out
+
+
+_worker_shared: Optional[_Shared] = None
+
+
+def _worker_init(meta: Dict[str, Any]):
+    global _worker_shared
+    _worker_shared = _Shared(meta)
+
+
+def _worker_call(fn: Callable, name: str, spans: Sequence[Span], args: tuple):
+    assert _worker_shared is not None
+    return fn(*[_worker_shared.slice(name, lo, hi) for lo, hi in spans], *args)
+
+
+class Engine:
+    """
+    submit(fn, series_name, spans, *args) -> Future of fn(*slices, *args).
+    workers<=1 runs in-process on the original lists (futures come back already done).
+    """
+
+    def __init__(self, series: Dict[str, List[Dict[str, Any]]], workers: Optional[int] = None, max_units: Optional[int] = None):
+        self.series = series
+        self.workers = int(workers or default_workers())
+        if max_units is not None:
+            self.workers = max(1, min(self.workers, int(max_units)))
+        self._tmp: Optional[str] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "Engine":
+        if self.workers > 1:
+            self._tmp = tempfile.mkdtemp(prefix="wf_")
+            meta = share(self.series, self._tmp)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init, initargs=(meta,))
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._tmp is not None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            self._tmp = None
+
+    @property
+    def parallel(self) -> bool:
+        return self._pool is not None
+
+    def submit(self, fn: Callable, name: str, spans: Sequence[Span], *args) -> Future:
+        spans = [(int(lo), int(hi)) for lo, hi in spans]
+        if self._pool is not None:
+            return self._pool.submit(_worker_call, fn, name, spans, args)
+        fut: Future = Future()
+        try:
+            candles = self.series[name]
+            fut.set_result(fn(*[candles[lo:hi] for lo, hi in spans], *args))
+        except BaseException as e:  # surfaced by fut.result() like the pool would
+            fut.set_exception(e)
+        return fut
+
+
+def drain(pending: Dict[Future, Any], on_done: Callable[[Any, Any], None]):
+    """Wait for futures (value = tag), calling on_done(tag, result) in completion order.
+    on_done may add new futures to `pending`."""
+    while pending:
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        for fut in done:
+            tag = pending.pop(fut)
+            on_done(tag, fut.result())
+
+
+def _chunks(n: int, size: int) -> List[range]:
+    return [range(i, min(n, i + size)) for i in range(0, n, size)]
+
+
+def _chunk_size(windows: int, params: int, workers: int, chunk_size: Optional[int]) -> int:
+    if chunk_size:
+        return max(1, int(chunk_size))
+    # ~4 units per worker over the whole run, never more than a window's grid
+    return max(1, min(params, math.ceil(windows * params / max(1, workers * 4))))
+
+
+# ---------------- (window x param) grid ----------------
+def _grid_chunk(train, test, unit_fn, w, cells):
+    return [(k, unit_fn(w, train, test, p)) for k, p in cells]
+
+
+def run_grid(
+    candles: List[Dict[str, Any]],
+    spans: Sequence[Tuple[Span, Span]],
+    params: Sequence[Any],
+    unit_fn: Callable[[int, list, list, Any], Any],
+    *,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    on_window: Optional[Callable[[int, List[Any]], None]] = None,
+) -> List[List[Any]]:
+    """
+    results[w][k] = unit_fn(w, train_w, test_w, params[k]) for every fold span and param.
+    on_window(w, results[w]) fires once a window's cells are all done (completion order).
+    """
+    params = list(params)
+    W, P = len(spans), len(params)
+    results: List[List[Any]] = [[None] * P for _ in range(W)]
+    if W == 0 or P == 0:
+        return results
+    if workers is None and not picklable(unit_fn, params):
+        workers = 1
+    left = [P] * W
+    with Engine({"c": candles}, workers=workers, max_units=W * P) as eng:
+        size = _chunk_size(W, P, eng.workers, chunk_size)
+        pending: Dict[Future, int] = {}
+        for w, (tr, te) in enumerate(spans):
+            for r in _chunks(P, size):
+                pending[eng.submit(_grid_chunk, "c", [tr, te], unit_fn, w, [(k, params[k]) for k in r])] = w
+
+        def _done(w, rows):
+            for k, res in rows:
+                results[w][k] = res
+            left[w] -= len(rows)
+            if left[w] == 0 and on_window is not None:
+                on_window(w, results[w])
+
+        drain(pending, _done)
+    return results
+
+
+# ---------------- walk-forward ----------------
+def default_score(metrics: Dict[str, Any]):
+    return (float(metrics.get("net_pnl", 0.0) or 0.0), float(metrics.get("winrate", 0.0) or 0.0))
+
+
+def _wf_window(train, test, optimizer_fn, make_signal_fn, backtest_fn):
+    best = optimizer_fn(train) or {}
+    best_params = best.get("params") or best
+    return best_params, backtest_fn(test, make_signal_fn(best_params))
+
+
+def _wf_train_chunk(train, make_signal_fn, backtest_fn, score_fn, cells):
+    return [(k, score_fn(backtest_fn(train, make_signal_fn(p)))) for k, p in cells]
+
+
+def _wf_test(test, make_signal_fn, backtest_fn, k, params):
+    return k, backtest_fn(test, make_signal_fn(params))
+
+
+def summarize_windows(windows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total_trades = sum(int(w["test_metrics"].get("trades", 0) or 0) for w in windows)
+    total_net = sum(float(w["test_metrics"].get("net_pnl", 0.0) or 0.0) for w in windows)
+    avg_wr = 0.0
+    if windows:
+        avg_wr = sum(float(w["test_metrics"].get("winrate", 0.0) or 0.0) for w in windows) / len(windows)
+    return {
+        "windows": len(windows),
+        "total_trades": total_trades,
+        "total_net_pnl": round(total_net, 4),
+        "avg_winrate": round(avg_wr, 2),
+    }
+
+
+def walk_forward(
+    candles: List[Dict[str, Any]],
+    train_bars: int,
+    test_bars: int,
+    *,
+    make_signal_fn: Callable[[Dict[str, Any]], Callable],
+    backtest_fn: Callable[[List[Dict[str, Any]], Callable], Dict[str, Any]],
+    optimizer_fn: Optional[Callable[[List[Dict[str, Any]]], Dict[str, Any]]] = None,
+    param_grid: Optional[Iterable[Dict[str, Any]]] = None,
+    score_fn: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    on_window: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Same result shape as data_store.walk_forward ({"windows": [...], "summary": {...}}).
+    - optimizer_fn: one unit per window (optimizer_fn(train) -> best, then test)
+    - param_grid:   (window x param) units; best = max score_fn(backtest_fn(train, signal)),
+                    default score = (net_pnl, winrate), ties -> earlier grid entry
+    on_window(window_row) fires as each window's test_metrics come in.
+    """
+    grid = list(param_grid) if param_grid is not None else None
+    if grid is None and optimizer_fn is None:
+        raise ValueError("walk_forward needs optimizer_fn or param_grid")
+    score_fn = score_fn or default_score
+    layout = rolling_windows(len(candles), train_bars, test_bars)
+    rows: List[Optional[Dict[str, Any]]] = [None] * len(layout)
+    if not layout:
+        return {"windows": [], "summary": summarize_windows([])}
+
+    fns = (make_signal_fn, backtest_fn) + ((score_fn, grid) if grid is not None else (optimizer_fn,))
+    if workers is None and not picklable(*fns):
+        workers = 1
+    units = len(layout) * (len(grid) if grid is not None else 1)
+
+    def _finish(w: int, best_params, test_res):
+        start = layout[w][0]
+        rows[w] = {
+            "start": start,
+            "train_bars": train_bars,
+            "test_bars": test_bars,
+            "best_params": best_params,
+            "test_metrics": test_res,
+        }
+        if on_window is not None:
+            on_window(rows[w])
+
+    with Engine({"c": candles}, workers=workers, max_units=units) as eng:
+        pending: Dict[Future, tuple] = {}
+        if grid is None:
+            for w, (_, tr, te) in enumerate(layout):
+                pending[eng.submit(_wf_window, "c", [tr, te], optimizer_fn, make_signal_fn, backtest_fn)] = ("win", w)
+        else:
+            size = _chunk_size(len(layout), len(grid), eng.workers, chunk_size)
+            scores: List[List[Any]] = [[None] * len(grid) for _ in layout]
+            left = [len(grid)] * len(layout)
+            for w, (_, tr, _te) in enumerate(layout):
+                for r in _chunks(len(grid), size):
+                    cells = [(k, grid[k]) for k in r]
+                    pending[eng.submit(_wf_train_chunk, "c", [tr], make_signal_fn, backtest_fn, score_fn, cells)] = ("train", w)
+
+        def _done(tag, res):
+            kind, w = tag
+            if kind == "win":
+                _finish(w, *res)
+            elif kind == "test":
+                _finish(w, grid[res[0]], res[1])
+            else:
+                for k, s in res:
+                    scores[w][k] = s
+                left[w] -= len(res)
+                if left[w] == 0:
+                    best_k = 0
+                    for k in range(1, len(grid)):
+                        if scores[w][k] > scores[w][best_k]:
+                            best_k = k
+                    pending[eng.submit(_wf_test, "c", [layout[w][2]], make_signal_fn, backtest_fn, best_k, grid[best_k])] = ("test", w)
+
+        drain(pending, _done)
+
+    windows = [r for r in rows if r is not None]
+    return {"windows": windows, "summary": summarize_windows(windows)}
+
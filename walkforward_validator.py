@@ -1,30 +1,88 @@
 # walkforward_validator.py
 # Institutional Upgrade V2 - lightweight multi-window / pseudo walk-forward validator
 # 기존 run_backtest_opt.py가 날짜별 end 옵션을 지원하지 않아도 30/90/180/365 복수 구간으로 안정성 검증.
+# 구간마다 subprocess 를 띄우지 않고, 심볼당 가장 긴 구간을 한 번 받아서
+# (window x symbol) 작업을 walkforward_executor process pool 에서 병렬로 돌림 (캔들은 read-only 공유).
 
 from __future__ import annotations
 
 import argparse
 import json
 import os
-import subprocess
-import sys
 import time
 from pathlib import Path
 from typing import Any, Dict, List
 
-from backtest_reporter import parse_backtest_log, summarize
+import run_backtest_opt as rbo
+import walkforward_executor
+from auto_param_tuner_v2 import summary_rows
+from backtest_reporter import summarize
 
 
-def run_cmd(cmd: List[str], log_path: Path) -> int:
-    log_path.parent.mkdir(parents=True, exist_ok=True)
-    with log_path.open("w", encoding="utf-8") as f:
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-        assert p.stdout is not None
-        for line in p.stdout:
-            print(line, end="")
-            f.write(line)
-        return p.wait()
+def _window_best(candles, symbol: str, dh: str, candidates, opts: Dict[str, Any]):
+    """작업 1개 = (window, symbol): candles 는 그 window 의 마지막 N일 slice"""
+    return rbo.best_for_symbol(symbol, candles, dh, candidates, **opts)
+
+
+def run_windows(symbols: List[str], windows: List[int], *, interval: str, grid: bool, allow_short: bool,
+                category: str = "linear", outdir: str | None = "data", workers: int | None = None,
+                log=print) -> Dict[int, Dict[str, Any]]:
+    """{days: run_backtest_opt()-shaped result} — same numbers as one run_backtest_opt --days run per window."""
+    series: Dict[str, List[Dict[str, Any]]] = {}
+    units = []  # (days, sym, series name, (lo, hi), dh)
+    errors: Dict[int, Dict[str, str]] = {d: {} for d in windows}
+    for sym in symbols:
+        longest = None
+        for days in sorted(set(windows), reverse=True):
+            try:
+                candles, dh = rbo.load_candles(category, sym, str(interval), days, outdir=outdir, log=log)
+            except Exception as e:
+                candles, dh = None, None
+                errors[days][sym] = f"download error: {e}"
+            if not candles:
+                errors[days].setdefault(sym, "no data")
+                if log:
+                    log(f"❌ {sym} {days}d: {errors[days][sym]}")
+                continue
+            if longest is None:
+                longest = series[sym] = candles
+            lo = len(longest) - len(candles)
+            # 짧은 구간 = 같은 다운로드의 뒷부분; 아니면(캐시 만료로 재다운로드 등) 따로 공유
+            if lo >= 0 and longest[lo] == candles[0] and longest[-1] == candles[-1]:
+                units.append((days, sym, sym, (lo, len(longest)), dh))
+            else:
+                name = f"{sym}:{days}"
+                series[name] = candles
+                units.append((days, sym, name, (0, len(candles)), dh))
+
+    candidates = rbo.grid_params(grid, 60, 1.5, 2.0)
+    opts = {"allow_short": bool(allow_short)}
+    best: Dict[int, Dict[str, Any]] = {d: {} for d in windows}
+    with walkforward_executor.Engine(series, workers=workers, max_units=len(units)) as eng:
+        pending = {eng.submit(_window_best, name, [span], sym, dh, candidates, opts): (days, sym)
+                   for days, sym, name, span, dh in units}
+
+        def _done(tag, res):
+            days, sym = tag
+            best[days][sym] = res
+            if not log:
+                return
+            if "error" in res:
+                log(f"⚠️ {sym} {days}d: {res['error']}")
+            else:
+                log(f"🏆 {sym} {days}d: trades={res['trades']} win={res['winrate']}% bal={res['balance_pct']}%  params={res['params']}")
+
+        walkforward_executor.drain(pending, _done)
+
+    out: Dict[int, Dict[str, Any]] = {}
+    for days in windows:
+        by_sym = {s: best[days][s] for s in symbols if s in best[days]}
+        errs = dict(errors[days])
+        errs.update({s: r["error"] for s, r in by_sym.items() if "error" in r})
+        ok = [v for v in by_sym.values() if "error" not in v]
+        ok.sort(key=lambda x: (x["balance_pct"], x["winrate"]), reverse=True)
+        out[days] = {"best_by_symbol": by_sym, "summary": ok, "errors": errs}
+    return out
 
 
 def validate_symbol(summary_by_window: Dict[int, Dict[str, Any]], symbol: str, min_positive_windows: int, min_trades: int) -> Dict[str, Any]:
@@ -49,22 +107,18 @@ def main() -> None:
     ap.add_argument("--min-positive-windows", type=int, default=2)
     ap.add_argument("--min-trades", type=int, default=20)
     ap.add_argument("--out", default="data/backtests/walkforward_latest.json")
+    ap.add_argument("--workers", type=int, default=None, help="process count (default: WF_WORKERS or cpu count, 1=in-process)")
     args = ap.parse_args()
 
     windows = [int(x.strip()) for x in args.windows.split(",") if x.strip()]
-    summary_by_window: Dict[int, Dict[str, Any]] = {}
-    run_id = time.strftime("%Y%m%d_%H%M%S")
-    for days in windows:
-        log = Path(f"data/backtests/wf_{days}d_{run_id}.log")
-        cmd = [sys.executable, "run_backtest_opt.py", "--symbols", args.symbols, "--interval", str(args.interval), "--days", str(days), "--grid", args.grid, "--short", args.short]
-        print("RUN", " ".join(cmd))
-        rc = run_cmd(cmd, log)
-        rows = parse_backtest_log(log)
-        summary_by_window[days] = summarize(rows)
-        if rc != 0:
-            print(f"warning: command failed rc={rc} days={days}")
-
     all_symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    res_by_window = run_windows(all_symbols, windows, interval=str(args.interval), grid=(args.grid == "on"),
+                                allow_short=(args.short == "on"), workers=args.workers)
+    summary_by_window: Dict[int, Dict[str, Any]] = {days: summarize(summary_rows(res)) for days, res in res_by_window.items()}
+    for days, res in res_by_window.items():
+        for sym, err in res["errors"].items():
+            print(f"warning: {sym} days={days}: {err}")
+
     verdicts = [validate_symbol(summary_by_window, s, args.min_positive_windows, args.min_trades) for s in all_symbols]
     out = {"created_ts": time.time(), "symbols": all_symbols, "windows": windows, "verdicts": verdicts, "summary_by_window": summary_by_window}
     out_path = Path(args.out)